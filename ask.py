@@ -0,0 +1,90 @@
+# Answer questions from the command line, without the web server
+#
+#     python -m ask "Which state has the highest rice production?"
+#     python -m ask --format json "Rainfall trend in Assam" "List crops in Punjab"
+#     echo "Compare rainfall in Punjab and Kerala" | python -m ask --timings
+#
+# Only the answering core is imported (engine.py: no Flask, and no pandas
+# once the dataset has a snapshot, whose aggregate cube is memory-mapped),
+# so a fresh process is ready to answer in a fraction of the time `import
+# query` takes. This is also the path to use for cold-starting workers.
+# --timings reports where the time to the first answer went; benchmark.py
+# tracks it across commits.
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+from engine import DATA_FILE, INGEST_DIR, Engine, iter_multi_answer, parse_query, split_compound_query
+from render import iter_csv, iter_text, to_dict
+from results import Message
+
+
+def answer(engine, question):
+    """``(sub_question, result)`` per part of ``question``; failed parts get an error Message
+
+    Any failure is reported this way, as the server reports it, so one bad
+    question doesn't end a batch.
+    """
+    parts = []
+    for sub_question in split_compound_query(question):
+        try:
+            parts.append((sub_question, engine.result(parse_query(sub_question, engine))))
+        except Exception as e:
+            parts.append((sub_question, Message('error', str(e))))
+    return parts
+
+
+def iter_output(parts, output):
+    """The answer to one question in ``output`` format ('text', 'json' or 'csv')"""
+    if output == 'json':
+        yield json.dumps({'queries': [{'question': text, 'result': to_dict(result)} for text, result in parts]})
+    elif output == 'csv':
+        for text, result in parts:
+            yield f"# {text}\n"
+            yield from iter_csv(result)
+    elif len(parts) == 1:
+        yield from iter_text(parts[0][1])
+    else:
+        yield from iter_multi_answer([(text, iter_text(result)) for text, result in parts])
+    yield "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ask', description="Answer questions about the dataset")
+    parser.add_argument('questions', nargs='*', help="questions to answer (default: one per line from stdin)")
+    parser.add_argument('--dataset', default=DATA_FILE, help=f"dataset or snapshot directory (default: {DATA_FILE})")
+    parser.add_argument('--ingest-dir', default=INGEST_DIR,
+                        help=f"batches ingested by the server, added to the dataset (default: {INGEST_DIR})")
+    parser.add_argument('--format', choices=('text', 'json', 'csv'), default='text')
+    parser.add_argument('--timings', action='store_true', help="report startup and answer times on stderr")
+    args = parser.parse_args(argv)
+
+    imported = time.perf_counter()
+    engine = Engine.open(args.dataset, args.ingest_dir)
+    opened = time.perf_counter()
+
+    questions = args.questions or (line.strip() for line in sys.stdin)
+    failed = False
+    first = None
+    for question in questions:
+        if not question:
+            continue
+        parts = answer(engine, question)
+        failed = failed or any(isinstance(result, Message) and result.type == 'error' for _, result in parts)
+        sys.stdout.writelines(iter_output(parts, args.format))
+        if first is None:
+            first = time.perf_counter()
+
+    if args.timings and first is not None:
+        print(f"⏱️  imports {(imported - STARTED) * 1000:.1f} ms · open {(opened - imported) * 1000:.1f} ms · "
+              f"first answer {(first - opened) * 1000:.1f} ms · total {(first - STARTED) * 1000:.1f} ms",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
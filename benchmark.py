@@ -0,0 +1,349 @@
+# Benchmarks for the query engine
+#
+#     python benchmark.py --rows 10000 100000 1000000 --out bench.json
+#     python benchmark.py --rows 100000 --compare bench.json
+#
+# For every dataset size a synthetic dataset is generated from
+# merged_crop_rainfall.csv, loaded into the app, and measured with
+# micro-benchmarks per handler, an in-process load test through the Flask
+# test client, and the cold start of fresh processes (launch to first
+# answer) for the command line and the web app. Results are written as
+# JSON so runs can be compared.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_FILE = 'merged_crop_rainfall.csv'
+
+# Ceilings for synthetic cardinalities (India has 36 states/UTs; crop statistics list ~60 crops)
+MAX_STATES = 36
+MAX_YEARS = 30
+MAX_CROPS = 60
+
+
+# ============= SYNTHETIC DATA =============
+
+def cardinalities(rows, base_rows):
+    """(states, years, crops) for ``rows`` rows - more rows mean more of each, growing slowly like real data"""
+    scale = max(rows / base_rows, 1.0)
+    return (min(MAX_STATES, round(19 * scale ** 0.1)),
+            min(MAX_YEARS, round(5 * scale ** 0.2)),
+            min(MAX_CROPS, round(5 * scale ** 0.3)))
+
+
+def synthesize(rows, base=BASE_FILE, seed=0):
+    """A dataset of ``rows`` rows shaped like ``base``
+
+    Real states, years and crops are kept and extended with synthetic ones.
+    Rows are spread over the State x Year x crop cells like district-level
+    records; production is drawn per crop from a log-normal fitted to the
+    base data, and rainfall is one value per State/Year repeated on every
+    row of that state and year, as in the merged source.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(base)
+    n_states, n_years, n_crops = cardinalities(rows, len(df))
+
+    base_states = list(pd.unique(df['State']))
+    base_crops = list(pd.unique(df['crop']))
+    states = (base_states + [f'State {i}' for i in range(len(base_states) + 1, MAX_STATES + 1)])[:max(n_states, 1)]
+    crops = (base_crops + [f'Crop {i}' for i in range(len(base_crops) + 1, MAX_CROPS + 1)])[:max(n_crops, 1)]
+    last_year = int(df['Year'].max())
+    years = np.arange(last_year - max(n_years, int(df['Year'].nunique())) + 1, last_year + 1)
+
+    # Production: log-normal per crop (synthetic crops borrow a real crop's shape)
+    log_production = np.log(df['Production'].clip(lower=1.0))
+    crop_stats = log_production.groupby(df['crop']).agg(['mean', 'std']).fillna(1.0)
+    crop_mu = np.array([crop_stats.loc[base_crops[i % len(base_crops)], 'mean'] for i in range(len(crops))])
+    crop_sigma = np.array([crop_stats.loc[base_crops[i % len(base_crops)], 'std'] for i in range(len(crops))])
+
+    # Rainfall: each state's mean level (synthetic states borrow one) with yearly noise
+    state_rain = df.groupby('State')['Rainfall'].mean()
+    rain_level = np.array([state_rain[base_states[i % len(base_states)]] for i in range(len(states))])
+    rainfall = rain_level[:, None] * rng.lognormal(0.0, 0.2, size=(len(states), len(years)))
+
+    state_code = rng.integers(0, len(states), size=rows)
+    year_code = rng.integers(0, len(years), size=rows)
+    crop_code = rng.integers(0, len(crops), size=rows)
+
+    return pd.DataFrame({
+        'State': pd.Categorical.from_codes(state_code, categories=states),
+        'Year': years[year_code],
+        'crop': pd.Categorical.from_codes(crop_code, categories=crops),
+        'Production': np.round(rng.lognormal(crop_mu[crop_code], crop_sigma[crop_code]), 2),
+        'Rainfall': np.round(rainfall[state_code, year_code], 1),
+    })
+
+
+# ============= QUESTION CORPUS =============
+
+# At least one question per parse_query intent, plus compound forms that
+# split_compound_query breaks apart ("X. Also Y", "X; Y", "... mention where
+# the data came from") or deliberately keeps whole ("at the same time")
+CORPUS = {
+    'highest': ['Which state has the highest rice production?', 'Top states by rainfall in 2012'],
+    'lowest': ['Which state had the lowest wheat production in 2011?', 'Least rainfall state'],
+    'compare': ['Compare rainfall in Punjab and Kerala', 'Difference in production between Bihar and Odisha',
+                'Compare rainfall and production in Rajasthan and Maharashtra'],
+    'average': ['Average rainfall in Kerala', 'Mean production of sugarcane'],
+    'total': ['Total wheat production in 2012', 'Overall production in Uttar Pradesh'],
+    'trend': ['Show the trend of rice production', 'Rainfall trend in Assam over time'],
+    'correlation': ['Correlation between rainfall and production', 'How does rainfall affect rice production?'],
+    'list': ['List the crops grown in Punjab', 'What are the main crops in Gujarat and Bihar?'],
+    'source': ['Where does the data come from?'],
+    'general': ['Tell me about Karnataka in 2010'],
+    'compound': [
+        'Highest rice production. Also show trend',
+        'Compare rainfall in Rajasthan and Maharashtra every year; list top crops in Punjab',
+        'Compare rainfall in Rajasthan and Maharashtra every year. At the same time list top crops and mention '
+        'where the data came from',
+        'Lowest rainfall in 2010. Also show the average production in Kerala. And also total wheat production',
+    ],
+}
+
+
+def corpus_questions():
+    return [question for questions in CORPUS.values() for question in questions]
+
+
+# ============= MEASUREMENT =============
+
+def percentiles(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+        'max_ms': float(samples.max()),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def bench_handlers(query, repeat):
+    """Time parse and compute+render per intent, bypassing the answer cache"""
+    results = {}
+    view = query.snapshot.cube
+    for intent, questions in CORPUS.items():
+        if intent == 'compound':
+            continue
+        parse_times, handler_times = [], []
+        for question in questions:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                params = query.parse_query(question)
+                parsed = time.perf_counter()
+                query.answer_params(params, view)
+                parse_times.append(parsed - started)
+                handler_times.append(time.perf_counter() - parsed)
+        results[intent] = {'parse': percentiles(parse_times), 'handler': percentiles(handler_times)}
+    return results
+
+
+def load_test(query, requests, concurrency, route='html', use_cache=True):
+    """Fire ``requests`` requests from ``concurrency`` threads through the Flask test client
+
+    Requests cycle through the corpus, all to one route: the HTML form
+    (``'html'``) or the JSON API (``'json'``). Only the HTML form reads the
+    answer cache, so ``use_cache`` makes no difference to the JSON API.
+    """
+    questions = corpus_questions()
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+    if not use_cache:
+        query.answer_cache.maxsize = 0
+    query.answer_cache.clear()
+
+    def worker(slot):
+        client = query.app.test_client()
+        for i in range(slot, requests, concurrency):
+            question = questions[i % len(questions)]
+            started = time.perf_counter()
+            if route == 'json':
+                response = client.post('/api/query', json={'question': question})
+            else:
+                response = client.post('/', data={'question': question})
+            latencies[slot].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append((question, response.status_code))
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [latency for per_thread in latencies for latency in per_thread]
+    return dict(percentiles(samples), requests=len(samples), concurrency=concurrency, route=route, cache=use_cache,
+                errors=len(errors), seconds=elapsed, rps=len(samples) / elapsed,
+                cache_stats=query.answer_cache.stats(), peak_rss_mb=peak_rss_mb())
+
+
+def cold_start(path, runs):
+    """Wall time from launching a fresh interpreter to its first answer, for `python -m ask` and `import query`
+
+    The dataset's snapshot already exists (run_size() loaded it), as it
+    does when workers are scaled up.
+    """
+    question = CORPUS['highest'][0]
+    commands = {
+        'ask': [sys.executable, '-m', 'ask', '--dataset', path, question],
+        'server': [sys.executable, '-c', f"import query; query.process_single_query({question!r})"],
+    }
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, SAMARTH_DATA=path)
+
+    results = {}
+    for name, command in commands.items():
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - started)
+        results[name] = percentiles(samples)
+    return results
+
+
+def run_size(query, rows, args, workdir):
+    """Generate, load and benchmark one dataset size"""
+    started = time.perf_counter()
+    df = synthesize(rows, seed=args.seed)
+    path = os.path.join(workdir, f'synthetic-{rows}.csv')
+    df.to_csv(path, index=False)
+    generated = time.perf_counter()
+
+    snap = query.load_data(path)
+    loaded = time.perf_counter()
+    cube = snap.cube
+
+    result = {
+        'rows': rows,
+        'dataset': {
+            'states': len(cube.labels['State']),
+            'years': len(cube.labels['Year']),
+            'crops': len(cube.labels['crop']),
+            'generate_seconds': generated - started,
+            'load_seconds': loaded - generated,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'handlers': bench_handlers(query, args.repeat),
+        'cold_start': cold_start(path, args.cold_starts),
+        'load': {},
+    }
+    for name, route, use_cache in (('html/uncached', 'html', False), ('html/cached', 'html', True),
+                                   ('json', 'json', False)):
+        query.answer_cache.maxsize = 512
+        result['load'][name] = load_test(query, args.requests, args.concurrency, route, use_cache)
+    query.answer_cache.maxsize = 512
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(old, new):
+    """Print p50/p99/RPS changes between two result files, matched by dataset size"""
+    before = {run['rows']: run for run in old['runs']}
+    for run in new['runs']:
+        previous = before.get(run['rows'])
+        if previous is None:
+            continue
+        print(f"\n{run['rows']:,} rows")
+        for name, stats in run['load'].items():
+            was = previous['load'].get(name)
+            if was is None:
+                continue
+            print(f"  load/{name:13} p50 {was['p50_ms']:8.3f} -> {stats['p50_ms']:8.3f} ms   "
+                  f"p99 {was['p99_ms']:8.3f} -> {stats['p99_ms']:8.3f} ms   "
+                  f"rps {was['rps']:8.1f} -> {stats['rps']:8.1f}")
+        for intent, stats in run['handlers'].items():
+            was = previous['handlers'].get(intent)
+            if was is None:
+                continue
+            print(f"  {intent:14} handler p50 {was['handler']['p50_ms']:8.3f} -> {stats['handler']['p50_ms']:8.3f} ms")
+        for name, stats in run.get('cold_start', {}).items():
+            was = previous.get('cold_start', {}).get(name)
+            if was is None:
+                continue
+            print(f"  cold start/{name:7} p50 {was['p50_ms']:8.1f} -> {stats['p50_ms']:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the query engine on synthetic datasets")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help="dataset sizes to generate (10^4 to 10^7)")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per load test")
+    parser.add_argument('--concurrency', type=int, default=4, help="client threads in the load test")
+    parser.add_argument('--repeat', type=int, default=20, help="runs per question in the micro-benchmarks")
+    parser.add_argument('--cold-starts', type=int, default=5, help="fresh processes started per cold-start timing")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench.json', help="where to write the JSON results")
+    parser.add_argument('--compare', metavar='JSON', help="previous results to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='samarth-bench-') as workdir:
+        # Keep ingested batches of a real deployment out of the measurements
+        os.environ['SAMARTH_INGEST_DIR'] = os.path.join(workdir, 'ingest')
+        import query
+
+        runs = []
+        for rows in args.rows:
+            print(f"Benchmarking {rows:,} rows...", flush=True)
+            run = run_size(query, rows, args, workdir)
+            runs.append(run)
+            for name, stats in run['load'].items():
+                print(f"  load/{name:13} p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms  "
+                      f"{stats['rps']:.1f} req/s  peak RSS {stats['peak_rss_mb']} MB", flush=True)
+            for name, stats in run['cold_start'].items():
+                print(f"  cold start/{name:7} p50 {stats['p50_ms']:.1f} ms", flush=True)
+
+    results = {'environment': environment(), 'settings': vars(args), 'runs': runs}
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
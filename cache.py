@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(params):
+    """Canonical, hashable form of a parse_query() result
+
+    Questions that parse to the same intent, entities and metric share a key
+    no matter how they were phrased. Entity lists are order-insensitive here
+    because parse_query always returns them in dataset order.
+    """
+    key = []
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(value))
+        key.append((name, value))
+    return tuple(key)
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of rendered answers with an optional TTL (seconds)"""
+
+    def __init__(self, maxsize=512, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Bumped by clear(); answers computed against an older generation are dropped
+        self.generation = 0
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. because the underlying dataset changed"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class InFlight:
+    """Coalesces concurrent computations of the same key
+
+    The first caller of do() for a key runs the computation; callers that
+    arrive while it is running wait for it and share its result (or its
+    exception) instead of computing it again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+            else:
+                self.coalesced += 1
+
+        done, _, _ = call
+        if leader:
+            try:
+                call[1] = compute()
+            except BaseException as e:
+                call[2] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                done.set()
+        else:
+            done.wait()
+
+        if call[2] is not None:
+            raise call[2]
+        return call[1]
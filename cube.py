@@ -0,0 +1,473 @@
+import json
+import os
+
+import numpy as np
+
+from ranking import rank
+
+# pandas is imported where a cube is built from rows: a cube opened from a
+# snapshot (AggregateCube.open) needs NumPy only, which keeps cold starts fast
+
+# Dimension order of every cube array: (State, Year, crop)
+DIMENSIONS = ('State', 'Year', 'crop')
+MEASURES = ('Production', 'Rainfall')
+
+# Measures recorded per State, Year and crop. Rainfall is recorded once per
+# State and Year, so the cube keeps it in State x Year arrays and joins it to
+# the crop axis only when a reduction involves crops (see reduce())
+CROP_MEASURES = ('Production',)
+
+# The number of State/Years behind a rainfall sum, reduced like a measure:
+# rainfall means divide by it, as production means divide by row counts
+RAINFALL_YEARS = 'Rainfall years'
+
+# Layout of saved cubes; a cube saved with another version is rebuilt
+CUBE_VERSION = 2
+
+
+class AggregateCube:
+    """Dense State x Year x crop production sums and row counts, plus State x Year rainfall, built once per dataset
+
+    Every cell holds the production summed over the rows that fell into it
+    and their number, so any filtered sum or mean over the three dimensions
+    can be answered by slicing and reducing these small arrays instead of
+    copying and re-grouping the DataFrame.
+
+    The merged dataset repeats a State/Year's rainfall on each of its crop
+    rows, and its crop rows once per rainfall reading (one per meteorological
+    subdivision of the state). The cube stores each fact once instead:
+    production per crop row of one copy, and per State/Year the sum and
+    number of its distinct readings, whose mean is the State/Year's rainfall.
+    """
+
+    def __init__(self, df):
+        import pandas as pd
+
+        self.labels = {}
+        self.positions = {}
+        codes = []
+
+        for dim in DIMENSIONS:
+            # Categories come out sorted, matching the order groupby() uses
+            categorical = pd.Categorical(df[dim])
+            self._set_labels(dim, np.asarray(categorical.categories))
+            codes.append(np.asarray(categorical.codes, dtype=np.intp))
+
+        self.shape = tuple(len(self.labels[dim]) for dim in DIMENSIONS)
+        self.counts, self.sums, self.rainfall, self.readings = self._accumulate(df, codes)
+
+        # States in order of first appearance, as data['State'].unique() returns them
+        self.state_order = pd.unique(codes[0])
+        self.rows = len(df)
+        self._margins = {}
+
+    def _set_labels(self, dim, labels):
+        self.labels[dim] = labels
+        self.positions[dim] = {label: i for i, label in enumerate(labels)}
+
+    def _accumulate(self, df, codes):
+        """``(counts, sums, rainfall, readings)`` for rows already coded against this cube
+
+        Per State x Year x crop cell the row counts and production sums,
+        without the copies of rows the merge repeated per reading (see
+        copy_keys()); per State x Year cell the sum and number of distinct
+        rainfall readings.
+        """
+        state_years = np.ravel_multi_index(codes[:2], self.shape[:2])
+        rainfall = df['Rainfall'].to_numpy(dtype=np.float64)
+        sums, readings = rainfall_facts(*distinct_readings(state_years, rainfall), self.shape[0] * self.shape[1])
+
+        size = int(np.prod(self.shape))
+        cells = np.ravel_multi_index(codes, self.shape)
+        values = {metric: df[metric].to_numpy(dtype=np.float64) for metric in CROP_MEASURES}
+        keys = copy_keys(cells, values['Production'])
+        keep = rainfall == lowest_reading(*lowest_readings(keys, rainfall), keys)
+
+        cell = cells[keep]
+        counts = np.bincount(cell, minlength=size).reshape(self.shape)
+        production = {
+            metric: np.bincount(cell, weights=values[metric][keep], minlength=size).reshape(self.shape)
+            for metric in CROP_MEASURES
+        }
+        return counts, production, sums.reshape(self.shape[:2]), readings.reshape(self.shape[:2])
+
+    def extend(self, df):
+        """New cube with the rows of ``df`` added on top of this one
+
+        Only the new rows are aggregated; existing cells are carried over
+        (re-positioned if new states, years or crops widen an axis). This
+        cube is left untouched, so readers holding it keep a consistent view.
+
+        Copies (see copy_keys()) are dropped among the rows of ``df`` only.
+        The cube keeps no individual rows to match them against, so a row
+        repeating one already loaded is added again. For a State/Year
+        already loaded, the batch's rainfall readings are not recorded
+        either. Reloads replay every batch through extend() in ingest order
+        (see query.load_data()), so they give the same answers as live
+        ingestion did.
+        """
+        import pandas as pd
+
+        cube = object.__new__(AggregateCube)
+        cube.labels, cube.positions = {}, {}
+        remap, codes = [], []
+
+        for dim in DIMENSIONS:
+            old = self.labels[dim]
+            dtype = object if old.dtype.kind in 'OUS' else old.dtype
+            cube._set_labels(dim, np.array(sorted(set(old.tolist()) | set(pd.unique(df[dim]).tolist())), dtype=dtype))
+            remap.append(np.array([cube.positions[dim][label] for label in old.tolist()], dtype=np.intp))
+            codes.append(np.asarray(pd.Categorical(df[dim], categories=cube.labels[dim]).codes, dtype=np.intp))
+
+        cube.shape = tuple(len(cube.labels[dim]) for dim in DIMENSIONS)
+        cube.counts, cube.sums, cube.rainfall, cube.readings = cube._accumulate(df, codes)
+
+        # Fold the existing aggregates into their (possibly moved) cells
+        target = np.ix_(*remap)
+        cube.counts[target] += self.counts
+        for metric in CROP_MEASURES:
+            cube.sums[metric][target] += self.sums[metric]
+
+        # A State/Year's rainfall is recorded once: new rows repeating it
+        # (e.g. more crops for a year already loaded) add no readings
+        state_years = np.ix_(*remap[:2])
+        recorded = np.zeros(cube.readings.shape, dtype=bool)
+        recorded[state_years] = self.readings > 0
+        cube.rainfall[recorded] = 0
+        cube.readings[recorded] = 0
+        cube.rainfall[state_years] += self.rainfall
+        cube.readings[state_years] += self.readings
+
+        old_states = remap[0][self.state_order]
+        new_states = [code for code in pd.unique(codes[0]) if code not in set(old_states.tolist())]
+        cube.state_order = np.concatenate([old_states, np.asarray(new_states, dtype=old_states.dtype)])
+        cube.rows = self.rows + len(df)
+        cube._margins = {}
+        return cube
+
+    def save(self, path):
+        """Write the cube to the directory ``path``: one .npy file per array plus meta.json"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'counts.npy'), self.counts)
+        for metric in CROP_MEASURES:
+            np.save(os.path.join(path, f'{metric}.npy'), self.sums[metric])
+        np.save(os.path.join(path, 'Rainfall.npy'), self.rainfall)
+        np.save(os.path.join(path, 'readings.npy'), self.readings)
+        np.save(os.path.join(path, 'state_order.npy'), self.state_order)
+        meta = {
+            'version': CUBE_VERSION,
+            'rows': self.rows,
+            'labels': {dim: {'dtype': self.labels[dim].dtype.str if self.labels[dim].dtype.kind not in 'OUS' else None,
+                             'values': self.labels[dim].tolist()}
+                       for dim in DIMENSIONS},
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        """Cube saved by save(), with its arrays memory-mapped read-only (shared between processes)"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != CUBE_VERSION:
+            raise ValueError(f"Unsupported cube version {meta.get('version')!r} in {path}")
+        mode = 'r' if mmap else None
+
+        labels = {dim: np.array(spec['values'], dtype=spec['dtype'] or object)
+                  for dim, spec in meta['labels'].items()}
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+                  for name in ('counts', 'Rainfall', 'readings') + CROP_MEASURES}
+        sums = {metric: arrays[metric] for metric in CROP_MEASURES}
+        return cls.from_arrays(labels, arrays['counts'], sums, arrays['Rainfall'], arrays['readings'],
+                               np.load(os.path.join(path, 'state_order.npy')), meta['rows'])
+
+    @classmethod
+    def from_arrays(cls, labels, counts, sums, rainfall, readings, state_order, rows):
+        """Cube over already aggregated arrays (not copied), e.g. memory-mapped or in shared memory"""
+        cube = object.__new__(cls)
+        cube.labels, cube.positions = {}, {}
+        for dim in DIMENSIONS:
+            cube._set_labels(dim, labels[dim])
+        cube.shape = tuple(len(cube.labels[dim]) for dim in DIMENSIONS)
+        cube.counts = counts
+        cube.sums = sums
+        cube.rainfall = rainfall
+        cube.readings = readings
+        cube.state_order = state_order
+        cube.rows = rows
+        cube._margins = {}
+        return cube
+
+    def codes(self, dim, values):
+        """Sorted unique integer codes for ``values`` (None means the whole axis)"""
+        if values is None or len(values) == 0:
+            return None
+        positions = self.positions[dim]
+        return np.unique(np.array([positions[v] for v in values if v in positions], dtype=np.intp))
+
+    def margin(self, measure, axes):
+        """``measure`` (None for the row counts) summed over ``axes``, computed once per cube
+
+        E.g. the per-year totals over every state and crop that an
+        unfiltered trend reads, whatever the length of the history.
+        Rainfall measures only have the State and Year axes.
+        """
+        key = (measure, axes)
+        margin = self._margins.get(key)
+        if margin is None:
+            if measure is None:
+                array = self.counts
+            else:
+                array = self.sums[measure] if measure in CROP_MEASURES else self.state_year(measure)
+            margin = self._margins[key] = array.sum(axis=axes)
+        return margin
+
+    def state_year(self, measure):
+        """Per State x Year value of a rainfall measure: the mean reading, or 1 where there is one for RAINFALL_YEARS"""
+        key = (measure, 'State x Year')
+        array = self._margins.get(key)
+        if array is None:
+            observed = self.readings > 0
+            if measure == RAINFALL_YEARS:
+                array = observed.astype(np.int64)
+            else:
+                array = np.where(observed, mean(self.rainfall, self.readings), 0.0)
+            self._margins[key] = array
+        return array
+
+    def group(self, metric, by, states=None, years=None, crops=None):
+        """Sum ``metric`` per value of dimension ``by`` over the selected cells
+
+        Returns ``(labels, sums, counts)`` for the groups that have at least one
+        observation (a row, or a State/Year reading for rainfall), in sorted
+        label order - the groups a DataFrame groupby over the filtered rows
+        would produce.
+        """
+        (labels,), sums, counts = self.reduce(counted(metric), (by,), states, years, crops)
+        counts = observations(metric, sums, counts)
+        present = counts > 0
+        return labels[present], sums[metric][present], counts[present]
+
+    def total(self, metric, states=None, years=None, crops=None):
+        """Return ``(sum, count)`` of ``metric`` over the selected cells"""
+        _, sums, counts = self.reduce(counted(metric), (), states, years, crops)
+        return sums[metric], observations(metric, sums, counts)
+
+    def present(self, dim, states=None, years=None, crops=None):
+        """Labels along ``dim`` that have rows within the selection"""
+        labels, _, _ = self.group(MEASURES[0], dim, states, years, crops)
+        return labels
+
+    def cells(self, metric, states=None, years=None, crops=None):
+        """The selected State x Year x crop cells themselves
+
+        Returns ``((states, years, crops), sums, counts)`` with every selected
+        label kept along each axis, like matrix().
+        """
+        labels, sums, counts = self.reduce(counted(metric), DIMENSIONS, states, years, crops)
+        return labels, sums[metric], observations(metric, sums, counts)
+
+    def matrix(self, metric, rows, cols, states=None, years=None, crops=None):
+        """Sum ``metric`` onto a ``rows`` x ``cols`` grid over the selected cells
+
+        Returns ``(row_labels, col_labels, sums, counts)``. Unlike group(),
+        every selected label is kept (empty ones have zero counts) so callers
+        can index rows and columns by position.
+        """
+        (row_labels, col_labels), sums, counts = self.reduce(counted(metric), (rows, cols), states, years, crops)
+        return row_labels, col_labels, sums[metric], observations(metric, sums, counts)
+
+    def reduce(self, measures, by=(), states=None, years=None, crops=None):
+        """Sum several measures onto the ``by`` axes (in that order) over the selected cells
+
+        What group(), total(), matrix(), cells() and query plans run: the
+        selection is resolved once and the counts plus every measure are
+        reduced with it. Returns ``(labels, sums, counts)`` with one label
+        array per ``by`` dimension (every selected label kept, as in matrix())
+        and ``sums`` as a {measure: array} dict.
+
+        Rainfall and RAINFALL_YEARS are read from the State x Year arrays.
+        When crops are grouped or filtered on, they are joined on the State
+        and Year codes to the production cells that have rows: a State/Year
+        counts once per crop grown there, or once if any selected crop was.
+        Otherwise every State/Year with a reading counts once.
+        """
+        selection = (states, years, crops)
+        index = [self.codes(dim, values) for dim, values in zip(DIMENSIONS, selection)]
+        axes = [DIMENSIONS.index(dim) for dim in by]
+        other = tuple(a for a in range(len(DIMENSIONS)) if a not in axes)
+        order = [sorted(axes).index(a) for a in axes]
+
+        # Nothing is filtered on the axes summed away: start from their margin
+        # and only slice what is left, instead of reducing the whole cube
+        from_margin = all(index[a] is None for a in other)
+
+        def reduced(measure):
+            if from_margin:
+                array = self.margin(measure, other)
+                for position, axis in enumerate(sorted(axes)):
+                    if index[axis] is not None:
+                        array = take(array, index[axis], position)
+                return array.transpose(order)
+
+            array = self.counts if measure is None else self.sums[measure]
+            for axis, idx in enumerate(index):
+                if idx is not None:
+                    array = take(array, idx, axis)
+            return array.sum(axis=other).transpose(order)
+
+        def joined(measure):
+            summed = tuple(a for a in other if a < 2)
+            if 'crop' not in by and index[2] is None and all(index[a] is None for a in summed):
+                array = self.margin(measure, summed)
+                for position, axis in enumerate(sorted(axes)):
+                    if index[axis] is not None:
+                        array = take(array, index[axis], position)
+                return array.transpose(order)
+
+            array = self.state_year(measure)
+            for axis in (0, 1):
+                if index[axis] is not None:
+                    array = take(array, index[axis], axis)
+            if 'crop' in by or index[2] is not None:
+                grown = self.counts
+                for axis, idx in enumerate(index):
+                    if idx is not None:
+                        grown = take(grown, idx, axis)
+                grown = grown > 0
+                if 'crop' in by:
+                    return (array[:, :, None] * grown).sum(axis=other).transpose(order)
+                array = array * grown.any(axis=2)
+            return array.sum(axis=summed).transpose(order)
+
+        labels = tuple(self.labels[dim] if index[axis] is None else self.labels[dim][index[axis]]
+                       for dim, axis in zip(by, axes))
+        sums = {metric: reduced(metric) if metric in CROP_MEASURES else joined(metric) for metric in measures}
+        return labels, sums, reduced(None)
+
+    def top(self, measure, by, k, ascending=False, states=None, years=None, crops=None):
+        """The best ``k`` groups along ``by`` with observations, as ``(labels, values, ranks)`` (see ranking.rank)"""
+        (labels,), sums, counts = self.reduce(counted(measure), (by,), states, years, crops)
+        present = observations(measure, sums, counts) > 0
+        return rank(labels[present], sums[measure][present], k, ascending)
+
+
+def counted(measure):
+    """``measure`` plus the measure counting its observations, unless rows do (RAINFALL_YEARS for rainfall)"""
+    return (measure, RAINFALL_YEARS) if measure == 'Rainfall' else (measure,)
+
+
+def observations(measure, sums, counts):
+    """Observations behind ``measure`` in a reduce() result: State/Years with a reading for rainfall, else rows"""
+    return sums[RAINFALL_YEARS] if measure == 'Rainfall' else counts
+
+
+def distinct_readings(state_years, rainfall):
+    """The distinct ``(State x Year cell, reading)`` pairs among rows, as two arrays"""
+    pairs = np.unique(np.column_stack([np.asarray(state_years, dtype=np.float64), rainfall]), axis=0)
+    return pairs[:, 0].astype(np.intp), pairs[:, 1]
+
+
+def rainfall_facts(cells, values, size):
+    """``(sums, readings)`` per State x Year cell over the distinct readings from distinct_readings()"""
+    return np.bincount(cells, weights=values, minlength=size), np.bincount(cells, minlength=size)
+
+
+def copy_keys(cells, production):
+    """``(cell, Production)`` of each row, as sortable structured keys
+
+    The merge repeated every crop row of a State/Year once per rainfall
+    reading, so the copies of a row share its key but not its reading. Rows
+    are kept when they carry the lowest reading of their key: one copy of
+    each repeated row, and every row that was never repeated, whatever
+    rainfall it has.
+    """
+    keys = np.empty(len(cells), dtype=[('cell', np.int64), ('production', np.float64)])
+    keys['cell'] = cells
+    keys['production'] = production
+    return keys
+
+
+def lowest_readings(keys, rainfall):
+    """``(keys, lowest)``: the distinct keys in sorted order and the lowest reading among the rows of each
+
+    Also combines results: pass the concatenated keys and lowest readings
+    of several chunks of rows.
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    lowest = np.full(len(unique), np.inf)
+    np.minimum.at(lowest, inverse.reshape(-1), rainfall)
+    return unique, lowest
+
+
+def lowest_reading(unique, lowest, keys):
+    """The lowest reading of each of ``keys``, looked up in the result of lowest_readings()"""
+    return lowest[np.searchsorted(unique, keys)]
+
+
+def take(array, idx, axis):
+    """``array.take(idx, axis)``, as a view when the sorted ``idx`` is one contiguous run (e.g. a year range)"""
+    if len(idx) and idx[-1] - idx[0] + 1 == len(idx):
+        return array[(slice(None),) * axis + (slice(idx[0], idx[-1] + 1),)]
+    return array.take(idx, axis=axis)
+
+
+def freeze(values):
+    """Hashable form of a selection list (None and empty both mean everything)"""
+    if values is None or len(values) == 0:
+        return None
+    return tuple(sorted(set(values)))
+
+
+class SharedAggregates:
+    """Memoizing view of an AggregateCube for evaluating a batch of questions
+
+    Exposes the same reductions as the cube, but each distinct reduction is
+    computed once per view, so questions in one batch that need the same
+    grouping (e.g. the crop-by-state grid behind several lists) share it.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.computed = 0
+        self.reused = 0
+        self._memo = {}
+
+    def __getattr__(self, name):
+        return getattr(self.cube, name)
+
+    def _memoized(self, op, *args, states=None, years=None, crops=None):
+        key = (op, args, freeze(states), freeze(years), freeze(crops))
+        if key in self._memo:
+            self.reused += 1
+        else:
+            self.computed += 1
+            self._memo[key] = getattr(self.cube, op)(*args, states=states, years=years, crops=crops)
+        return self._memo[key]
+
+    def group(self, metric, by, states=None, years=None, crops=None):
+        return self._memoized('group', metric, by, states=states, years=years, crops=crops)
+
+    def total(self, metric, states=None, years=None, crops=None):
+        return self._memoized('total', metric, states=states, years=years, crops=crops)
+
+    def present(self, dim, states=None, years=None, crops=None):
+        return self._memoized('present', dim, states=states, years=years, crops=crops)
+
+    def cells(self, metric, states=None, years=None, crops=None):
+        return self._memoized('cells', metric, states=states, years=years, crops=crops)
+
+    def matrix(self, metric, rows, cols, states=None, years=None, crops=None):
+        return self._memoized('matrix', metric, rows, cols, states=states, years=years, crops=crops)
+
+    def reduce(self, measures, by=(), states=None, years=None, crops=None):
+        return self._memoized('reduce', tuple(measures), tuple(by), states=states, years=years, crops=crops)
+
+    def top(self, measure, by, k, ascending=False, states=None, years=None, crops=None):
+        return self._memoized('top', measure, by, k, ascending, states=states, years=years, crops=crops)
+
+
+def mean(sums, counts):
+    """Element-wise mean, NaN where there are no rows (like an empty Series.mean())"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.true_divide(sums, counts)
@@ -0,0 +1,233 @@
+# The question-answering core, without the web server: splitting and
+# parsing questions and computing their results from an aggregate cube.
+# query.py serves it over HTTP; ask.py answers from the command line and is
+# what cold-starting workers need, so nothing here imports Flask or pandas
+# (a cube is opened from the dataset's snapshot - see Engine.open()).
+import os
+import re
+
+from cube import AggregateCube
+from ingest import replay
+from loader import load_dataset, open_cube, save_cube
+from matcher import QueryMatcher
+from materialize import open_store
+from plan import Planner
+from results import SourceInfo
+from timeindex import TimeIndex
+
+DATA_FILE = os.environ.get('SAMARTH_DATA', 'merged_crop_rainfall.csv')
+
+# New State/Year/crop batches: drop CSVs here, or POST them to /admin/ingest.
+# Accepted ones are kept under processed/ and are part of the data from then on
+INGEST_DIR = os.environ.get('SAMARTH_INGEST_DIR', 'ingest')
+
+
+class Engine:
+    """What answering questions about one version of the data takes
+
+    The aggregate cube, the matcher and year index compiled from its
+    labels, and the precomputed answers for it (if materialize.py built
+    them). query.Snapshot adds the rows themselves for the web app.
+    """
+
+    def __init__(self, cube, answers=None, dataset=None):
+        # State x Year x crop aggregates every answer slices
+        self.cube = cube
+
+        # Path of the dataset the cube was built from, named in source answers
+        self.dataset = dataset
+
+        # Entity/keyword automaton used by parse_query, compiled from the same data
+        self.matcher = QueryMatcher(self.cube.labels['State'][self.cube.state_order],
+                                    self.cube.labels['crop'], self.cube.labels['Year'])
+
+        # Sorted years, for resolving "2010 to 2013", "last 3 years", ...
+        self.time_index = TimeIndex(self.cube.labels['Year'])
+
+        # Precomputed answers (materialize.py) for exactly this data, if built
+        self.answers = answers
+
+    @classmethod
+    def open(cls, path=DATA_FILE, ingest_dir=INGEST_DIR):
+        """Engine for the dataset at ``path``, reading only its aggregates when it has a current snapshot
+
+        Without one the rows are loaded once to build the snapshot and cube,
+        and later starts take the fast path. Batches ingested under
+        ``ingest_dir`` are added as query.load_data() adds them, so answers
+        match the server's; pass ``ingest_dir=None`` for the dataset alone.
+        """
+        cube = open_cube(path)
+        if cube is None:
+            cube = AggregateCube(load_dataset(path))
+            save_cube(path, cube)
+        batches = replay(ingest_dir) if ingest_dir else []
+        for _, batch in batches:
+            cube = cube.extend(batch)
+        # Precomputed answers only describe the dataset file
+        return cls(cube, None if batches else open_store(path), dataset=path)
+
+    def result(self, params, view=None):
+        """The precomputed result for params if materialize.py stored one, else the live one"""
+        if self.answers is not None:
+            result = self.answers.get(params)
+            if result is not None:
+                return result
+        return planner.run(params, view if view is not None else self.cube)
+
+
+# ============= QUERY SPLITTING ENGINE =============
+
+def split_compound_query(question):
+    """Split a compound question into multiple sub-queries with context preservation"""
+    question_lower = question.lower()
+
+    # Check if asking about data source - handle separately
+    asks_source = any(phrase in question_lower for phrase in [
+        'where', 'data came from', 'source', 'from where', 'data source'
+    ])
+
+    # If asking about source, split it out as a separate query
+    source_query = None
+    main_question = question
+
+    if asks_source:
+        # Extract the source question part
+        source_patterns = [
+            r'(and\s+)?(also\s+)?mention\s+where.*',
+            r'(and\s+)?(also\s+)?where.*came\s+from',
+            r'(and\s+)?(also\s+)?what.*source',
+        ]
+
+        for pattern in source_patterns:
+            match = re.search(pattern, question_lower)
+            if match:
+                source_query = "where does the data come from"
+                main_question = question[:match.start()].strip()
+                break
+
+    # Now check if the main question has multiple distinct queries
+    # Be conservative - only split on clear separators when queries are actually independent
+
+    # Pattern 1: "Do X. Then do Y" or "Do X; do Y" (clear independent queries)
+    if re.search(r'\.\s+[A-Z]', main_question) or ';' in main_question:
+        queries = re.split(r'[.;]\s+', main_question)
+        queries = [q.strip() for q in queries if q.strip()]
+
+    # Pattern 2: Look for "at the same time" - this indicates ONE compound query, not multiple
+    elif 'at the same time' in question_lower:
+        queries = [main_question]
+
+    # Pattern 3: "and also" or "also" at sentence level (but NOT within a comparison)
+    elif re.search(r'\.\s+(and\s+)?also\s+', question_lower):
+        queries = re.split(r'\.\s+(and\s+)?also\s+', main_question)
+        queries = [q.strip() for q in queries if q.strip() and len(q) > 3]
+
+    else:
+        # Single query - keep it together
+        queries = [main_question]
+
+    # Add source query at the end if it was found
+    if source_query:
+        queries.append(source_query)
+
+    return queries
+
+
+# ============= QUERY PROCESSING ENGINE =============
+
+def parse_query(question, snap):
+    """Parse natural language question and extract intent, using the matcher and years of ``snap`` (an Engine)"""
+    matcher = snap.matcher
+    found = matcher.match(question)
+    mentioned_states = found['states']
+    mentioned_crops = found['crops']
+    years = found['years']
+
+    # A range or relative period adds every year of the data it covers
+    period = None
+    if found['period']:
+        span = snap.time_index.resolve(found['period'])
+        years = years + [year for year in span if year not in years]
+        period = [span[0], span[-1]]
+
+    # Check for data source query
+    if found['source']:
+        return {
+            'type': 'source',
+            'states': mentioned_states,
+            'crops': mentioned_crops,
+            'years': years if years else None,
+            'period': period,
+            'metric': None,
+            # The file name only: params are returned to API clients
+            'dataset': os.path.basename(snap.dataset) if snap.dataset else None,
+        }
+
+    # "top 0 states" asks for nothing; don't quietly answer the default TOP_K
+    if found['k'] is not None and found['k'] < 1:
+        raise ValueError(f"Ask for at least 1 result (e.g. \"top 3\"), not {found['k']}")
+
+    # Determine query type
+    query_type = matcher.intent(found)
+
+    # Determine primary metric(s)
+    asks_rainfall = 'Rainfall' in found['metrics']
+    asks_production = 'Production' in found['metrics']
+    asks_both = found['both']
+
+    # Determine metric
+    if asks_both or (asks_rainfall and asks_production):
+        metric = 'Both'  # Special flag for queries asking about both
+    elif asks_rainfall:
+        metric = 'Rainfall'
+    else:
+        metric = 'Production'
+
+    return {
+        'type': query_type,
+        'states': mentioned_states,
+        'crops': mentioned_crops,
+        'years': years if years else None,
+        'period': period,
+        'metric': metric,
+        'asks_both': asks_both or (asks_rainfall and asks_production),
+        'k': found['k'],
+        'by': found['dimension']
+    }
+
+
+# ============= RESULT COMPUTATION =============
+
+def compute_source(params, view):
+    """Facts about the loaded dataset (its file is the one the question was parsed against)"""
+    return SourceInfo(
+        portal='data.gov.in',
+        website='https://data.gov.in',
+        dataset=params.get('dataset') or 'unknown',
+        first_year=view.labels['Year'][0],
+        last_year=view.labels['Year'][-1],
+        states=len(view.labels['State']),
+        crops=len(view.labels['crop']),
+        records=view.rows,
+    )
+
+
+# Compiles parsed params into filter -> aggregate -> rank/project plans over
+# the cube, cached by the shape of the question
+planner = Planner(kernels={'source': compute_source})
+
+
+# ============= COMPOUND ANSWERS =============
+
+def iter_multi_answer(answers):
+    """Yield the combined text answer for ``(sub_question, chunks)`` pairs"""
+    yield f"╔═══════════════════════════════════════════════════════════╗\n"
+    yield f"║  MULTI-QUERY RESPONSE ({len(answers)} questions detected)\n"
+    yield f"╚═══════════════════════════════════════════════════════════╝\n\n"
+
+    for i, (q, chunks) in enumerate(answers, 1):
+        yield f"\n{'=' * 63}\n"
+        yield f"QUERY {i}: {q}\n"
+        yield f"{'=' * 63}\n\n"
+        yield from chunks
+        yield "\n"
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# Alternative names for states and crops, mapped to the names used in the
+# data. Entries whose target is not in the loaded data are ignored, so the
+# tables can list more than any one dataset contains. Extend them without a
+# code change by pointing SAMARTH_ALIASES at a JSON file of the same shape,
+# e.g. {"states": {"<district>": "<state>"}, "crops": {"<variety>": "<crop>"}}
+STATE_ALIASES = {
+    'tamilnadu': 'Tamil Nadu',
+    'orissa': 'Odisha',
+    'uttaranchal': 'Uttarakhand',
+    'pondicherry': 'Puducherry',
+    'bengal': 'West Bengal',
+    'kashmir': 'Jammu and Kashmir',
+    'chattisgarh': 'Chhattisgarh',
+}
+
+CROP_ALIASES = {
+    'paddy': 'Rice',
+    'dhan': 'Rice',
+    'chawal': 'Rice',
+    'gehun': 'Wheat',
+    'sugar cane': 'Sugarcane',
+    'ganna': 'Sugarcane',
+    'pulse': 'Pulses',
+    'dal': 'Pulses',
+    'dals': 'Pulses',
+    'lentils': 'Pulses',
+    'kapas': 'Cotton',
+}
+
+# Abbreviations are only taken when written in capitals ("UP", not "up")
+STATE_ABBREVIATIONS = {
+    'UP': 'Uttar Pradesh',
+    'MP': 'Madhya Pradesh',
+    'AP': 'Andhra Pradesh',
+    'HP': 'Himachal Pradesh',
+    'TN': 'Tamil Nadu',
+    'WB': 'West Bengal',
+    'JK': 'Jammu and Kashmir',
+    'J&K': 'Jammu and Kashmir',
+}
+
+# Minimum trigram similarity (Dice coefficient, 0-1) to accept a fuzzy match
+FUZZY_THRESHOLD = 0.6
+
+# Words shorter than this are never matched fuzzily
+FUZZY_MIN_LENGTH = 4
+
+# Mentions shorter than FUZZY_SHORT_LENGTH need FUZZY_SHORT_THRESHOLD: in a
+# short word one extra letter shifts the score a lot ("price" and "rice"
+# score 0.62, the misspelling "Kerla" and "Kerala" 0.67)
+FUZZY_SHORT_LENGTH = 6
+FUZZY_SHORT_THRESHOLD = 0.65
+
+# A mention and a name differing in length by more than this ratio are
+# different words, however many trigrams they share ("Pradesh" is half of
+# every "... Pradesh")
+FUZZY_LENGTH_RATIO = 0.75
+
+# Longest run of words tried as one fuzzy mention ("uttar pradsh")
+FUZZY_MAX_WORDS = 3
+
+# Common question words that are never entity mentions, so aren't looked up
+STOPWORDS = frozenset('''
+    about across also among and are between both by can compare data did does each for from give grown had has
+    have how in is it its list me most of on or over per please show state states tell than that the their
+    them there these this those to top was were what when where which while who with year years crop crops
+'''.split())
+
+
+def load_aliases(path=None):
+    """``(state_aliases, crop_aliases)``: the built-in tables plus those in ``path`` (or $SAMARTH_ALIASES)"""
+    states, crops = dict(STATE_ALIASES), dict(CROP_ALIASES)
+    path = path or os.environ.get('SAMARTH_ALIASES')
+    if path:
+        with open(path) as f:
+            extra = json.load(f)
+        states.update({k.lower(): v for k, v in extra.get('states', {}).items()})
+        crops.update({k.lower(): v for k, v in extra.get('crops', {}).items()})
+    return states, crops
+
+
+def compact(text):
+    """Lowercase letters and digits only: 'Tamil Nadu' and 'tamilnadu' compact alike"""
+    return re.sub(r'[^0-9a-z]', '', text.lower())
+
+
+def trigrams(key):
+    """Character trigrams of a compacted name, padded so its start and end count too"""
+    padded = f"$${key}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NGramIndex:
+    """Trigram inverted index over names, for resolving misspelled mentions
+
+    Built once from (name, payload) pairs. A lookup only reads the posting
+    lists of the mention's own trigrams, so it touches the names sharing
+    some of them rather than every name: gazetteers of many thousands of
+    districts or crop varieties cost about as much as a few dozen states.
+    """
+
+    def __init__(self, names):
+        self.payloads = []
+        self.exact = {}
+        sizes = []
+        lengths = []
+        postings = defaultdict(list)
+
+        for name, payload in names:
+            key = compact(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, payload)
+            grams = trigrams(key)
+            for gram in grams:
+                postings[gram].append(len(self.payloads))
+            self.payloads.append(payload)
+            sizes.append(len(grams))
+            lengths.append(len(key))
+
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self.lengths = np.array(lengths, dtype=np.int32)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def lookup(self, mention, threshold=FUZZY_THRESHOLD):
+        """``(payload, score)`` of the closest name to ``mention``, or ``(None, score)`` if none is close enough
+
+        Names too different in length don't count (FUZZY_LENGTH_RATIO),
+        short mentions need FUZZY_SHORT_THRESHOLD rather than ``threshold``,
+        and a mention equally close to names of two different payloads is
+        ambiguous, so matches neither.
+        """
+        key = compact(mention)
+        if key in self.exact:
+            return self.exact[key], 1.0
+
+        grams = trigrams(key)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return None, 0.0
+
+        ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        scores = 2.0 * shared / (len(grams) + self.sizes[ids])
+        lengths = self.lengths[ids]
+        scores[np.minimum(lengths, len(key)) < FUZZY_LENGTH_RATIO * np.maximum(lengths, len(key))] = 0.0
+
+        best = int(scores.argmax())
+        score = float(scores[best])
+        if len(key) < FUZZY_SHORT_LENGTH:
+            threshold = max(threshold, FUZZY_SHORT_THRESHOLD)
+        if score == 0.0 or score < threshold:
+            return None, score
+        payload = self.payloads[ids[best]]
+        if any(self.payloads[i] != payload for i in ids[scores == scores[best]].tolist()):
+            return None, score
+        return payload, score
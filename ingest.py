@@ -0,0 +1,181 @@
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+
+# pandas is imported by the functions that read batches, so replaying an
+# empty ingest directory (as ask.py does on every start) doesn't pay for it
+
+REQUIRED_COLUMNS = ('State', 'Year', 'crop', 'Production', 'Rainfall')
+
+# Sub-directories of the ingest directory
+PROCESSED = 'processed'
+FAILED = 'failed'
+
+log = logging.getLogger(__name__)
+
+
+def validate_batch(df):
+    """Check and normalize a batch of new State/Year/crop rows"""
+    import pandas as pd
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    df = df[list(REQUIRED_COLUMNS)].copy()
+    df['State'] = df['State'].astype(str).str.strip()
+    df['crop'] = df['crop'].astype(str).str.strip()
+    for column in ('Year', 'Production', 'Rainfall'):
+        df[column] = pd.to_numeric(df[column], errors='raise')
+
+    if df.isna().any().any():
+        raise ValueError("Batch has empty values")
+    if len(df) == 0:
+        raise ValueError("Batch has no rows")
+    if (df['Year'] % 1 != 0).any():
+        raise ValueError("Year must be a whole number")
+    for column in ('Production', 'Rainfall'):
+        if (df[column] < 0).any():
+            raise ValueError(f"{column} can't be negative")
+
+    df['Year'] = df['Year'].astype(int)
+    return df.reset_index(drop=True)
+
+
+def read_batch(path):
+    """Read and validate a CSV batch file"""
+    import pandas as pd
+
+    return validate_batch(pd.read_csv(path))
+
+
+def batch_from_csv(text):
+    """Validate a batch given as CSV text (e.g. an uploaded request body)"""
+    import pandas as pd
+
+    return validate_batch(pd.read_csv(io.StringIO(text)))
+
+
+def batch_from_records(records):
+    """Validate a batch given as a list of row dicts (e.g. a JSON request body)"""
+    import pandas as pd
+
+    return validate_batch(pd.DataFrame.from_records(records))
+
+
+def stamped(name):
+    """Prefix a file name with the ingest time so processed/ sorts in ingest order"""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10 ** 9:09d}-{name}"
+
+
+def persist_batch(df, directory):
+    """Store an accepted batch under ``directory``/processed so it is replayed on restart"""
+    target = os.path.join(directory, PROCESSED)
+    os.makedirs(target, exist_ok=True)
+    name = stamped('api.csv')
+    tmp = os.path.join(target, '.' + name)
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(target, name))
+    return os.path.join(target, name)
+
+
+def processed_names(directory):
+    """Names of the accepted batches under ``directory``/processed, oldest first"""
+    target = os.path.join(directory, PROCESSED)
+    if not os.path.isdir(target):
+        return []
+    return sorted(name for name in os.listdir(target) if name.endswith('.csv') and not name.startswith('.'))
+
+
+def replay(directory, skip=()):
+    """``(name, batch)`` for every previously ingested batch not in ``skip``, oldest first"""
+    return [(name, read_batch(os.path.join(directory, PROCESSED, name)))
+            for name in processed_names(directory) if name not in skip]
+
+
+class IngestWatcher(threading.Thread):
+    """Background thread that ingests CSV files dropped into a directory
+
+    Every ``interval`` seconds the directory is scanned for ``*.csv`` files
+    (oldest name first). Each file is validated, moved to ``processed/`` and
+    handed to ``apply(batch, name)``; files that fail go to ``failed/``.
+    With ``apply=None`` files are only validated and filed, for processes
+    that leave applying them to a BatchFollower. Files starting with a dot
+    are ignored so writers can upload under a temporary name and rename
+    when done.
+    """
+
+    def __init__(self, directory, apply, interval=5.0):
+        super().__init__(name='ingest-watcher', daemon=True)
+        self.directory = directory
+        self.apply = apply
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def poll(self):
+        """Ingest whatever is waiting in the directory; returns the files handled"""
+        os.makedirs(self.directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.endswith('.csv') and not name.startswith('.'))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            processed = os.path.join(self.directory, PROCESSED, stamped(name))
+            try:
+                batch = read_batch(path)
+                # Record the batch before applying it, so a crash in between is
+                # healed by replay() on the next start rather than lost
+                os.makedirs(os.path.dirname(processed), exist_ok=True)
+                shutil.move(path, processed)
+                if self.apply is not None:
+                    self.apply(batch, os.path.basename(processed))
+            except Exception as e:
+                log.warning("Ingest of %s failed: %s", name, e)
+                failed = os.path.join(self.directory, FAILED)
+                os.makedirs(failed, exist_ok=True)
+                shutil.move(processed if os.path.exists(processed) else path, os.path.join(failed, name))
+        return names
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+
+class BatchFollower(threading.Thread):
+    """Background thread that applies batches other processes add to ``directory``/processed
+
+    Lets several server processes share one ingest log: whichever process
+    accepts a batch files it under processed/, and every process applies
+    each name not yet in ``applied()`` through ``apply(batch, name)``.
+    """
+
+    def __init__(self, directory, apply, applied, interval=5.0):
+        super().__init__(name='batch-follower', daemon=True)
+        self.directory = directory
+        self.apply = apply
+        self.applied = applied
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def poll(self):
+        """Apply whatever batches are new; returns their names"""
+        names = []
+        for name, batch in replay(self.directory, skip=self.applied()):
+            self.apply(batch, name)
+            names.append(name)
+        return names
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                log.exception("Following ingested batches failed")
@@ -0,0 +1,315 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from cube import CUBE_VERSION, AggregateCube
+
+# pandas is imported by the functions that handle rows, so opening just the
+# aggregates of a snapshot (open_cube) doesn't pay for importing it
+
+# Typed schema of the merged dataset
+CATEGORY_COLUMNS = ('State', 'crop')
+YEAR_COLUMN = 'Year'
+MEASURE_COLUMNS = ('Production', 'Rainfall')
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# Subdirectory of a snapshot holding its AggregateCube
+CUBE_DIR = 'cube'
+
+
+def narrow_float(values):
+    """float32 when every value survives the round trip exactly, else float64
+
+    Sums are accumulated in float64 either way; this only avoids storing
+    float32 values that would print differently from the source data.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+        return narrow
+    return values
+
+
+def code_dtype(n):
+    """Smallest signed integer type able to hold category codes 0..n-1 (and -1)"""
+    return np.int8 if n < 2 ** 7 else np.int16 if n < 2 ** 15 else np.int32
+
+
+def typed(df):
+    """Cast a raw frame to the compact schema: categoricals, int16 years, narrow floats"""
+    import pandas as pd
+
+    columns = {}
+    for name in CATEGORY_COLUMNS:
+        categories = sorted(df[name].dropna().unique())
+        columns[name] = pd.Categorical(df[name], categories=categories)
+    columns[YEAR_COLUMN] = df[YEAR_COLUMN].to_numpy(dtype=np.int16)
+    for name in MEASURE_COLUMNS:
+        columns[name] = narrow_float(df[name])
+    return pd.DataFrame(columns)
+
+
+# ============= SOURCE FORMATS =============
+
+def read_csv(path, mmap=True):
+    import pandas as pd
+
+    return typed(pd.read_csv(path))
+
+
+def read_parquet(path, mmap=True):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet datasets requires pyarrow (pip install pyarrow)")
+    return typed(pq.read_table(path, memory_map=mmap).to_pandas())
+
+
+def read_arrow(path, mmap=True):
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        raise ImportError("Reading Arrow/Feather datasets requires pyarrow (pip install pyarrow)")
+    source = pa.memory_map(path) if mmap else path
+    return typed(feather.read_table(source).to_pandas())
+
+
+def read_snapshot(path, mmap=True):
+    """Open a snapshot directory written by write_snapshot()
+
+    Column arrays are memory-mapped read-only, so worker processes opening
+    the same snapshot share its pages through the OS page cache.
+    """
+    import pandas as pd
+
+    # Every file comes from the same version, even if a new one is published meanwhile
+    path = os.path.realpath(path)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {meta.get('version')!r} in {path}")
+
+    mode = 'r' if mmap else None
+    columns = {}
+    for name, spec in meta['columns'].items():
+        values = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+        if spec['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, categories=spec['categories'], validate=False)
+        columns[name] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+LOADERS = {
+    '.csv': read_csv,
+    '.parquet': read_parquet,
+    '.arrow': read_arrow,
+    '.feather': read_arrow,
+    SNAPSHOT_SUFFIX: read_snapshot,
+}
+
+
+def register_loader(suffix, reader):
+    """Plug in a reader ``reader(path, mmap=True) -> DataFrame`` for a file suffix"""
+    LOADERS[suffix.lower()] = reader
+
+
+# ============= SNAPSHOTS =============
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+
+
+def publish(tmp, path):
+    """Make the finished directory ``tmp`` visible as ``path`` in one step
+
+    ``path`` is a symlink to the current version, swapped with
+    os.replace(), so a reader resolving it sees either the old version or
+    the new one, never a missing or half-replaced directory. The version
+    replaced is kept (linked from previous_path()) until the next publish,
+    so a reader that resolved ``path`` just before the swap can still open
+    its files. ``tmp`` must be in the same directory as ``path``.
+    """
+    link = tmp + '.link'
+    os.symlink(os.path.basename(tmp), link)
+    old = os.path.realpath(path) if os.path.islink(path) else None
+    try:
+        try:
+            os.replace(link, path)
+        except OSError:
+            # A plain directory (written before versions were symlinked) can't be replaced by a link
+            if os.path.islink(path) or not os.path.isdir(path):
+                raise
+            old = tmp + '.old'
+            os.rename(path, old)
+            os.replace(link, path)
+    except BaseException:
+        os.unlink(link)
+        raise
+    if old is None:
+        return
+
+    previous = previous_path(path)
+    stale = os.path.realpath(previous) if os.path.islink(previous) else None
+    os.symlink(os.path.basename(old), link)
+    os.replace(link, previous)
+    if stale is not None and stale not in (old, os.path.realpath(tmp)):
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def previous_path(path):
+    """The link publish() keeps to the version ``path`` pointed to before the last publish"""
+    return os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.previous')
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'source': os.path.basename(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def write_snapshot(df, path, source=None):
+    """Write ``df`` (already typed) as one .npy file per column plus meta.json
+
+    The aggregate cube of the rows is saved with them (in cube/), so
+    processes that only answer questions can start from it directly. The
+    snapshot is built in a new directory and then published (see
+    publish()), so concurrently starting workers never see a half-written
+    one.
+    """
+    import pandas as pd
+
+    if not isinstance(df[CATEGORY_COLUMNS[0]].dtype, pd.CategoricalDtype):
+        df = typed(df)
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp = tempfile.mkdtemp(prefix='.snapshot-', dir=parent)
+
+    try:
+        meta = {'version': SNAPSHOT_VERSION, 'rows': len(df), 'columns': {}}
+        if source:
+            meta.update(source_signature(source))
+
+        for name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                categories = list(column.cat.categories)
+                codes = column.cat.codes.to_numpy().astype(code_dtype(len(categories)))
+                np.save(os.path.join(tmp, f'{name}.npy'), codes)
+                meta['columns'][name] = {'kind': 'category', 'categories': categories}
+            else:
+                values = column.to_numpy()
+                np.save(os.path.join(tmp, f'{name}.npy'), values)
+                meta['columns'][name] = {'kind': 'numeric', 'dtype': str(values.dtype)}
+
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2, default=lambda v: v.item())
+        cube = tempfile.mkdtemp(prefix='.cube-', dir=tmp)
+        AggregateCube(df).save(cube)
+        publish(cube, os.path.join(tmp, CUBE_DIR))
+        publish(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def snapshot_is_current(snapshot, source):
+    try:
+        with open(os.path.join(snapshot, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    signature = source_signature(source)
+    return (meta.get('version') == SNAPSHOT_VERSION
+            and all(meta.get(key) == value for key, value in signature.items()))
+
+
+def cube_is_current(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f).get('version') == CUBE_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def open_cube(path, mmap=True):
+    """The aggregate cube saved with the snapshot of the dataset at ``path``, or None
+
+    None when there is no current snapshot, or its cube is missing or was
+    saved in an older layout (see save_cube()). Nothing else is read, so
+    this is how workers and the command line get ready to answer quickly.
+    """
+    if os.path.isdir(path):
+        snapshot = path
+    else:
+        snapshot = snapshot_path(path)
+        if not snapshot_is_current(snapshot, path):
+            return None
+    cube = os.path.realpath(os.path.join(snapshot, CUBE_DIR))
+    if not cube_is_current(cube):
+        return None
+    return AggregateCube.open(cube, mmap=mmap)
+
+
+def save_cube(path, cube):
+    """Add ``cube`` to the current snapshot of the dataset at ``path`` (best effort, like building one)
+
+    A cube saved in an older layout is replaced, through publish().
+    """
+    snapshot = os.path.realpath(path if os.path.isdir(path) else snapshot_path(path))
+    target = os.path.join(snapshot, CUBE_DIR)
+    if not os.path.isdir(snapshot) or cube_is_current(target):
+        return
+    try:
+        tmp = tempfile.mkdtemp(prefix='.cube-', dir=snapshot)
+    except OSError:
+        return
+    try:
+        cube.save(tmp)
+        publish(tmp, target)
+    except OSError:
+        # Read-only, or another process saved it first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_dataset(path, mmap=True, use_snapshot=True):
+    """Load a dataset in any registered format as a typed DataFrame
+
+    For source files (CSV, Parquet, ...) a memory-mappable snapshot is
+    built next to the file on first use and reused until the source
+    changes; pass ``use_snapshot=False`` to always parse the source.
+    """
+    suffix = SNAPSHOT_SUFFIX if os.path.isdir(path) else os.path.splitext(path)[1].lower()
+    reader = LOADERS.get(suffix)
+    if reader is None:
+        raise ValueError(f"Don't know how to load {path!r}; known formats: {', '.join(sorted(LOADERS))}")
+
+    if reader is read_snapshot or not use_snapshot:
+        return reader(path, mmap=mmap)
+
+    snapshot = snapshot_path(path)
+    if not snapshot_is_current(snapshot, path):
+        try:
+            write_snapshot(reader(path, mmap=mmap), snapshot, source=path)
+        except OSError:
+            # Read-only deployment directory: serve straight from the source
+            return reader(path, mmap=mmap)
+    return read_snapshot(snapshot, mmap=mmap)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python loader.py DATASET [SNAPSHOT_DIR]")
+        sys.exit(1)
+
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else snapshot_path(source)
+    df = LOADERS[os.path.splitext(source)[1].lower()](source)
+    write_snapshot(df, target, source=source)
+    print(f"Wrote {len(df):,} rows to {target}")
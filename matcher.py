@@ -0,0 +1,303 @@
+import re
+from collections import deque
+
+from fuzzy import (FUZZY_MAX_WORDS, FUZZY_MIN_LENGTH, FUZZY_THRESHOLD, STATE_ABBREVIATIONS, STOPWORDS, NGramIndex,
+                   compact, load_aliases)
+
+# Intent keywords in precedence order - the first entry with a hit wins.
+# Asking how two measures relate ("correlation between rainfall and
+# production", "the relation between ...", "does rainfall affect ...")
+# outranks the generic compare word "between"
+INTENT_KEYWORDS = [
+    ('correlation', ['correlation', 'correlate', 'correlated', 'relation', 'relationship', 'affect', 'affected',
+                     'impact', 'impacted', 'depend', 'dependent', 'dependence']),
+    ('highest', ['highest', 'maximum', 'most', 'top', 'largest', 'best']),
+    ('lowest', ['lowest', 'minimum', 'least', 'smallest', 'worst', 'bottom']),
+    ('compare', ['compare', 'compared', 'comparing', 'comparison', 'versus', 'vs', 'difference', 'between']),
+    ('average', ['average', 'mean', 'avg']),
+    ('total', ['total', 'sum', 'overall']),
+    ('trend', ['trend', 'over time', 'yearly', 'year by year', 'every year', 'each year', 'growth']),
+    ('list', ['list', 'listed', 'show all', 'what are']),
+]
+
+METRIC_KEYWORDS = [
+    ('Rainfall', ['rainfall', 'rain', 'precipitation']),
+    ('Production', ['production', 'produce', 'produced', 'crop', 'yield']),
+]
+
+SOURCE_PHRASES = ['source', 'data came from', 'where', 'from where']
+
+RANK_WORDS = r'(?:top|bottom|highest|lowest|best|worst|largest|smallest|biggest)'
+
+# How many rows a ranking asks for: "top 10", "10 highest"
+RANK_SIZE = re.compile(rf'\b{RANK_WORDS}\s+(\d{{1,3}})\b|\b(\d{{1,3}})\s+{RANK_WORDS}\b')
+
+# What is being ranked: "which crop", "top 10 states", "highest producing years"
+RANK_DIMENSION = re.compile(
+    rf'\b(?:which|what|{RANK_WORDS}(?:\s+\d{{1,3}})?|\d{{1,3}}\s+{RANK_WORDS})\s+(?:\w+ing\s+)?(state|crop|year)s?\b')
+DIMENSION_NAMES = {'state': 'State', 'crop': 'crop', 'year': 'Year'}
+BOTH_PHRASES = ['at the same time', 'also']
+
+# Words of a question, as candidates for fuzzy entity matching
+WORD = re.compile(r'[a-z0-9&]+')
+
+YEAR = r'((?:19|20)\d{2})'
+
+# Year ranges and relative periods, tried in order; the first match is the
+# question's period. Each maps its groups to {'first', 'last'} bounds or to
+# the {'latest'} n years of the data
+PERIOD_PATTERNS = [
+    (re.compile(rf'\bbetween\s+{YEAR}\s+and\s+{YEAR}\b'),
+     lambda a, b: {'first': min(int(a), int(b)), 'last': max(int(a), int(b))}),
+    (re.compile(rf'\b(?:from\s+)?{YEAR}\s*(?:-|–|to|through|till|until)\s*{YEAR}\b'),
+     lambda a, b: {'first': min(int(a), int(b)), 'last': max(int(a), int(b))}),
+    (re.compile(r'\b(?:last|past|previous|recent)\s+(\d{1,3})\s+years\b'), lambda n: {'latest': int(n)}),
+    (re.compile(r'\b(?:last|past|previous)\s+(year|decade)\b'),
+     lambda unit: {'latest': 10 if unit == 'decade' else 1}),
+    (re.compile(rf'\b(?:since|from)\s+{YEAR}\b'), lambda a: {'first': int(a), 'last': None}),
+    (re.compile(rf'\bafter\s+{YEAR}\b'), lambda a: {'first': int(a) + 1, 'last': None}),
+    (re.compile(rf'\b(?:until|till|up\s+to|through)\s+{YEAR}\b'), lambda a: {'first': None, 'last': int(a)}),
+    (re.compile(rf'\bbefore\s+{YEAR}\b'), lambda a: {'first': None, 'last': int(a) - 1}),
+]
+
+
+def is_word_char(ch):
+    """Same notion of a word character as the regex \\w class"""
+    return ch.isalnum() or ch == '_'
+
+
+def find_period(text):
+    """``(period, text)``: the first year range in ``text``, and ``text`` with it blanked out
+
+    Blanking keeps the years and connecting words of a range from being read
+    again as literal years or keywords ("between" is also a compare word).
+    """
+    for pattern, period in PERIOD_PATTERNS:
+        found = pattern.search(text)
+        if found:
+            start, end = found.span()
+            return period(*found.groups()), text[:start] + ' ' * (end - start) + text[end:]
+    return None, text
+
+
+def word_forms(word):
+    """A keyword and its plural form, e.g. crop -> crops"""
+    return [word, word + 's'] if word[-1].isalpha() else [word]
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher that finds every pattern in one pass"""
+
+    def __init__(self, patterns):
+        # patterns: {pattern: [payload, ...]}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for pattern, payloads in patterns.items():
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nxt
+            self.output[node].append((len(pattern), payloads))
+
+        # Breadth-first pass to wire failure links and inherit suffix outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """Yield ``(start, end, payloads)`` for every pattern occurrence in ``text``"""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, payloads in self.output[node]:
+                yield i + 1 - length, i + 1, payloads
+
+
+class QueryMatcher:
+    """Entity and keyword recognizer for questions, compiled once per dataset
+
+    States, crops and years from the data plus every intent, metric and
+    source keyword are folded into a single automaton, so parsing a question
+    is one pass over its text regardless of how many entities are known.
+    Matches must sit on word boundaries ("vs" does not match inside "canvas").
+
+    Known aliases ("Tamilnadu", "paddy") are part of the same automaton and
+    capitalized abbreviations ("UP") are matched alongside it. Words left
+    over after that are looked up in a trigram index of every name, so
+    misspelled states and crops ("Maharastra") still resolve when they are
+    close enough to ``fuzzy_threshold``; pass None to turn that off.
+    """
+
+    def __init__(self, states, crops, years, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.states = list(states)
+        self.crops = list(crops)
+        self.years = [int(y) for y in years]
+
+        patterns = {}
+
+        def add(pattern, payload):
+            patterns.setdefault(pattern.lower(), []).append(payload)
+
+        for i, state in enumerate(self.states):
+            for form in word_forms(state.lower()):
+                add(form, ('state', i))
+        for i, crop in enumerate(self.crops):
+            for form in word_forms(crop.lower()):
+                add(form, ('crop', i))
+        for year in self.years:
+            add(str(year), ('year', year))
+
+        state_positions = {state: i for i, state in enumerate(self.states)}
+        crop_positions = {crop: i for i, crop in enumerate(self.crops)}
+        state_aliases, crop_aliases = load_aliases()
+        state_aliases = {alias: state_positions[state] for alias, state in state_aliases.items()
+                         if state in state_positions}
+        crop_aliases = {alias: crop_positions[crop] for alias, crop in crop_aliases.items() if crop in crop_positions}
+        for alias, i in state_aliases.items():
+            add(alias, ('state', i))
+        for alias, i in crop_aliases.items():
+            for form in word_forms(alias):
+                add(form, ('crop', i))
+
+        self.abbreviations = {abbreviation: state_positions[state]
+                              for abbreviation, state in STATE_ABBREVIATIONS.items() if state in state_positions}
+        self.abbreviation_pattern = re.compile(
+            r'(?<![\w&])(' + '|'.join(map(re.escape, sorted(self.abbreviations, key=len, reverse=True))) + r')(?![\w&])'
+        ) if self.abbreviations else None
+
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy = NGramIndex(
+            [(state, ('state', i)) for i, state in enumerate(self.states)]
+            + [(alias, ('state', i)) for alias, i in state_aliases.items()]
+            + [(crop, ('crop', i)) for i, crop in enumerate(self.crops)]
+            + [(alias, ('crop', i)) for alias, i in crop_aliases.items()]
+        ) if fuzzy_threshold is not None else None
+
+        for rank, (intent, words) in enumerate(INTENT_KEYWORDS):
+            for word in words:
+                for form in word_forms(word):
+                    add(form, ('intent', (rank, intent)))
+        for metric, words in METRIC_KEYWORDS:
+            for word in words:
+                for form in word_forms(word):
+                    add(form, ('metric', metric))
+        for phrase in SOURCE_PHRASES:
+            add(phrase, ('source', None))
+        for phrase in BOTH_PHRASES:
+            add(phrase, ('both', None))
+
+        self.automaton = AhoCorasick({p: list(dict.fromkeys(v)) for p, v in patterns.items()})
+
+    def match(self, question):
+        """Return every entity and keyword mentioned in ``question``
+
+        States and crops come back in dataset order, years in the order they
+        appear in the question. A year range or relative period comes back
+        unresolved as 'period' (see TimeIndex.resolve).
+        """
+        period, text = find_period(question.lower())
+        states, crops, years = set(), set(), []
+        intents, metrics = set(), set()
+        source = both = False
+        covered = []
+
+        for start, end, payloads in self.automaton.find(text):
+            if start > 0 and is_word_char(text[start - 1]):
+                continue
+            if end < len(text) and is_word_char(text[end]):
+                continue
+            covered.append((start, end))
+            for kind, value in payloads:
+                if kind == 'state':
+                    states.add(value)
+                elif kind == 'crop':
+                    crops.add(value)
+                elif kind == 'year':
+                    if value not in years:
+                        years.append(value)
+                elif kind == 'intent':
+                    intents.add(value)
+                elif kind == 'metric':
+                    metrics.add(value)
+                elif kind == 'source':
+                    source = True
+                elif kind == 'both':
+                    both = True
+
+        if self.abbreviation_pattern is not None:
+            for found in self.abbreviation_pattern.finditer(question):
+                states.add(self.abbreviations[found.group(1)])
+                covered.append(found.span())
+
+        if self.fuzzy is not None:
+            for kind, value in self.fuzzy_mentions(text, covered):
+                (states if kind == 'state' else crops).add(value)
+
+        size = RANK_SIZE.search(text)
+        dimension = RANK_DIMENSION.search(text)
+
+        return {
+            'k': int(size.group(1) or size.group(2)) if size else None,
+            'dimension': DIMENSION_NAMES[dimension.group(1)] if dimension else None,
+            'states': [self.states[i] for i in sorted(states)],
+            'crops': [self.crops[i] for i in sorted(crops)],
+            'years': years,
+            'period': period,
+            'intents': {intent for _, intent in intents},
+            'intent': min(intents)[1] if intents else 'general',
+            'metrics': metrics,
+            'source': source,
+            'both': both,
+        }
+
+    def fuzzy_mentions(self, text, covered):
+        """``(kind, index)`` for runs of unmatched words that closely resemble a state or crop name
+
+        Runs of up to FUZZY_MAX_WORDS adjacent words are scored, so a
+        misspelled two-word name counts as one mention. The best-scoring
+        mentions win and no word is used twice.
+        """
+        words = [found for found in WORD.finditer(text)]
+        free = [not found.group().isdigit() and found.group() not in STOPWORDS
+                and not any(start < found.end() and found.start() < end for start, end in covered)
+                for found in words]
+
+        candidates = []
+        for first in range(len(words)):
+            for last in range(first, min(first + FUZZY_MAX_WORDS, len(words))):
+                if not free[last]:
+                    break
+                mention = text[words[first].start():words[last].end()]
+                if len(compact(mention)) < FUZZY_MIN_LENGTH:
+                    continue
+                payload, score = self.fuzzy.lookup(mention, self.fuzzy_threshold)
+                if payload is not None:
+                    candidates.append((score, last - first, first, last, payload))
+
+        used = set()
+        for _, _, first, last, payload in sorted(candidates, reverse=True):
+            span = set(range(first, last + 1))
+            if not span & used:
+                used |= span
+                yield payload
+
+    def intent(self, found):
+        """Highest-precedence intent among the matched keywords"""
+        return found['intent']
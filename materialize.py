@@ -0,0 +1,222 @@
+# Offline answers for the most frequently asked question templates
+#
+#     python materialize.py merged_crop_rainfall.csv --workers 8
+#
+# Every template in TEMPLATES is expanded over all its entity values (each
+# crop, year, state pair, ...), the answers are computed once by the same
+# query plans the server runs, spread over worker processes, and written to
+# an on-disk store next to the dataset. The server memory-maps the store and
+# answers a matching question with one lookup, computing anything else live.
+import hashlib
+import itertools
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from cube import AggregateCube
+from loader import load_dataset, open_cube, publish, source_signature
+from plan import TOP_K, Planner, plan_shape
+
+STORE_VERSION = 2
+STORE_SUFFIX = '.answers'
+
+log = logging.getLogger(__name__)
+
+
+# ============= TEMPLATES =============
+
+def rankings(cube):
+    """Highest/lowest state by production or rainfall, overall and per crop, year and crop-year"""
+    crops = [None] + cube.labels['crop'].tolist()
+    years = [None] + cube.labels['Year'].tolist()
+    for intent, metric, crop, year in itertools.product(('highest', 'lowest'), ('Production', 'Rainfall'),
+                                                       crops, years):
+        yield {'type': intent, 'metric': metric, 'states': [], 'crops': [crop] if crop else [],
+               'years': [year] if year else None, 'by': 'State'}
+
+
+def comparisons(cube):
+    """Every pair of states on production, rainfall, and rainfall with top crops"""
+    states = cube.labels['State'][cube.state_order].tolist()
+    for (state1, state2), metric in itertools.product(itertools.combinations(states, 2),
+                                                      ('Production', 'Rainfall', 'Both')):
+        yield {'type': 'compare', 'metric': metric, 'asks_both': metric == 'Both', 'states': [state1, state2],
+               'crops': [], 'years': None}
+
+
+def top_crops(cube):
+    """Top crops of each state, overall and per year"""
+    states = cube.labels['State'][cube.state_order].tolist()
+    for state, year in itertools.product(states, [None] + cube.labels['Year'].tolist()):
+        yield {'type': 'list', 'metric': 'Production', 'states': [state], 'crops': [],
+               'years': [year] if year else None}
+
+
+TEMPLATES = {
+    'rankings': rankings,
+    'comparisons': comparisons,
+    'top_crops': top_crops,
+}
+
+
+def template_key(params):
+    """Key of the answer to ``params``: the plan shape plus the values bound into it
+
+    Parameters that don't change the answer (how the question was phrased,
+    a default spelled out or left implicit) don't change the key.
+    """
+    years = params.get('years') or ()
+    return (tuple(plan_shape(params)), tuple(params.get('states') or ()), tuple(sorted(years)),
+            tuple(params.get('crops') or ()), params.get('k') or TOP_K)
+
+
+def digest(key):
+    """64-bit hash of a template key, the sort order of the store"""
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), 'little')
+
+
+# ============= BUILD =============
+
+_worker = {}
+
+
+def start_worker(path):
+    """Open the dataset's cube once per worker process (memory-mapped, so its pages are shared)"""
+    cube = open_cube(path)
+    _worker['cube'] = cube if cube is not None else AggregateCube(load_dataset(path))
+    _worker['planner'] = Planner(kernels={})
+
+
+def answer_chunk(templates):
+    """``(digest, record)`` for each template that has an answer; records are pickled ``(key, result)``"""
+    answered = []
+    for params in templates:
+        try:
+            result = _worker['planner'].run(params, _worker['cube'])
+        except ValueError:
+            # No data for this combination: the live path reports that
+            continue
+        key = template_key(params)
+        answered.append((digest(key), pickle.dumps((key, result), protocol=pickle.HIGHEST_PROTOCOL)))
+    return answered
+
+
+def store_path(path):
+    return os.path.splitext(path)[0] + STORE_SUFFIX
+
+
+def build(path, out=None, workers=None, templates=TEMPLATES, chunk=256):
+    """Compute every template answer for the dataset at ``path`` and write the store
+
+    Layout (a directory, published like a dataset snapshot; see loader.publish()):
+    keys.npy holds the sorted digests, offsets.npy where each record starts
+    in answers.bin, and meta.json the dataset the answers were computed from.
+    """
+    # Only building needs worker processes; servers just open_store()
+    from concurrent.futures import ProcessPoolExecutor
+
+    out = out or store_path(path)
+    cube = AggregateCube(load_dataset(path))
+    params = [p for name in templates for p in templates[name](cube)]
+    chunks = [params[i:i + chunk] for i in range(0, len(params), chunk)]
+
+    records = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(path,)) as pool:
+        for answered in pool.map(answer_chunk, chunks):
+            for key, record in answered:
+                # A (vanishingly unlikely) digest collision keeps the first answer
+                records.setdefault(key, record)
+
+    keys = np.array(sorted(records), dtype=np.uint64)
+    sizes = [len(records[key]) for key in keys.tolist()]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.uint64)
+
+    parent = os.path.dirname(os.path.abspath(out))
+    tmp = tempfile.mkdtemp(prefix='.answers-', dir=parent)
+    try:
+        np.save(os.path.join(tmp, 'keys.npy'), keys)
+        np.save(os.path.join(tmp, 'offsets.npy'), offsets)
+        with open(os.path.join(tmp, 'answers.bin'), 'wb') as f:
+            for key in keys.tolist():
+                f.write(records[key])
+        meta = dict(source_signature(path), version=STORE_VERSION, rows=cube.rows, answers=len(keys),
+                    templates=sorted(templates))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        publish(tmp, out)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return out, len(params), len(keys)
+
+
+# ============= LOOKUP =============
+
+class AnswerStore:
+    """Read-only, memory-mapped view of a store written by build()
+
+    get() is a binary search over the digests and one unpickle of the
+    matching record; nothing else is read from disk.
+    """
+
+    def __init__(self, path):
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        blob = os.path.join(path, 'answers.bin')
+        self.blob = np.memmap(blob, dtype=np.uint8, mode='r') if os.path.getsize(blob) else b''
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, params):
+        """The stored result for ``params``, or None if it wasn't materialized"""
+        key = template_key(params)
+        h = np.uint64(digest(key))
+        i = int(np.searchsorted(self.keys, h))
+        if i < len(self.keys) and self.keys[i] == h:
+            stored, result = pickle.loads(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+            if stored == key:
+                self.hits += 1
+                return result
+        self.misses += 1
+        return None
+
+
+def open_store(path):
+    """The store built for the dataset at ``path``, if there is one and the dataset hasn't changed since"""
+    store = os.path.realpath(store_path(path))
+    try:
+        with open(os.path.join(store, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    signature = source_signature(path)
+    if meta.get('version') != STORE_VERSION or any(meta.get(k) != v for k, v in signature.items()):
+        log.warning("Ignoring %s: built for a different version of %s", store_path(path), path)
+        return None
+    return AnswerStore(store)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute answers for the hottest question templates")
+    parser.add_argument('dataset', nargs='?', default='merged_crop_rainfall.csv')
+    parser.add_argument('--out', help="store directory (default: next to the dataset)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--templates', nargs='+', choices=sorted(TEMPLATES), default=sorted(TEMPLATES))
+    args = parser.parse_args()
+
+    target, expanded, stored = build(args.dataset, args.out, args.workers,
+                                     {name: TEMPLATES[name] for name in args.templates})
+    print(f"Wrote {stored:,} answers ({expanded:,} templates expanded) to {target}")
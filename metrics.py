@@ -0,0 +1,193 @@
+import bisect
+import math
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Latency buckets in seconds (upper bounds); +Inf is implied
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ============= METRICS =============
+
+class Histogram:
+    """Latency histogram per value of one label, in the Prometheus data model
+
+    observe() is a bisect and three additions under a lock, cheap enough to
+    call for every stage of every request.
+    """
+
+    def __init__(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def time(self, label_value):
+        """Context manager that observes the time spent inside it"""
+        return Span(self, label_value)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+        for label_value in sorted(series):
+            counts, total, count = series[label_value]
+            label = f'{self.label}="{escape(label_value)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                yield f'{self.name}_bucket{{{label},le="{format_value(float(bound))}"}} {cumulative}'
+            yield f"{self.name}_sum{{{label}}} {format_value(total)}"
+            yield f"{self.name}_count{{{label}}} {count}"
+
+
+class Span:
+    __slots__ = ('histogram', 'label_value', 'started')
+
+    def __init__(self, histogram, label_value):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(self.label_value, time.perf_counter() - self.started)
+        return False
+
+
+class Gauge:
+    """Value read from ``read()`` at scrape time: a number, or a {label_value: number} dict"""
+
+    def __init__(self, name, help, read, label=None, type='gauge'):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label = label
+        self.type = type
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        value = self.read()
+        if isinstance(value, dict):
+            for label_value in sorted(value):
+                yield f'{self.name}{{{self.label}="{escape(label_value)}"}} {format_value(value[label_value])}'
+        else:
+            yield f"{self.name} {format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every registered metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ============= SAMPLING PROFILER =============
+
+class SamplingProfiler(threading.Thread):
+    """Samples the stacks of some threads every ``interval`` seconds until stopped
+
+    ``threads()`` returns the idents to sample and is re-read on every tick,
+    so workers that pick up part of the request are included. Costs nothing
+    unless started; results come out in the collapsed-stack format
+    ("thread;outer;inner;leaf count") that flame graph tools read.
+    """
+
+    def __init__(self, threads, interval=0.001):
+        super().__init__(name='sampling-profiler', daemon=True)
+        self.threads = threads
+        self.interval = interval
+        self.samples = Counter()
+        self.started_at = time.perf_counter()
+        self.elapsed = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in self.threads():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    if ident not in names:
+                        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    stack.append(names.get(ident, str(ident)))
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """The most recent ``maxsize`` profiles, by id"""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def add(self, profile):
+        with self._lock:
+            self._next_id += 1
+            self._profiles[str(self._next_id)] = profile
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+            return str(self._next_id)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
@@ -0,0 +1,680 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import NamedTuple
+
+import numpy as np
+
+from cube import DIMENSIONS, RAINFALL_YEARS, counted, mean, observations
+from ranking import rank
+from results import (Aggregate as AggregateResult, Comparison, CorrelationTable, Correlation, CropListing,
+                     CropRanking, Explain, Message, RainfallAndCrops, Ranking, Summary, Trend)
+from stats import pearson, spearman
+
+# Query plans: parse_query() output compiled into a short pipeline of
+# operators (filter -> aggregate -> rank/project) that runs against the
+# aggregate cube. Plans depend only on the shape of a question - its intent,
+# metric and which filters it has - never on the entity values, which are
+# bound from the params when the plan runs. So a compiled and optimized plan
+# is cached and reused by every question of the same shape.
+
+# Rows shown in a ranking unless the question asks for more ("top 10 states")
+TOP_K = 5
+
+# Cube dimension filtered by each params list
+FILTER_PARAMS = (('State', 'states'), ('Year', 'years'), ('crop', 'crops'))
+
+# Stands in for an empty intersection of filters: no axis contains it, so the
+# selection is empty rather than unfiltered
+NOTHING = object()
+
+
+# ============= OPERATORS =============
+
+@dataclass(frozen=True, slots=True)
+class Filter:
+    """Restrict ``dim`` to the values of ``params[param]`` (only the first ``limit`` if set)"""
+    dim: str
+    param: str
+    limit: int = None
+
+    def condition(self):
+        values = self.param if self.limit is None else f"{self.param}[:{self.limit}]"
+        return f"{self.dim} ∈ {values}"
+
+    def __str__(self):
+        return f"Filter {self.condition()}"
+
+    def run(self, ctx):
+        ctx.filters.append(self)
+
+
+@dataclass(frozen=True, slots=True)
+class Aggregate:
+    """Sum ``measures`` and count rows per ``by`` group of the cube
+
+    ``where`` holds the filters applied while slicing the cube (the optimizer
+    pushes them here); ``ignore`` names dimensions whose filters this
+    aggregate never takes, e.g. the yearly rainfall of a comparison is read
+    for every state, not just the two compared.
+    """
+    out: str
+    measures: tuple
+    by: tuple = ()
+    where: tuple = ()
+    ignore: tuple = ()
+
+    def __str__(self):
+        text = f"Aggregate {self.out} = sum({', '.join(self.measures) or 'rows'}) by {', '.join(self.by) or 'all'}"
+        if self.where:
+            text += " where " + " and ".join(f.condition() for f in self.where)
+        return text
+
+    def run(self, ctx):
+        filters = [f for f in ctx.filters if f.dim not in self.ignore] + list(self.where)
+        labels, sums, counts = ctx.view.reduce(self.measures, self.by, **ctx.selection(filters))
+        ctx.frames[self.out] = Frame(self.by, labels, sums, counts)
+
+
+@dataclass(frozen=True, slots=True)
+class Select:
+    """Keep the groups of ``frame`` whose ``dim`` is among the values of ``params[param]``"""
+    frame: str
+    dim: str
+    param: str
+    limit: int = None
+
+    def __str__(self):
+        return f"Select {self.frame} where {Filter(self.dim, self.param, self.limit).condition()}"
+
+    def run(self, ctx):
+        values = ctx.bind(Filter(self.dim, self.param, self.limit))
+        if values is not None:
+            frame = ctx.frames[self.frame]
+            axis = frame.by.index(self.dim)
+            ctx.frames[self.frame] = frame.take(axis, np.flatnonzero(np.isin(frame.labels[axis], values)))
+
+
+@dataclass(frozen=True, slots=True)
+class Rollup:
+    """Total of a grouped frame over all its groups, instead of another pass over the cube"""
+    out: str
+    frame: str
+
+    def __str__(self):
+        return f"Rollup {self.out} = total of {self.frame}"
+
+    def run(self, ctx):
+        frame = ctx.frames[self.frame]
+        ctx.frames[self.out] = Frame((), (), {m: s.sum() for m, s in frame.sums.items()}, frame.counts.sum())
+
+
+@dataclass(frozen=True, slots=True)
+class Rank:
+    """Top k groups of a one-dimensional frame by ``measure`` (k from the question, else TOP_K)"""
+    frame: str
+    measure: str
+    ascending: bool = False
+
+    def __str__(self):
+        return f"Rank {self.frame} by {self.measure} {'ascending' if self.ascending else 'descending'}, top k"
+
+    def run(self, ctx):
+        frame = ctx.frames[self.frame]
+        present = frame.observations(self.measure) > 0
+        if not present.any():
+            raise ValueError("No records match this question")
+        k = ctx.params.get('k') or TOP_K
+        labels, values, ranks = rank(frame.labels[0][present], frame.sums[self.measure][present], k,
+                                     ascending=self.ascending)
+        ctx.result = Ranking('lowest' if self.ascending else 'highest', self.measure, labels, values, ranks,
+                             dimension=frame.by[0], k=k)
+
+
+@dataclass(frozen=True, slots=True)
+class TopK:
+    """Aggregate and Rank in one step: the top k groups along ``by`` by ``measure``
+
+    The view selects the groups itself, so a sharded one (shard.py) merges
+    the top k of every shard rather than gathering every group first.
+    """
+    measure: str
+    by: str
+    where: tuple = ()
+    ascending: bool = False
+
+    def __str__(self):
+        text = f"TopK {self.by} by sum({self.measure}) {'ascending' if self.ascending else 'descending'}"
+        if self.where:
+            text += " where " + " and ".join(f.condition() for f in self.where)
+        return text
+
+    def run(self, ctx):
+        k = ctx.params.get('k') or TOP_K
+        labels, values, ranks = ctx.view.top(self.measure, self.by, k, self.ascending,
+                                             **ctx.selection(ctx.filters + list(self.where)))
+        if not len(labels):
+            raise ValueError("No records match this question")
+        ctx.result = Ranking('lowest' if self.ascending else 'highest', self.measure, labels, values, ranks,
+                             dimension=self.by, k=k)
+
+
+@dataclass(frozen=True, slots=True)
+class Project:
+    """Build the result object from computed frames with one of the BUILDERS"""
+    builder: str
+    frames: tuple = ()
+
+    def __str__(self):
+        return f"Project {self.builder}({', '.join(self.frames)})"
+
+    def run(self, ctx):
+        ctx.result = BUILDERS[self.builder](ctx, *[ctx.frames[name] for name in self.frames])
+
+
+@dataclass(frozen=True, slots=True)
+class Kernel:
+    """A hand-written computation, looked up by name in the planner's kernels"""
+    name: str
+
+    def __str__(self):
+        return f"Kernel {self.name}"
+
+    def run(self, ctx):
+        ctx.result = ctx.kernels[self.name](ctx.params, ctx.view)
+
+
+@dataclass(slots=True)
+class Frame:
+    """An aggregate's output: one label array per ``by`` dimension, {measure: sums} and row counts"""
+    by: tuple
+    labels: tuple
+    sums: dict
+    counts: np.ndarray
+
+    def take(self, axis, positions):
+        labels = tuple(l[positions] if i == axis else l for i, l in enumerate(self.labels))
+        return Frame(self.by, labels, {m: s.take(positions, axis=axis) for m, s in self.sums.items()},
+                     self.counts.take(positions, axis=axis))
+
+    def position(self, axis):
+        return {label: i for i, label in enumerate(self.labels[axis].tolist())}
+
+    def observations(self, measure):
+        """What ``measure``'s means divide by: the row counts, or RAINFALL_YEARS for rainfall"""
+        return observations(measure, self.sums, self.counts)
+
+
+# ============= RESULT BUILDERS =============
+
+def build_too_few_states(ctx):
+    return Message('compare', 'Please mention at least 2 states to compare')
+
+
+def build_compare(ctx, groups):
+    """One metric for the first two mentioned states: sums, or means for rainfall"""
+    metric = ctx.shape.metric
+    state1, state2 = ctx.params['states'][:2]
+    position = groups.position(0)
+
+    def value(state):
+        i = position.get(state)
+        total, count = (groups.sums[metric][i], groups.observations(metric)[i]) if i is not None else (np.float64(0), 0)
+        return mean(total, count) if metric == 'Rainfall' else total
+
+    value1, value2 = value(state1), value(state2)
+    diff = abs(value1 - value2)
+    lower = min(value1, value2)
+    return Comparison(
+        metric=metric,
+        aggregate='mean' if metric == 'Rainfall' else 'sum',
+        states=(state1, state2),
+        values=np.array([value1, value2]),
+        difference=diff,
+        percent_difference=(diff / lower) * 100 if lower else np.nan,
+        winner=state1 if value1 > value2 else state2,
+    )
+
+
+def top_crops(grid, position, state, k=TOP_K):
+    """Top crops by production for one state, read off a State x crop frame"""
+    row = position[state]
+    present = grid.counts[row] > 0
+    return CropRanking(state, *rank(grid.labels[1][present], grid.sums['Production'][row][present], k))
+
+
+def build_rainfall_and_crops(ctx, rainfall, grid):
+    """Year-by-year rainfall plus top crops for the first two mentioned states"""
+    states = tuple(ctx.params['states'][:2])
+    rows = [rainfall.position(0)[state] for state in states]
+
+    # Every year with a reading in the selection, whichever state it is for
+    years = rainfall.observations('Rainfall')
+    present = years.sum(axis=0) > 0
+    sums, counts = rainfall.sums['Rainfall'][rows], years[rows]
+
+    position = grid.position(0)
+    return RainfallAndCrops(
+        states=states,
+        years=rainfall.labels[1][present],
+        rainfall=mean(sums[:, present], counts[:, present]),
+        average_rainfall=mean(sums.sum(axis=1), counts.sum(axis=1)),
+        top_crops=[top_crops(grid, position, state) for state in states],
+    )
+
+
+def build_aggregate(ctx, groups, overall):
+    """Metric total (or mean per observation) for each state and over the whole selection"""
+    metric = ctx.shape.metric
+    average = ctx.shape.intent == 'average'
+    counts = groups.observations(metric)
+    present = counts > 0
+    if not present.any():
+        raise ValueError("No records match this question")
+
+    sums, counts = groups.sums[metric][present], counts[present]
+    values = mean(sums, counts) if average else sums
+    order = np.argsort(-values, kind='stable')
+    total, records = overall.sums[metric], overall.observations(metric)
+    return AggregateResult(
+        type='average' if average else 'total',
+        metric=metric,
+        labels=groups.labels[0][present][order],
+        values=values[order],
+        counts=counts[order],
+        overall=mean(total, records) if average else total,
+    )
+
+
+def build_trend(ctx, years):
+    """Metric totals per year with overall growth from first to last year"""
+    metric = ctx.shape.metric
+    present = years.observations(metric) > 0
+    if not present.any():
+        raise ValueError("No records match this question")
+    values = years.sums[metric][present]
+    # Growth from nothing is undefined (NaN, rendered as n/a)
+    growth = ((values[-1] - values[0]) / values[0]) * 100 if values[0] else np.nan
+    return Trend(metric, years.labels[0][present], values, growth)
+
+
+def correlate(dimension, labels, rainfall, production, mask):
+    """Correlation table over grouped (groups x observations) arrays, dropping empty groups"""
+    r, points = pearson(rainfall, production, mask)
+    rho, _ = spearman(rainfall, production, mask)
+    keep = points > 0
+    return CorrelationTable(dimension, np.asarray(labels)[keep], r[keep], rho[keep], points[keep])
+
+
+def build_correlation(ctx, production_cells, rainfall_cells):
+    """Pearson and Spearman correlation of production against rainfall, per state and per crop"""
+    states, _, crops = production_cells.labels
+    production, counts = production_cells.sums['Production'], production_cells.counts
+    rainfall, readings = rainfall_cells.sums['Rainfall'], rainfall_cells.observations('Rainfall')
+
+    # Per state: one point per year, total production against the year's rainfall
+    year_counts = counts.sum(axis=2)
+    year_production = production.sum(axis=2)
+    year_rainfall = mean(rainfall.sum(axis=2), readings.sum(axis=2))
+    year_mask = year_counts > 0
+
+    # Per crop: one point per (state, year) cell the crop was grown in
+    crop_shape = (len(crops), -1)
+    crop_production = production.transpose(2, 0, 1).reshape(crop_shape)
+    crop_rainfall = mean(rainfall, readings).transpose(2, 0, 1).reshape(crop_shape)
+    crop_mask = (counts > 0).transpose(2, 0, 1).reshape(crop_shape)
+
+    if not year_mask.any():
+        raise ValueError("No records match this question")
+
+    return Correlation(
+        overall=correlate('State', ['All states'], year_rainfall.reshape(1, -1), year_production.reshape(1, -1),
+                          year_mask.reshape(1, -1)),
+        states=correlate('State', states, year_rainfall, year_production, year_mask),
+        crops=correlate('crop', crops, crop_rainfall, crop_production, crop_mask),
+    )
+
+
+def build_listing(ctx, grid):
+    """Top crops for the mentioned states (or the first five states)"""
+    position = grid.position(0)
+    if ctx.params.get('states'):
+        states = ctx.params['states']
+    else:
+        # First five states (in data order) that have rows in the selected years
+        present = grid.counts.sum(axis=1) > 0
+        order = ctx.view.labels['State'][ctx.view.state_order]
+        states = [state for state in order.tolist() if present[position[state]]][:5]
+
+    k = ctx.params.get('k') or TOP_K
+    return CropListing([top_crops(grid, position, state, k) for state in states])
+
+
+def build_summary(ctx, overall, states, crops):
+    """Record count, production total and mean rainfall over the selection"""
+    return Summary(
+        records=overall.counts,
+        production=overall.sums['Production'],
+        average_rainfall=mean(overall.sums['Rainfall'], overall.sums[RAINFALL_YEARS]),
+        states=int((states.counts > 0).sum()),
+        crops=int((crops.counts > 0).sum()),
+    )
+
+
+BUILDERS = {
+    'too_few_states': build_too_few_states,
+    'compare': build_compare,
+    'rainfall_and_crops': build_rainfall_and_crops,
+    'aggregate': build_aggregate,
+    'trend': build_trend,
+    'correlation': build_correlation,
+    'listing': build_listing,
+    'summary': build_summary,
+}
+
+
+# ============= COMPILATION =============
+
+class Shape(NamedTuple):
+    """What a plan depends on: everything in the params except the entity values"""
+    intent: str
+    metric: str
+    by: str
+    filters: tuple          # params lists that are non-empty, e.g. ('states', 'years')
+    few_states: bool        # a comparison naming fewer than two states
+
+
+def plan_shape(params):
+    intent = params['type']
+    metric = params.get('metric')
+    if intent == 'compare' and (params.get('asks_both') or metric == 'Both'):
+        metric = 'Both'
+    elif metric == 'Both' or metric is None:
+        metric = 'Production'
+    filters = tuple(param for _, param in FILTER_PARAMS if params.get(param))
+    if intent == 'trend' and len(params.get('years') or ()) < 2:
+        # A trend needs several years: a single year mentioned doesn't narrow it
+        filters = tuple(param for param in filters if param != 'years')
+    return Shape(
+        intent=intent,
+        metric=metric,
+        by=(params.get('by') or 'State') if intent in ('highest', 'lowest') else None,
+        filters=filters,
+        few_states=intent == 'compare' and len(params.get('states') or ()) < 2,
+    )
+
+
+def logical_plan(shape):
+    """The straightforward operator pipeline for a shape, before optimization"""
+    filters = [Filter(dim, param) for dim, param in FILTER_PARAMS if param in shape.filters]
+    metric = shape.metric
+
+    if shape.intent == 'source':
+        return [Kernel('source')]
+    if shape.intent in ('highest', 'lowest'):
+        return filters + [Aggregate('groups', counted(metric), (shape.by,)),
+                          Rank('groups', metric, ascending=shape.intent == 'lowest')]
+    if shape.intent == 'compare':
+        if shape.few_states:
+            return [Project('too_few_states')]
+        if metric == 'Both':
+            return filters + [Aggregate('rainfall', counted('Rainfall'), ('State', 'Year'), ignore=('State',)),
+                              Aggregate('grid', ('Production',), ('State', 'crop')),
+                              Select('grid', 'State', 'states', limit=2),
+                              Project('rainfall_and_crops', ('rainfall', 'grid'))]
+        return filters + [Aggregate('groups', counted(metric), ('State',)),
+                          Select('groups', 'State', 'states', limit=2),
+                          Project('compare', ('groups',))]
+    if shape.intent in ('average', 'total'):
+        return filters + [Aggregate('groups', counted(metric), ('State',)),
+                          Aggregate('overall', counted(metric)),
+                          Project('aggregate', ('groups', 'overall'))]
+    if shape.intent == 'trend':
+        return filters + [Aggregate('years', counted(metric), ('Year',)),
+                          Project('trend', ('years',))]
+    if shape.intent == 'correlation':
+        return filters + [Aggregate('production', ('Production',), DIMENSIONS),
+                          Aggregate('rainfall', counted('Rainfall'), DIMENSIONS),
+                          Project('correlation', ('production', 'rainfall'))]
+    if shape.intent == 'list':
+        return filters + [Aggregate('grid', ('Production',), ('State', 'crop'), ignore=('crop',)),
+                          Project('listing', ('grid',))]
+    return filters + [Aggregate('overall', ('Production',) + counted('Rainfall')),
+                      Aggregate('states', (), ('State',)),
+                      Aggregate('crops', (), ('crop',)),
+                      Project('summary', ('overall', 'states', 'crops'))]
+
+
+# ============= OPTIMIZATION =============
+
+def with_filter(where, extra):
+    """``where`` plus ``extra``, which replaces a filter on the same list (it is at least as narrow)"""
+    kept = tuple(f for f in where if (f.dim, f.param) != (extra.dim, extra.param))
+    return kept + (extra,)
+
+
+def push_down(operators, rewrites):
+    """Apply filters while slicing the cube instead of to the rows or groups it produces
+
+    Plan-wide Filters move into the ``where`` of every Aggregate they apply
+    to, and a Select on an aggregate's grouping dimension moves into that
+    aggregate, so only the selected groups are ever reduced.
+    """
+    filters = [op for op in operators if isinstance(op, Filter)]
+    plan = []
+    for op in operators:
+        if isinstance(op, Filter):
+            continue
+        if isinstance(op, Aggregate):
+            pushed = tuple(f for f in filters if f.dim not in op.ignore)
+            for f in pushed:
+                rewrites.append(f"pushed {f} into Aggregate {op.out}")
+            op = replace(op, where=op.where + pushed, ignore=())
+        plan.append(op)
+
+    for i, op in enumerate(plan):
+        if not isinstance(op, Select):
+            continue
+        source = next(j for j in range(i - 1, -1, -1) if isinstance(plan[j], Aggregate) and plan[j].out == op.frame)
+        if op.dim in plan[source].by:
+            rewrites.append(f"pushed {op} into Aggregate {op.frame}")
+            plan[source] = replace(plan[source], where=with_filter(plan[source].where,
+                                                                   Filter(op.dim, op.param, op.limit)))
+            plan[i] = None
+    return [op for op in plan if op is not None]
+
+
+def merge_aggregates(operators, rewrites):
+    """Compute aggregations over the same selection in as few cube passes as possible
+
+    Aggregates with the same grouping and filters become one that sums all
+    their measures, and an ungrouped total over the same filters as a grouped
+    aggregate becomes a Rollup of it.
+    """
+    aggregates = [op for op in operators if isinstance(op, Aggregate)]
+    merged, alias = [], {}
+    for op in aggregates:
+        target = next((i for i, kept in enumerate(merged) if (kept.by, kept.where) == (op.by, op.where)), None)
+        if target is None:
+            merged.append(op)
+        else:
+            rewrites.append(f"merged Aggregate {op.out} into Aggregate {merged[target].out}")
+            measures = merged[target].measures + tuple(m for m in op.measures if m not in merged[target].measures)
+            merged[target] = replace(merged[target], measures=measures)
+            alias[op.out] = merged[target].out
+
+    rollups = []
+    for i, op in enumerate(merged):
+        if op.by:
+            continue
+        source = next((j for j, kept in enumerate(merged) if kept.by and kept.where == op.where), None)
+        if source is not None:
+            rewrites.append(f"replaced Aggregate {op.out} with a Rollup of {merged[source].out}")
+            measures = merged[source].measures + tuple(m for m in op.measures if m not in merged[source].measures)
+            merged[source] = replace(merged[source], measures=measures)
+            rollups.append(Rollup(op.out, merged[source].out))
+            merged[i] = None
+
+    def renamed(op):
+        if isinstance(op, (Select, Rank)):
+            return replace(op, frame=alias.get(op.frame, op.frame))
+        if isinstance(op, Project):
+            return replace(op, frames=tuple(alias.get(name, name) for name in op.frames))
+        return op
+
+    rest = [renamed(op) for op in operators if not isinstance(op, Aggregate)]
+    return [op for op in merged if op is not None] + rollups + rest
+
+
+def fuse_top_k(operators, rewrites):
+    """Turn an Aggregate read only by a Rank into one TopK, so the view picks the top groups itself"""
+    plan = list(operators)
+    for i, op in enumerate(plan):
+        if not isinstance(op, Rank):
+            continue
+        source = next((j for j, kept in enumerate(plan) if isinstance(kept, Aggregate) and kept.out == op.frame), None)
+        if source is None:
+            continue
+        aggregate = plan[source]
+        readers = [other for other in plan if other is not op and op.frame in frames_read(other)]
+        if len(aggregate.by) != 1 or aggregate.measures != counted(op.measure) or aggregate.ignore or readers:
+            continue
+        rewrites.append(f"fused Aggregate {aggregate.out} and its Rank into TopK")
+        plan[source] = TopK(op.measure, aggregate.by[0], aggregate.where, op.ascending)
+        plan[i] = None
+    return [op for op in plan if op is not None]
+
+
+def frames_read(op):
+    if isinstance(op, (Select, Rank, Rollup)):
+        return (op.frame,)
+    if isinstance(op, Project):
+        return op.frames
+    return ()
+
+
+def optimize(operators):
+    """Rewrite a logical plan; returns the new operators and a note per rewrite"""
+    rewrites = []
+    operators = push_down(operators, rewrites)
+    operators = merge_aggregates(operators, rewrites)
+    operators = fuse_top_k(operators, rewrites)
+    return operators, rewrites
+
+
+# ============= EXECUTION =============
+
+class Execution:
+    """State of one plan run: bound params, computed frames and the result"""
+
+    def __init__(self, shape, params, view, kernels):
+        self.shape = shape
+        self.params = params
+        self.view = view
+        self.kernels = kernels
+        self.filters = []
+        self.frames = {}
+        self.result = None
+
+    def bind(self, f):
+        """Values ``f`` filters on for these params, or None if it doesn't filter"""
+        values = self.params.get(f.param)
+        if not values:
+            return None
+        return list(values) if f.limit is None else list(values)[:f.limit]
+
+    def selection(self, filters):
+        """states/years/crops keyword arguments for the cube, intersecting filters on the same dimension"""
+        chosen = {}
+        for f in filters:
+            values = self.bind(f)
+            if values is None:
+                continue
+            if f.dim in chosen:
+                allowed = set(values)
+                values = [v for v in chosen[f.dim] if v in allowed] or [NOTHING]
+            chosen[f.dim] = values
+        return {param: chosen.get(dim) for dim, param in FILTER_PARAMS}
+
+
+class Plan:
+    def __init__(self, shape, operators, rewrites=()):
+        self.shape = shape
+        self.operators = list(operators)
+        self.rewrites = list(rewrites)
+
+    def __str__(self):
+        return '\n'.join(str(op) for op in self.operators)
+
+    def run(self, params, view, kernels, timings=None):
+        """Execute against ``view`` (a cube or SharedAggregates); appends seconds per operator to ``timings``"""
+        ctx = Execution(self.shape, params, view, kernels)
+        for op in self.operators:
+            started = time.perf_counter()
+            op.run(ctx)
+            if timings is not None:
+                timings.append(time.perf_counter() - started)
+        return ctx.result
+
+
+class Planner:
+    """Compiles parsed params into optimized plans, cached by shape
+
+    ``kernels`` maps Kernel names to ``fn(params, view)`` for the parts of
+    answering that are not relational (e.g. facts about the data source).
+    """
+
+    def __init__(self, kernels, maxsize=256, optimized=True):
+        self.kernels = kernels
+        self.maxsize = maxsize
+        self.optimized = optimized
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, shape):
+        operators = logical_plan(shape)
+        if not self.optimized:
+            return Plan(shape, operators)
+        return Plan(shape, *optimize(operators))
+
+    def plan(self, params):
+        """``(plan, cached)`` for params; plans don't depend on the data, so reloads keep them"""
+        shape = plan_shape(params)
+        with self._lock:
+            plan = self._plans.get(shape)
+            if plan is not None:
+                self._plans.move_to_end(shape)
+                self.hits += 1
+                return plan, True
+            self.misses += 1
+
+        plan = self.compile(shape)
+        with self._lock:
+            self._plans[shape] = plan
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan, False
+
+    def run(self, params, view):
+        plan, _ = self.plan(params)
+        return plan.run(params, view, self.kernels)
+
+    def explain(self, params, view):
+        """``(result, Explain)``: the answer plus the plan that computed it and its operator timings"""
+        started = time.perf_counter()
+        plan, cached = self.plan(params)
+        planned = time.perf_counter() - started
+
+        timings = []
+        result = plan.run(params, view, self.kernels, timings)
+        return result, Explain(
+            intent=plan.shape.intent,
+            cached=cached,
+            planning=planned,
+            operators=[str(op) for op in plan.operators],
+            seconds=np.array(timings),
+            rewrites=plan.rewrites,
+        )
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Outcome of one submitted call
+DONE = 'done'
+FAILED = 'failed'
+TIMED_OUT = 'timed out'
+
+
+class SubQueryPool:
+    """Worker pool that answers the sub-queries of one compound question in parallel
+
+    ``kind`` is 'thread' (the default: the heavy lifting is NumPy reductions,
+    which release the GIL) or 'process' for work that holds the GIL. Worker
+    processes answer from the dataset as it was when they started, so
+    restart() them whenever the data is swapped.
+    """
+
+    def __init__(self, workers=4, kind='thread'):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool kind {kind!r}; use 'thread' or 'process'")
+        self.workers = workers
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='subquery')
+            return self._executor
+
+    def run(self, fn, calls, timeout=None):
+        """Call ``fn(*args)`` for every ``args`` in ``calls`` and wait at most ``timeout`` seconds
+
+        Returns ``(status, value)`` per call, in submission order: the return
+        value when DONE, the exception when FAILED, None when TIMED_OUT. Calls
+        still running at the deadline are abandoned, not interrupted.
+        """
+        executor = self.executor()
+        futures = [executor.submit(fn, *args) for args in calls]
+        wait(futures, timeout=timeout)
+
+        outcomes = []
+        for future in futures:
+            if not future.done():
+                future.cancel()
+                outcomes.append((TIMED_OUT, None))
+            elif future.exception() is not None:
+                outcomes.append((FAILED, future.exception()))
+            else:
+                outcomes.append((DONE, future.result()))
+        return outcomes
+
+    def restart(self):
+        """Drop the worker processes so new ones start from the current data (no-op for threads)"""
+        if self.kind != 'process':
+            return
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
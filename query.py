@@ -1,547 +1,757 @@
-from flask import Flask, request, render_template_string
-import pandas as pd
-import numpy as np
-import re
-
-app = Flask(__name__)
-
-# Load data
-data = pd.read_csv('merged_crop_rainfall.csv')
-
-# HTML Template
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Project Samarth</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-        h1 { color: #2c3e50; }
-        form { background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-        input[type="text"] { padding: 10px; border: 2px solid #ddd; border-radius: 4px; font-size: 16px; }
-        button { padding: 10px 20px; background: #3498db; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 16px; }
-        button:hover { background: #2980b9; }
-        .answer { background: white; padding: 20px; margin-top: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); white-space: pre-wrap; font-family: monospace; }
-        .query-separator { margin: 30px 0; border-top: 3px double #3498db; padding-top: 20px; }
-    </style>
-</head>
-<body>
-    <h1>🌾 Project Samarth – Multi-Query Agricultural Engine</h1>
-    <form method="POST">
-        <input type="text" name="question" placeholder="Ask multiple questions! (e.g., 'Highest rice production AND rainfall in Punjab')" size="70" required>
-        <button type="submit">🔍 Ask</button>
-    </form>
-    {% if answer %}
-    <div class="answer">{{ answer }}</div>
-    {% endif %}
-</body>
-</html>
-"""
-
-
-# ============= QUERY SPLITTING ENGINE =============
-
-def split_compound_query(question):
-    """Split a compound question into multiple sub-queries with context preservation"""
-    question_lower = question.lower()
-
-    # Check if asking about data source - handle separately
-    asks_source = any(phrase in question_lower for phrase in [
-        'where', 'data came from', 'source', 'from where', 'data source'
-    ])
-
-    # If asking about source, split it out as a separate query
-    source_query = None
-    main_question = question
-
-    if asks_source:
-        # Extract the source question part
-        source_patterns = [
-            r'(and\s+)?(also\s+)?mention\s+where.*',
-            r'(and\s+)?(also\s+)?where.*came\s+from',
-            r'(and\s+)?(also\s+)?what.*source',
-        ]
-
-        for pattern in source_patterns:
-            match = re.search(pattern, question_lower)
-            if match:
-                source_query = "where does the data come from"
-                main_question = question[:match.start()].strip()
-                break
-
-    # Now check if the main question has multiple distinct queries
-    # Be conservative - only split on clear separators when queries are actually independent
-
-    # Pattern 1: "Do X. Then do Y" or "Do X; do Y" (clear independent queries)
-    if re.search(r'\.\s+[A-Z]', main_question) or ';' in main_question:
-        queries = re.split(r'[.;]\s+', main_question)
-        queries = [q.strip() for q in queries if q.strip()]
-
-    # Pattern 2: Look for "at the same time" - this indicates ONE compound query, not multiple
-    elif 'at the same time' in question_lower:
-        queries = [main_question]
-
-    # Pattern 3: "and also" or "also" at sentence level (but NOT within a comparison)
-    elif re.search(r'\.\s+(and\s+)?also\s+', question_lower):
-        queries = re.split(r'\.\s+(and\s+)?also\s+', main_question)
-        queries = [q.strip() for q in queries if q.strip() and len(q) > 3]
-
-    else:
-        # Single query - keep it together
-        queries = [main_question]
-
-    # Add source query at the end if it was found
-    if source_query:
-        queries.append(source_query)
-
-    return queries
-
-
-# ============= QUERY PROCESSING ENGINE =============
-
-def parse_query(question):
-    """Parse natural language question and extract intent"""
-    question_lower = question.lower()
-
-    # Extract state names
-    states = data['State'].unique()
-    mentioned_states = [s for s in states if s.lower() in question_lower]
-
-    # Extract crop names
-    crops = data['crop'].unique()
-    mentioned_crops = [c for c in crops if c.lower() in question_lower]
-
-    # Extract years
-    years = re.findall(r'\b(20\d{2}|\d{4})\b', question)
-    years = [int(y) for y in years if int(y) in data['Year'].unique()]
-
-    # Check for data source query
-    if any(phrase in question_lower for phrase in ['source', 'data came from', 'where', 'from where']):
-        return {
-            'type': 'source',
-            'states': mentioned_states,
-            'crops': mentioned_crops,
-            'years': years if years else None,
-            'metric': None
-        }
-
-    # Determine query type
-    query_type = None
-
-    if any(word in question_lower for word in ['highest', 'maximum', 'most', 'top', 'largest', 'best']):
-        query_type = 'highest'
-    elif any(word in question_lower for word in ['lowest', 'minimum', 'least', 'smallest', 'worst']):
-        query_type = 'lowest'
-    elif any(word in question_lower for word in ['compare', 'comparison', 'versus', 'vs', 'difference', 'between']):
-        query_type = 'compare'
-    elif any(word in question_lower for word in ['average', 'mean', 'avg']):
-        query_type = 'average'
-    elif any(word in question_lower for word in ['total', 'sum', 'overall']):
-        query_type = 'total'
-    elif any(word in question_lower for word in
-             ['trend', 'over time', 'yearly', 'year by year', 'every year', 'each year', 'growth']):
-        query_type = 'trend'
-    elif any(word in question_lower for word in ['correlation', 'relation', 'affect', 'impact', 'depend']):
-        query_type = 'correlation'
-    elif any(word in question_lower for word in ['list', 'show all', 'what are']):
-        query_type = 'list'
-    else:
-        query_type = 'general'
-
-    # Determine primary metric(s)
-    asks_rainfall = any(word in question_lower for word in ['rainfall', 'rain', 'precipitation'])
-    asks_production = any(word in question_lower for word in ['production', 'produce', 'crop', 'yield'])
-    asks_both = 'at the same time' in question_lower or 'also' in question_lower
-
-    # Determine metric
-    if asks_both or (asks_rainfall and asks_production):
-        metric = 'Both'  # Special flag for queries asking about both
-    elif asks_rainfall:
-        metric = 'Rainfall'
-    else:
-        metric = 'Production'
-
-    return {
-        'type': query_type,
-        'states': mentioned_states,
-        'crops': mentioned_crops,
-        'years': years if years else None,
-        'metric': metric,
-        'asks_both': asks_both or (asks_rainfall and asks_production)
-    }
-
-
-def format_number(num):
-    """Format large numbers with commas"""
-    return f"{num:,.2f}"
-
-
-def query_source(params):
-    """Answer questions about data source"""
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  DATA SOURCE INFORMATION\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    answer += "🌐 PRIMARY SOURCE:\n"
-    answer += "═" * 63 + "\n"
-    answer += "  Portal: data.gov.in\n"
-    answer += "  Official: Open Government Data (OGD) Platform India\n"
-    answer += "  Website: https://data.gov.in\n\n"
-
-    answer += "📁 Dataset: merged_crop_rainfall.csv\n\n"
-    answer += "📊 Data Contents:\n"
-    answer += f"  • Years Covered: {data['Year'].min()} - {data['Year'].max()}\n"
-    answer += f"  • States: {data['State'].nunique()} Indian states\n"
-    answer += f"  • Crops: {data['crop'].nunique()} different crop types\n"
-    answer += f"  • Total Records: {len(data):,}\n\n"
-
-    answer += "🔍 Data Fields:\n"
-    answer += "  • State: Geographic location\n"
-    answer += "  • Year: Time period (2009-2013)\n"
-    answer += "  • Crop: Agricultural product\n"
-    answer += "  • Production: Output quantity\n"
-    answer += "  • Rainfall: Precipitation in millimeters\n\n"
-
-    answer += "ℹ️  NOTE:\n"
-    answer += "   This is a merged dataset combining agricultural production\n"
-    answer += "   data with regional rainfall measurements from data.gov.in,\n"
-    answer += "   India's official open data portal maintained by the\n"
-    answer += "   National Informatics Centre (NIC).\n"
-
-    return answer
-
-
-def query_highest(params):
-    """Find highest production/rainfall"""
-    df = data.copy()
-
-    if params['crops']:
-        df = df[df['crop'].isin(params['crops'])]
-    if params['years']:
-        df = df[df['Year'].isin(params['years'])]
-    if params['states']:
-        df = df[df['State'].isin(params['states'])]
-
-    metric = params['metric'] if params['metric'] != 'Both' else 'Production'
-    result = df.groupby('State')[metric].sum().sort_values(ascending=False)
-
-    top_state = result.index[0]
-    top_value = result.iloc[0]
-
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  HIGHEST {metric.upper()} ANALYSIS\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    answer += f"🏆 TOP STATE: {top_state}\n"
-    answer += f"📊 {metric}: {format_number(top_value)}"
-    if metric == 'Rainfall':
-        answer += " mm"
-    answer += "\n\n"
-
-    answer += "TOP 5 RANKING:\n"
-    answer += "═" * 63 + "\n"
-    for i, (state, value) in enumerate(result.head(5).items(), 1):
-        answer += f"  {i}. {state:25} → {format_number(value)}"
-        if metric == 'Rainfall':
-            answer += " mm"
-        answer += "\n"
-
-    return answer
-
-
-def query_lowest(params):
-    """Find lowest production/rainfall"""
-    df = data.copy()
-
-    if params['crops']:
-        df = df[df['crop'].isin(params['crops'])]
-    if params['years']:
-        df = df[df['Year'].isin(params['years'])]
-    if params['states']:
-        df = df[df['State'].isin(params['states'])]
-
-    metric = params['metric'] if params['metric'] != 'Both' else 'Production'
-    result = df.groupby('State')[metric].sum().sort_values(ascending=True)
-
-    bottom_state = result.index[0]
-    bottom_value = result.iloc[0]
-
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  LOWEST {metric.upper()} ANALYSIS\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    answer += f"📉 BOTTOM STATE: {bottom_state}\n"
-    answer += f"📊 {metric}: {format_number(bottom_value)}"
-    if metric == 'Rainfall':
-        answer += " mm"
-    answer += "\n\n"
-
-    answer += "BOTTOM 5 RANKING:\n"
-    answer += "═" * 63 + "\n"
-    for i, (state, value) in enumerate(result.head(5).items(), 1):
-        answer += f"  {i}. {state:25} → {format_number(value)}"
-        if metric == 'Rainfall':
-            answer += " mm"
-        answer += "\n"
-
-    return answer
-
-
-def query_compare(params):
-    """Compare production/rainfall between states - handles compound queries"""
-    if len(params['states']) < 2:
-        return "❌ Please mention at least 2 states to compare"
-
-    df = data.copy()
-
-    if params['crops']:
-        df = df[df['crop'].isin(params['crops'])]
-    if params['years']:
-        df = df[df['Year'].isin(params['years'])]
-
-    state1, state2 = params['states'][0], params['states'][1]
-
-    # Check if this is asking for both rainfall AND production
-    if params.get('asks_both') or params['metric'] == 'Both':
-        # Handle compound comparison
-        answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-        answer += f"║  COMPREHENSIVE COMPARISON: {state1.upper()} vs {state2.upper()}\n"
-        answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-        # PART 1: Rainfall comparison
-        answer += "🌧️  RAINFALL COMPARISON:\n"
-        answer += "═" * 63 + "\n\n"
-
-        df1 = df[df['State'] == state1]
-        df2 = df[df['State'] == state2]
-
-        # Year by year rainfall
-        years = sorted(df['Year'].unique())
-        answer += f"{'Year':<10} {state1:<25} {state2:<25}\n"
-        answer += "-" * 63 + "\n"
-
-        for year in years:
-            rain1 = df1[df1['Year'] == year]['Rainfall'].mean()
-            rain2 = df2[df2['Year'] == year]['Rainfall'].mean()
-            answer += f"{year:<10} {format_number(rain1) + ' mm':<25} {format_number(rain2) + ' mm':<25}\n"
-
-        avg_rain1 = df1['Rainfall'].mean()
-        avg_rain2 = df2['Rainfall'].mean()
-        answer += "-" * 63 + "\n"
-        answer += f"{'Average':<10} {format_number(avg_rain1) + ' mm':<25} {format_number(avg_rain2) + ' mm':<25}\n"
-
-        # PART 2: Top crop production
-        answer += "\n\n🌾 TOP CROPS PRODUCED:\n"
-        answer += "═" * 63 + "\n\n"
-
-        for state in [state1, state2]:
-            state_df = df[df['State'] == state]
-            top_crops = state_df.groupby('crop')['Production'].sum().sort_values(ascending=False).head(5)
-
-            answer += f"📍 {state.upper()}:\n"
-            for i, (crop, prod) in enumerate(top_crops.items(), 1):
-                answer += f"  {i}. {crop:20} → {format_number(prod)}\n"
-            answer += "\n"
-
-        return answer
-
-    else:
-        # Single metric comparison (original logic)
-        metric = params['metric'] if params['metric'] != 'Both' else 'Production'
-
-        df1 = df[df['State'] == state1]
-        df2 = df[df['State'] == state2]
-
-        if metric == 'Rainfall':
-            value1 = df1['Rainfall'].mean()
-            value2 = df2['Rainfall'].mean()
-        else:
-            value1 = df1[metric].sum()
-            value2 = df2[metric].sum()
-
-        answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-        answer += f"║  COMPARISON: {state1.upper()} vs {state2.upper()}\n"
-        answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-        answer += f"📊 {metric.upper()} COMPARISON:\n\n"
-        answer += f"  {state1:25} → {format_number(value1)}"
-        if metric == 'Rainfall':
-            answer += " mm (avg)"
-        answer += "\n"
-        answer += f"  {state2:25} → {format_number(value2)}"
-        if metric == 'Rainfall':
-            answer += " mm (avg)"
-        answer += "\n\n"
-
-        diff = abs(value1 - value2)
-        percent_diff = (diff / min(value1, value2)) * 100
-        winner = state1 if value1 > value2 else state2
-
-        answer += f"  Difference: {format_number(diff)}"
-        if metric == 'Rainfall':
-            answer += " mm"
-        answer += f"\n  Percentage: {percent_diff:.2f}%\n"
-        answer += f"  Winner: {winner} 🏆\n"
-
-        return answer
-
-
-def query_trend(params):
-    """Show trend over years"""
-    df = data.copy()
-
-    if params['crops']:
-        df = df[df['crop'].isin(params['crops'])]
-    if params['states']:
-        df = df[df['State'].isin(params['states'])]
-
-    metric = params['metric'] if params['metric'] != 'Both' else 'Production'
-    trend = df.groupby('Year')[metric].sum().sort_index()
-
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  {metric.upper()} TREND (2009-2013)\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    for year, value in trend.items():
-        answer += f"  {year}  →  {format_number(value)}"
-        if metric == 'Rainfall':
-            answer += " mm"
-        answer += "\n"
-
-    first_val = trend.iloc[0]
-    last_val = trend.iloc[-1]
-    growth = ((last_val - first_val) / first_val) * 100
-
-    answer += f"\n  Overall Growth: {growth:+.2f}%\n"
-    answer += f"  Trend: {'📈 Increasing' if growth > 0 else '📉 Decreasing'}\n"
-
-    return answer
-
-
-def query_list(params):
-    """List items based on query"""
-    df = data.copy()
-
-    if params['states']:
-        df = df[df['State'].isin(params['states'])]
-    if params['years']:
-        df = df[df['Year'].isin(params['years'])]
-
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  TOP CROPS BY STATE\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    for state in params['states'] if params['states'] else df['State'].unique()[:5]:
-        state_df = df[df['State'] == state]
-        top_crops = state_df.groupby('crop')['Production'].sum().sort_values(ascending=False).head(5)
-
-        answer += f"📍 {state.upper()}:\n"
-        for i, (crop, prod) in enumerate(top_crops.items(), 1):
-            answer += f"  {i}. {crop:20} → {format_number(prod)}\n"
-        answer += "\n"
-
-    return answer
-
-
-def query_general(params):
-    """Handle general queries"""
-    df = data.copy()
-
-    if params['crops']:
-        df = df[df['crop'].isin(params['crops'])]
-    if params['states']:
-        df = df[df['State'].isin(params['states'])]
-    if params['years']:
-        df = df[df['Year'].isin(params['years'])]
-
-    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-    answer += f"║  DATA SUMMARY\n"
-    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-    answer += f"  Total Records:    {len(df)}\n"
-    answer += f"  Total Production: {format_number(df['Production'].sum())}\n"
-    answer += f"  Avg Rainfall:     {format_number(df['Rainfall'].mean())} mm\n"
-    answer += f"  States:           {df['State'].nunique()}\n"
-    answer += f"  Crops:            {df['crop'].nunique()}\n"
-
-    return answer
-
-
-def process_single_query(question):
-    """Process a single query and return the answer"""
-    try:
-        params = parse_query(question)
-
-        if params['type'] == 'source':
-            return query_source(params)
-        elif params['type'] == 'highest':
-            return query_highest(params)
-        elif params['type'] == 'lowest':
-            return query_lowest(params)
-        elif params['type'] == 'compare':
-            return query_compare(params)
-        elif params['type'] == 'trend':
-            return query_trend(params)
-        elif params['type'] == 'list':
-            return query_list(params)
-        else:
-            return query_general(params)
-
-    except Exception as e:
-        return f"❌ Error: {str(e)}"
-
-
-# ============= MAIN ROUTE =============
-
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    answer = None
-
-    if request.method == 'POST':
-        question = request.form.get('question', '').strip()
-
-        if not question:
-            answer = "❌ Please enter a question!"
-        else:
-            try:
-                # Split compound queries
-                queries = split_compound_query(question)
-
-                if len(queries) == 1:
-                    # Single query (possibly compound, handled by individual functions)
-                    answer = process_single_query(queries[0])
-                else:
-                    # Multiple truly independent queries
-                    answer = f"╔═══════════════════════════════════════════════════════════╗\n"
-                    answer += f"║  MULTI-QUERY RESPONSE ({len(queries)} questions detected)\n"
-                    answer += f"╚═══════════════════════════════════════════════════════════╝\n\n"
-
-                    for i, q in enumerate(queries, 1):
-                        answer += f"\n{'=' * 63}\n"
-                        answer += f"QUERY {i}: {q}\n"
-                        answer += f"{'=' * 63}\n\n"
-
-                        sub_answer = process_single_query(q)
-                        answer += sub_answer + "\n"
-
-            except Exception as e:
-                answer = f"❌ Error: {str(e)}\n\nTry rephrasing your question."
-
-    return render_template_string(HTML_TEMPLATE, answer=answer)
-
-
-if __name__ == '__main__':
-    print("=" * 60)
-    print("🌾 Project Samarth - Smart Multi-Query Engine")
-    print("=" * 60)
-    print(f"📊 Data: {len(data)} records")
-    print(f"📅 Years: {data['Year'].min()}-{data['Year'].max()}")
-    print("=" * 60)
-    print("🚀 Server: http://localhost:5000")
-    print("=" * 60)
-    print("\n📝 Try Complex Queries:")
-    print("  • Compare rainfall in Rajasthan and Maharashtra every year")
-    print("    At the same time list top crops and mention data source")
-    print("  • Highest rice production. Also show trend")
-    print("=" * 60)
-    app.run(debug=True, port=5000)
\ No newline at end of file
+from flask import Flask, Response, g, request, render_template_string, jsonify, stream_with_context
+import hmac
+import itertools
+import logging
+import os
+import threading
+import time
+
+import engine
+from cache import AnswerCache, InFlight, cache_key
+from cube import AggregateCube, SharedAggregates
+from engine import DATA_FILE, INGEST_DIR, Engine, iter_multi_answer, planner, split_compound_query
+from ingest import BatchFollower, IngestWatcher, batch_from_csv, batch_from_records, persist_batch, replay
+from loader import load_dataset, open_cube, save_cube, typed
+from materialize import open_store
+from metrics import PROMETHEUS_CONTENT_TYPE, Gauge, Histogram, ProfileStore, Registry, SamplingProfiler
+from pool import DONE, TIMED_OUT, SubQueryPool
+from render import iter_csv, iter_text, render_text, to_dict
+from results import Message, Records
+from rowindex import RowIndex, as_chunks, gather
+from shard import ShardedCube
+
+app = Flask(__name__)
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('SAMARTH_ADMIN_TOKEN')
+
+# Sub-queries of a compound question are answered in parallel, by threads or
+# (SAMARTH_POOL=process) worker processes
+subquery_pool = SubQueryPool(workers=int(os.environ.get('SAMARTH_WORKERS', 4)),
+                             kind=os.environ.get('SAMARTH_POOL', 'thread'))
+
+# With SAMARTH_SHARDS=N the cube is split into N shards by State (or, with
+# SAMARTH_SHARD_BY=Year, by Year range) that worker processes aggregate and
+# query in parallel; see shard.py. 0 keeps everything in this process.
+SHARDS = int(os.environ.get('SAMARTH_SHARDS', 0))
+SHARD_BY = os.environ.get('SAMARTH_SHARD_BY', 'State')
+
+# Seconds a compound question may take; parts not answered by then are skipped
+REQUEST_TIMEOUT = float(os.environ.get('SAMARTH_REQUEST_TIMEOUT', 10))
+
+# Served at /metrics in the Prometheus text format
+registry = Registry()
+stage_seconds = registry.register(Histogram(
+    'samarth_stage_seconds', 'Time spent in each stage of answering a question', 'stage'))
+intent_seconds = registry.register(Histogram(
+    'samarth_query_seconds', 'Time to answer one (sub-)question, by parsed intent', 'intent'))
+request_seconds = registry.register(Histogram(
+    'samarth_request_seconds', 'HTTP request handling time, by endpoint', 'endpoint'))
+registry.register(Gauge('samarth_cache_hits_total', 'Answer cache hits', lambda: answer_cache.hits, type='counter'))
+registry.register(Gauge('samarth_cache_misses_total', 'Answer cache misses', lambda: answer_cache.misses,
+                        type='counter'))
+registry.register(Gauge('samarth_coalesced_total', 'Answers shared with an identical in-flight question',
+                        lambda: in_flight.coalesced, type='counter'))
+registry.register(Gauge('samarth_plan_cache_hits_total', 'Questions answered with an already compiled plan',
+                        lambda: planner.hits, type='counter'))
+registry.register(Gauge('samarth_plan_cache_misses_total', 'Query plans compiled', lambda: planner.misses,
+                        type='counter'))
+registry.register(Gauge('samarth_materialized_hits_total', 'Answers read from the precomputed answer store',
+                        lambda: snapshot.answers.hits if snapshot.answers is not None else 0, type='counter'))
+registry.register(Gauge('samarth_dataset_records', 'Rows in the loaded dataset', lambda: snapshot.cube.rows))
+registry.register(Gauge('samarth_dataset_version', 'Times the dataset has been reloaded or extended',
+                        lambda: snapshot.version))
+
+# Requests sent with an "X-Profile: 1" header (and the admin token) are
+# sampled; their collapsed stacks are kept here for /admin/profile/<id>
+profiles = ProfileStore(maxsize=32)
+PROFILE_INTERVAL = 0.001
+
+# A question typed as "EXPLAIN <question>" in the form also shows its query plan
+EXPLAIN_PREFIX = 'EXPLAIN '
+
+# Rendered answers keyed on parsed intent; cleared whenever the data is reloaded
+answer_cache = AnswerCache(maxsize=512, ttl=None)
+
+# Identical questions arriving together are computed once and the answer shared
+in_flight = InFlight()
+
+
+class Snapshot(Engine):
+    """The loaded rows plus everything derived from them, swapped as one unit
+
+    A request takes the current snapshot once and uses it throughout, so a
+    reload or ingest that lands mid-request never mixes old and new data.
+
+    The rows are kept as chunks read one after the other: the dataset as
+    loaded (memory-mapped from its snapshot, so shared between processes)
+    and then each ingested batch. Ingesting a batch adds a chunk instead of
+    copying every row into a new frame.
+    """
+
+    def __init__(self, chunks, cube=None, version=0, batches=frozenset(), answers=None, dataset=None):
+        self.chunks = tuple(as_chunks(chunks))
+        if cube is None:
+            cube = AggregateCube(self.chunks[0])
+            for chunk in self.chunks[1:]:
+                cube = cube.extend(chunk)
+
+        # The cube every handler slices instead of re-grouping the rows, plus
+        # the matcher, year index and precomputed answers that go with it
+        super().__init__(cube, answers, dataset)
+        self.version = version
+
+        # Names of the ingested batch files included in `data`
+        self.batches = frozenset(batches)
+
+        self._row_index = None
+        self._row_index_lock = threading.Lock()
+
+    @property
+    def row_index(self):
+        """Inverted State/Year/crop index over the rows of every chunk, built on first use"""
+        if self._row_index is None:
+            with self._row_index_lock:
+                if self._row_index is None:
+                    self._row_index = RowIndex(self.chunks)
+        return self._row_index
+
+    def extend(self, batch, name=None):
+        """New snapshot with ``batch`` appended; aggregates are updated, not rebuilt
+
+        Precomputed answers describe the old rows, so the new snapshot has none.
+        """
+        batches = self.batches | {name} if name is not None else self.batches
+        return Snapshot(self.chunks + (typed(batch),), self.cube.extend(batch), self.version + 1, batches,
+                        dataset=self.dataset)
+
+
+snapshot = None
+_swap_lock = threading.Lock()
+
+# Set once the dataset is loaded; cleared when the process starts shutting down
+ready = threading.Event()
+
+
+def swap_snapshot(new):
+    """Publish ``new`` as the snapshot for all subsequent requests"""
+    global snapshot
+    old, snapshot = snapshot, new
+
+    # Cached answers (and worker processes) hold the previous data
+    answer_cache.clear()
+    subquery_pool.restart()
+
+    # Requests still holding the old snapshot fall back to its local arrays
+    if old is not None and old.cube is not new.cube and isinstance(old.cube, ShardedCube):
+        old.cube.close()
+    return new
+
+
+def load_data(path=DATA_FILE):
+    """(Re)load the dataset, replay ingested batches and rebuild everything derived from it"""
+    with _swap_lock, stage_seconds.time('load'):
+        # Typed, memory-mapped snapshot of the dataset (built from the CSV on first use)
+        data = load_dataset(path)
+
+        batches = replay(INGEST_DIR)
+
+        # The cube and precomputed answers saved with the dataset only hold
+        # for the dataset file as it was built from. Batches are added to the
+        # cube the way live ingestion adds them (a State/Year's rainfall is
+        # recorded once), so a reload answers as the server did before it
+        cube = open_cube(path)
+        if cube is None:
+            cube = ShardedCube.aggregate(path, SHARD_BY, SHARDS) if SHARDS and not batches else AggregateCube(data)
+            save_cube(path, cube)
+        answers = None if batches else open_store(path)
+        for _, batch in batches:
+            cube = cube.extend(batch)
+        if SHARDS and not isinstance(cube, ShardedCube):
+            cube = ShardedCube(cube, SHARD_BY, SHARDS)
+
+        version = snapshot.version + 1 if snapshot is not None else 0
+        chunks = [data] + [typed(batch) for _, batch in batches]
+        new = swap_snapshot(Snapshot(chunks, cube, version=version, batches=[name for name, _ in batches],
+                                     answers=answers, dataset=path))
+        ready.set()
+        return new
+
+
+def ingest_batch(batch, name=None):
+    """Append validated rows to the live dataset without a restart
+
+    ``name`` is the batch's file under INGEST_DIR/processed; a batch that is
+    already part of the dataset is not applied twice.
+    """
+    with _swap_lock:
+        if name is not None and name in snapshot.batches:
+            return snapshot
+        return swap_snapshot(snapshot.extend(batch, name))
+
+
+# Load data
+load_data()
+
+# HTML Template
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Project Samarth</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
+        h1 { color: #2c3e50; }
+        form { background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+        input[type="text"] { padding: 10px; border: 2px solid #ddd; border-radius: 4px; font-size: 16px; }
+        button { padding: 10px 20px; background: #3498db; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 16px; }
+        button:hover { background: #2980b9; }
+        .answer { background: white; padding: 20px; margin-top: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); white-space: pre-wrap; font-family: monospace; }
+        .query-separator { margin: 30px 0; border-top: 3px double #3498db; padding-top: 20px; }
+    </style>
+</head>
+<body>
+    <h1>🌾 Project Samarth – Multi-Query Agricultural Engine</h1>
+    <form method="POST">
+        <input type="text" name="question" placeholder="Ask multiple questions! (e.g., 'Highest rice production AND rainfall in Punjab')" size="70" required>
+        <button type="submit">🔍 Ask</button>
+    </form>
+    {% if answer %}
+    <div class="answer">{{ answer }}</div>
+    {% endif %}
+</body>
+</html>
+"""
+
+
+# ============= QUERY PROCESSING ENGINE =============
+
+def parse_query(question, snap=None):
+    """Parse natural language question and extract intent"""
+    return engine.parse_query(question, snap if snap is not None else snapshot)
+
+
+# ============= RESULT COMPUTATION =============
+
+def compute_result(params, view=None):
+    """Run the (cached) plan for parsed params"""
+    return planner.run(params, view if view is not None else snapshot.cube)
+
+
+def lookup_or_compute(params, snap, view=None):
+    """The precomputed result for params if materialize.py stored one, else the live one"""
+    if snap.answers is not None:
+        with stage_seconds.time('lookup'):
+            result = snap.answers.get(params)
+        if result is not None:
+            return result
+    return compute_result(params, view if view is not None else snap.cube)
+
+
+def explain_result(params, view=None):
+    """``(result, Explain)``: the answer plus its plan and per-operator timings"""
+    return planner.explain(params, view if view is not None else snapshot.cube)
+
+
+# ============= TEXT ANSWERS =============
+
+def answer_as(intent, params, view=None):
+    return render_text(compute_result(dict(params, type=intent), view))
+
+
+def query_source(params, view=None):
+    """Answer questions about data source"""
+    return answer_as('source', params, view)
+
+
+def query_highest(params, view=None):
+    """Find highest production/rainfall"""
+    return answer_as('highest', params, view)
+
+
+def query_lowest(params, view=None):
+    """Find lowest production/rainfall"""
+    return answer_as('lowest', params, view)
+
+
+def query_compare(params, view=None):
+    """Compare production/rainfall between states - handles compound queries"""
+    return answer_as('compare', params, view)
+
+
+def query_average(params, view=None):
+    """Average production/rainfall per state"""
+    return answer_as('average', params, view)
+
+
+def query_total(params, view=None):
+    """Total production/rainfall per state"""
+    return answer_as('total', params, view)
+
+
+def query_trend(params, view=None):
+    """Show trend over years"""
+    return answer_as('trend', params, view)
+
+
+def query_correlation(params, view=None):
+    """How production relates to rainfall, per state and per crop"""
+    return answer_as('correlation', params, view)
+
+
+def query_list(params, view=None):
+    """List items based on query"""
+    return answer_as('list', params, view)
+
+
+def query_general(params, view=None):
+    """Handle general queries"""
+    return answer_as('general', params, view)
+
+
+def answer_params(params, view=None):
+    """Text answer for parsed params"""
+    return render_text(compute_result(params, view))
+
+
+def process_single_query(question, snap=None):
+    """Process a single query and return the answer"""
+    started = time.perf_counter()
+    intent = 'error'
+    try:
+        # Read the cache generation before the snapshot: if a reload lands in
+        # between, the answer is computed from old data but won't be cached
+        generation = answer_cache.generation
+        snap = snap if snap is not None else snapshot
+        with stage_seconds.time('parse'):
+            params = parse_query(question, snap)
+        intent = params['type']
+
+        # Differently phrased questions with the same intent share one answer
+        key = cache_key(params)
+        with stage_seconds.time('cache'):
+            answer = answer_cache.get(key)
+        if answer is None:
+            answer = in_flight.do((generation, key), lambda: compute_answer(params, snap, key, generation))
+        return answer
+
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+    finally:
+        intent_seconds.observe(intent, time.perf_counter() - started)
+
+
+def compute_answer(params, snap, key, generation):
+    """Compute, render and cache the text answer for parsed params"""
+    with stage_seconds.time('compute'):
+        result = lookup_or_compute(params, snap)
+    with stage_seconds.time('render'):
+        answer = render_text(result)
+    answer_cache.put(key, answer, generation)
+    return answer
+
+
+def answer_subqueries(queries, snap=None, timeout=REQUEST_TIMEOUT):
+    """Answer independent sub-queries in parallel, in order, within ``timeout`` seconds
+
+    A sub-query that misses the deadline gets a short notice in place of its
+    answer, so one slow part never holds back the rest of the response.
+    """
+    snap = snap if snap is not None else snapshot
+    if subquery_pool.kind == 'process':
+        # Worker processes answer from their own copy of the data
+        calls = [(q,) for q in queries]
+    else:
+        calls = [(q, snap) for q in queries]
+
+    answers = []
+    for status, value in subquery_pool.run(process_single_query, calls, timeout):
+        if status == DONE:
+            answers.append(value)
+        elif status == TIMED_OUT:
+            answers.append(f"⏱️ Not answered within {timeout:g}s - try asking this part on its own.")
+        else:
+            answers.append(f"❌ Error: {str(value)}")
+    return answers
+
+
+# ============= MAIN ROUTE =============
+
+@app.route('/', methods=['GET', 'POST'])
+def index():
+    answer = None
+
+    if request.method == 'POST':
+        question = request.form.get('question', '').strip()
+
+        if not question:
+            answer = "❌ Please enter a question!"
+        elif question.startswith(EXPLAIN_PREFIX):
+            # "EXPLAIN <question>": the answer followed by the plan behind it
+            answer = ''.join(iter_batch_text([question[len(EXPLAIN_PREFIX):].strip()], explain=True))
+        else:
+            try:
+                # Every part of the answer reads the same data
+                snap = snapshot
+
+                # Split compound queries
+                with stage_seconds.time('split'):
+                    queries = split_compound_query(question)
+
+                if len(queries) == 1:
+                    # Single query (possibly compound, handled by individual functions)
+                    answer = process_single_query(queries[0], snap)
+                else:
+                    # Multiple truly independent queries, answered side by side
+                    answers = answer_subqueries(queries, snap)
+                    answer = ''.join(iter_multi_answer([(q, [a]) for q, a in zip(queries, answers)]))
+
+            except Exception as e:
+                answer = f"❌ Error: {str(e)}\n\nTry rephrasing your question."
+
+    with stage_seconds.time('template'):
+        return render_template_string(HTML_TEMPLATE, answer=answer)
+
+
+# ============= JSON API =============
+
+def iter_batch(questions, explain=False):
+    """Answer several questions together, computing shared aggregations once
+
+    Every question is split and parsed as in the HTML route. Sub-queries that
+    parse to identical params are computed once, and all of them read from
+    one SharedAggregates view so overlapping groupings are reused. Yields
+    ``(question, sub_questions)`` pairs where each sub-question entry is a
+    ``(text, params, result, error, plan)`` tuple. ``plan`` is an Explain
+    result when ``explain`` is set (every sub-query is then run on its own,
+    so its timings are its own), otherwise None.
+    """
+    snap = snapshot
+    view = SharedAggregates(snap.cube)
+    computed = {}
+
+    for question in questions:
+        queries = []
+        with stage_seconds.time('split'):
+            sub_questions = split_compound_query(question)
+        for sub_question in sub_questions:
+            started = time.perf_counter()
+            intent = 'error'
+            try:
+                with stage_seconds.time('parse'):
+                    params = parse_query(sub_question, snap)
+                intent = params['type']
+                key = cache_key(params)
+                if explain:
+                    with stage_seconds.time('compute'):
+                        result, plan = explain_result(params, view)
+                    queries.append((sub_question, params, result, None, plan))
+                    continue
+                if key not in computed:
+                    with stage_seconds.time('compute'):
+                        # Shared with identical questions in concurrent batches, too
+                        computed[key] = in_flight.do(('result', snap.version, key),
+                                                     lambda: lookup_or_compute(params, snap, view))
+                queries.append((sub_question, params, computed[key], None, None))
+            except Exception as e:
+                queries.append((sub_question, None, None, str(e), None))
+            finally:
+                intent_seconds.observe(intent, time.perf_counter() - started)
+        yield question, queries
+
+
+def evaluate_batch(questions, explain=False):
+    """JSON-ready answers for a batch of questions"""
+    def entry(text, params, result, error, plan):
+        if error:
+            return {'question': text, 'error': error}
+        answer = {'question': text, 'params': params, 'result': to_dict(result)}
+        if plan is not None:
+            answer['plan'] = to_dict(plan)
+        return answer
+
+    results = []
+    for question, queries in iter_batch(questions, explain):
+        with stage_seconds.time('render'):
+            results.append({'question': question, 'queries': [entry(*query) for query in queries]})
+    return results
+
+
+def iter_batch_text(questions, explain=False):
+    """Stream the text answers for a batch, one chunk at a time"""
+    def chunks(result, error, plan):
+        if error:
+            return [f"❌ Error: {error}"]
+        if plan is not None:
+            return itertools.chain(iter_text(result), ["\n"], iter_text(plan))
+        return iter_text(result)
+
+    for _, queries in iter_batch(questions, explain):
+        if len(queries) == 1:
+            _, _, result, error, plan = queries[0]
+            yield from chunks(result, error, plan)
+        else:
+            yield from iter_multi_answer([(text, chunks(result, error, plan))
+                                          for text, _, result, error, plan in queries])
+        yield "\n"
+
+
+def iter_batch_csv(questions, explain=False):
+    """Stream a batch as CSV blocks, one per sub-query, preceded by a comment line"""
+    for _, queries in iter_batch(questions, explain):
+        for text, _, result, error, plan in queries:
+            yield f"# {text}\n"
+            if error:
+                yield from iter_csv(Message('error', error))
+            else:
+                yield from iter_csv(result)
+            yield "\n"
+            if plan is not None:
+                yield f"# plan: {text}\n"
+                yield from iter_csv(plan)
+                yield "\n"
+
+
+# Raw rows returned by /api/records, unless the request asks for fewer
+RECORD_LIMIT = 1000
+RECORD_COLUMNS = ['State', 'Year', 'crop', 'Production', 'Rainfall']
+
+
+def compute_records(params, snap=None, columns=RECORD_COLUMNS, limit=RECORD_LIMIT):
+    """Raw rows matching the states, years and crops in ``params``, read through the row index"""
+    snap = snap if snap is not None else snapshot
+    rows = snap.row_index.select(params.get('states'), params.get('years'), params.get('crops'))
+    shown = rows[:limit]
+    return Records(total=len(rows), columns=list(columns), values=[gather(snap.chunks, c, shown) for c in columns])
+
+
+@app.route('/api/records', methods=['POST'])
+def api_records():
+    """Rows matching a question or explicit filters
+
+    Body: {"question": "..."} or any of {"states": [...], "years": [...],
+    "crops": [...]}, plus optional "columns", "limit" and "format" (json or csv).
+    """
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    snap = snapshot
+
+    if isinstance(payload.get('question'), str) and payload['question'].strip():
+        try:
+            params = parse_query(payload['question'].strip(), snap)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        params = {}
+        for name in ('states', 'years', 'crops'):
+            values = payload.get(name)
+            if values is not None and not isinstance(values, list):
+                return jsonify({'error': f'"{name}" must be a list'}), 400
+            params[name] = values
+
+    columns = payload.get('columns', RECORD_COLUMNS)
+    unknown = [c for c in columns if c not in RECORD_COLUMNS] if isinstance(columns, list) else columns
+    if not columns or unknown:
+        return jsonify({'error': f'"columns" must be a non-empty list of {", ".join(RECORD_COLUMNS)}'}), 400
+    limit = payload.get('limit', RECORD_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+        return jsonify({'error': '"limit" must be a non-negative integer'}), 400
+
+    with stage_seconds.time('select'):
+        result = compute_records(params, snap, columns, limit)
+
+    output = payload.get('format', 'json')
+    if output == 'csv':
+        return Response(stream_with_context(iter_csv(result)), mimetype='text/csv')
+    elif output == 'json':
+        return jsonify(to_dict(result))
+    else:
+        return jsonify({'error': f'Unknown format {output!r}; use json or csv'}), 400
+
+
+@app.route('/api/query', methods=['POST'])
+def api_query():
+    """JSON endpoint: {"question": "..."} or {"questions": ["...", ...]}
+
+    An optional "format" of "text" or "csv" streams the rendered answers
+    instead of returning one JSON document; "explain": true adds the query
+    plan of every sub-query with the time spent in each operator.
+    """
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    questions = payload.get('questions', payload.get('question'))
+    if isinstance(questions, str):
+        questions = [questions]
+
+    if not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({'error': 'Provide "question" or a non-empty "questions" list of strings'}), 400
+
+    questions = [q.strip() for q in questions]
+    output = payload.get('format', 'json')
+    explain = bool(payload.get('explain'))
+
+    if output == 'text':
+        return Response(stream_with_context(iter_batch_text(questions, explain)), mimetype='text/plain')
+    elif output == 'csv':
+        return Response(stream_with_context(iter_batch_csv(questions, explain)), mimetype='text/csv')
+    elif output == 'json':
+        return jsonify({'results': evaluate_batch(questions, explain)})
+    else:
+        return jsonify({'error': f'Unknown format {output!r}; use json, text or csv'}), 400
+
+
+# ============= METRICS =============
+
+def profiled_threads(request_thread):
+    """The request thread plus the pool threads that may be answering its sub-queries"""
+    def threads():
+        return [request_thread] + [thread.ident for thread in threading.enumerate()
+                                   if thread.name.startswith('subquery')]
+    return threads
+
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    if request.headers.get('X-Profile') == '1' and admin_authorized():
+        g.profiler = SamplingProfiler(profiled_threads(threading.get_ident()), interval=PROFILE_INTERVAL)
+        g.profiler.start()
+
+
+@app.after_request
+def finish_request(response):
+    """Record the request time; for streamed responses this covers the handler, not the stream"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response.headers['X-Profile-Id'] = profiles.add(profiler.stop())
+    request_seconds.observe(request.endpoint or 'unknown', time.perf_counter() - g.started)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Stage, intent and request latency histograms plus cache/dataset gauges for Prometheus"""
+    return Response(registry.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route('/admin/profile/<profile_id>')
+def admin_profile(profile_id):
+    """Collapsed stacks sampled during a profiled request (feed to flamegraph.pl or speedscope)"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    profile = profiles.get(profile_id)
+    if profile is None:
+        return jsonify({'error': f'No profile {profile_id!r}'}), 404
+    header = f"# {sum(profile.samples.values())} samples over {profile.elapsed:.3f}s\n"
+    return Response(header + profile.collapsed(), mimetype='text/plain')
+
+
+# ============= ADMIN =============
+
+def admin_authorized():
+    token = request.headers.get('X-Admin-Token', '')
+    return ADMIN_TOKEN is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.route('/admin/ingest', methods=['POST'])
+def admin_ingest():
+    """Append rows to the live dataset: JSON {"rows": [...]} or a CSV body"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    try:
+        if request.is_json:
+            batch = batch_from_records((request.get_json(silent=True) or {}).get('rows') or [])
+        else:
+            batch = batch_from_csv(request.get_data(as_text=True))
+    except Exception as e:
+        return jsonify({'error': f'Invalid batch: {e}'}), 400
+
+    # Persist first so the batch is replayed if the process restarts (and
+    # picked up by the other server processes)
+    path = persist_batch(batch, INGEST_DIR)
+    snap = ingest_batch(batch, os.path.basename(path))
+    return jsonify({'ingested': len(batch), 'records': snap.cube.rows, 'version': snap.version})
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload the dataset from disk (base file plus every ingested batch)"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    snap = load_data()
+    return jsonify({'records': snap.cube.rows, 'version': snap.version})
+
+
+# ============= LIFECYCLE =============
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the dataset is loaded and the process is not shutting down"""
+    if not ready.is_set():
+        return jsonify({'status': 'unavailable'}), 503
+    return jsonify({'status': 'ready', 'records': snapshot.cube.rows, 'version': snapshot.version})
+
+
+background = []
+
+
+def start_ingest_watcher(interval=5.0):
+    """Poll INGEST_DIR in the background and ingest any CSV dropped into it"""
+    watcher = IngestWatcher(INGEST_DIR, ingest_batch, interval=interval)
+    watcher.start()
+    background.append(watcher)
+    return watcher
+
+
+def start_batch_follower(interval=5.0):
+    """Apply batches that other server processes accept (see serve.py)"""
+    follower = BatchFollower(INGEST_DIR, ingest_batch, lambda: snapshot.batches, interval=interval)
+    follower.start()
+    background.append(follower)
+    return follower
+
+
+def shutdown():
+    """Stop taking new work: fail readiness, stop background threads and the sub-query pool"""
+    ready.clear()
+    while background:
+        background.pop().stop()
+    subquery_pool.shutdown(wait=True)
+    if isinstance(snapshot.cube, ShardedCube):
+        snapshot.cube.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    years = [year for chunk in snapshot.chunks for year in (chunk['Year'].min(), chunk['Year'].max())]
+    print("=" * 60)
+    print("🌾 Project Samarth - Smart Multi-Query Engine")
+    print("=" * 60)
+    print(f"📊 Data: {snapshot.cube.rows} records")
+    print(f"📅 Years: {min(years)}-{max(years)}")
+    print(f"📥 Ingest: drop CSV batches into {INGEST_DIR}/")
+    print("=" * 60)
+    print("🚀 Server: http://localhost:5000")
+    print("=" * 60)
+    print("\n📝 Try Complex Queries:")
+    print("  • Compare rainfall in Rajasthan and Maharashtra every year")
+    print("    At the same time list top crops and mention data source")
+    print("  • Highest rice production. Also show trend")
+    print("=" * 60)
+
+    # The debug reloader runs this block in two processes; watch from the serving one only
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_ingest_watcher()
+    app.run(debug=True, port=5000)
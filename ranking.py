@@ -0,0 +1,50 @@
+import numpy as np
+
+# Top-k selection over pre-aggregated group arrays. Only the selected groups
+# are sorted: argpartition finds the k-th best value in linear time, so
+# ranking thousands of groups costs about as much as summing them.
+
+
+def order_key(values, ascending=False):
+    """Sort key where smaller is better; NaN (no data) always ranks last"""
+    values = np.asarray(values, dtype=np.float64)
+    key = values if ascending else -values
+    return np.where(np.isnan(key), np.inf, key)
+
+
+def top_k(values, k, ascending=False, ties=True):
+    """Positions of the ``k`` largest values (smallest if ``ascending``), best first
+
+    Equal values keep their group order, like a stable sort. With ``ties``
+    every group equal to the k-th value is included as well, so a ranking
+    never cuts a tie arbitrarily.
+    """
+    key = order_key(values, ascending)
+    n = len(key)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k >= n:
+        return np.argsort(key, kind='stable')
+
+    threshold = key[np.argpartition(key, k - 1)[k - 1]]
+    better = np.flatnonzero(key < threshold)
+    tied = np.flatnonzero(key == threshold)
+    if not ties:
+        tied = tied[:k - len(better)]
+
+    selected = np.concatenate([better, tied])
+    return selected[np.argsort(key[selected], kind='stable')]
+
+
+def competition_ranks(values, ascending=False):
+    """1-based ranks of already ordered ``values`` with ties sharing a rank (1, 2, 2, 4)"""
+    key = order_key(values, ascending)
+    return np.searchsorted(key, key, side='left') + 1
+
+
+def rank(labels, values, k, ascending=False):
+    """The best ``k`` groups as ``(labels, values, ranks)``"""
+    idx = top_k(values, k, ascending)
+    values = np.asarray(values)[idx]
+    return np.asarray(labels)[idx], values, competition_ranks(values, ascending)
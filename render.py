@@ -0,0 +1,530 @@
+import csv
+import io
+from functools import singledispatch
+
+import numpy as np
+
+from results import (Aggregate, CropListing, Comparison, Correlation, Explain, Message, RainfallAndCrops,
+                     Ranking, Records, SourceInfo, Summary, Trend)
+
+RULE = "═" * 63
+
+
+def format_number(num):
+    """Format large numbers with commas"""
+    return f"{num:,.2f}"
+
+
+def format_percent(value, sign=False):
+    """A percentage, or n/a where it is undefined (relative to zero)"""
+    if not np.isfinite(value):
+        return "n/a"
+    return f"{value:+.2f}%" if sign else f"{value:.2f}%"
+
+
+def header(title):
+    """Box-drawing title shared by every text answer"""
+    return (f"╔═══════════════════════════════════════════════════════════╗\n"
+            f"║  {title}\n"
+            f"╚═══════════════════════════════════════════════════════════╝\n\n")
+
+
+def plain(value):
+    """Convert NumPy scalars/arrays to plain JSON types (NaN/inf -> None)"""
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [plain(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+# ============= TEXT =============
+
+@singledispatch
+def iter_text(result):
+    """Yield the text answer for ``result`` piece by piece"""
+    raise TypeError(f"No text renderer for {type(result).__name__}")
+
+
+def render_text(result):
+    return ''.join(iter_text(result))
+
+
+@iter_text.register
+def _(result: Message):
+    yield f"❌ {result.error}"
+
+
+@iter_text.register
+def _(result: SourceInfo):
+    yield header("DATA SOURCE INFORMATION")
+
+    yield "🌐 PRIMARY SOURCE:\n"
+    yield RULE + "\n"
+    yield f"  Portal: {result.portal}\n"
+    yield "  Official: Open Government Data (OGD) Platform India\n"
+    yield f"  Website: {result.website}\n\n"
+
+    yield f"📁 Dataset: {result.dataset}\n\n"
+    yield "📊 Data Contents:\n"
+    yield f"  • Years Covered: {result.first_year} - {result.last_year}\n"
+    yield f"  • States: {result.states} Indian states\n"
+    yield f"  • Crops: {result.crops} different crop types\n"
+    yield f"  • Total Records: {result.records:,}\n\n"
+
+    yield "🔍 Data Fields:\n"
+    yield "  • State: Geographic location\n"
+    yield f"  • Year: Time period ({result.first_year}-{result.last_year})\n"
+    yield "  • Crop: Agricultural product\n"
+    yield "  • Production: Output quantity\n"
+    yield "  • Rainfall: Precipitation in millimeters\n\n"
+
+    yield "ℹ️  NOTE:\n"
+    yield "   This is a merged dataset combining agricultural production\n"
+    yield "   data with regional rainfall measurements from data.gov.in,\n"
+    yield "   India's official open data portal maintained by the\n"
+    yield "   National Informatics Centre (NIC).\n"
+
+
+@iter_text.register
+def _(result: Ranking):
+    metric = result.metric
+    unit = " mm" if metric == 'Rainfall' else ""
+
+    dimension = result.dimension.upper()
+
+    if result.type == 'highest':
+        yield header(f"HIGHEST {metric.upper()} ANALYSIS")
+        yield f"🏆 TOP {dimension}: {result.labels[0]}\n"
+    else:
+        yield header(f"LOWEST {metric.upper()} ANALYSIS")
+        yield f"📉 BOTTOM {dimension}: {result.labels[0]}\n"
+    yield f"📊 {metric}: {format_number(result.values[0])}{unit}\n\n"
+
+    yield f"TOP {result.k} RANKING:\n" if result.type == 'highest' else f"BOTTOM {result.k} RANKING:\n"
+    yield RULE + "\n"
+    for rank, label, value in zip(result.ranks, result.labels, result.values):
+        yield f"  {rank}. {str(label):25} → {format_number(value)}{unit}\n"
+
+
+def iter_crop_ranking(ranking):
+    yield f"📍 {ranking.state.upper()}:\n"
+    for rank, crop, prod in zip(ranking.ranks, ranking.labels, ranking.values):
+        yield f"  {rank}. {crop:20} → {format_number(prod)}\n"
+    yield "\n"
+
+
+@iter_text.register
+def _(result: RainfallAndCrops):
+    state1, state2 = result.states
+    yield header(f"COMPREHENSIVE COMPARISON: {state1.upper()} vs {state2.upper()}")
+
+    # PART 1: Rainfall comparison
+    yield "🌧️  RAINFALL COMPARISON:\n"
+    yield RULE + "\n\n"
+
+    yield f"{'Year':<10} {state1:<25} {state2:<25}\n"
+    yield "-" * 63 + "\n"
+    for year, rain1, rain2 in zip(result.years, result.rainfall[0], result.rainfall[1]):
+        yield f"{year:<10} {format_number(rain1) + ' mm':<25} {format_number(rain2) + ' mm':<25}\n"
+
+    avg_rain1, avg_rain2 = result.average_rainfall
+    yield "-" * 63 + "\n"
+    yield f"{'Average':<10} {format_number(avg_rain1) + ' mm':<25} {format_number(avg_rain2) + ' mm':<25}\n"
+
+    # PART 2: Top crop production
+    yield "\n\n🌾 TOP CROPS PRODUCED:\n"
+    yield RULE + "\n\n"
+    for ranking in result.top_crops:
+        yield from iter_crop_ranking(ranking)
+
+
+@iter_text.register
+def _(result: Comparison):
+    state1, state2 = result.states
+    value1, value2 = result.values
+    rainfall = result.metric == 'Rainfall'
+
+    yield header(f"COMPARISON: {state1.upper()} vs {state2.upper()}")
+
+    yield f"📊 {result.metric.upper()} COMPARISON:\n\n"
+    yield f"  {state1:25} → {format_number(value1)}{' mm (avg)' if rainfall else ''}\n"
+    yield f"  {state2:25} → {format_number(value2)}{' mm (avg)' if rainfall else ''}\n\n"
+
+    yield f"  Difference: {format_number(result.difference)}{' mm' if rainfall else ''}\n"
+    yield f"  Percentage: {format_percent(result.percent_difference)}\n"
+    yield f"  Winner: {result.winner} 🏆\n"
+
+
+@iter_text.register
+def _(result: Trend):
+    unit = " mm" if result.metric == 'Rainfall' else ""
+    span = f" ({result.years[0]}-{result.years[-1]})" if len(result.years) else ""
+    yield header(f"{result.metric.upper()} TREND{span}")
+
+    for year, value in zip(result.years, result.values):
+        yield f"  {year}  →  {format_number(value)}{unit}\n"
+
+    yield f"\n  Overall Growth: {format_percent(result.growth, sign=True)}\n"
+    yield f"  Trend: {'📈 Increasing' if result.values[-1] > result.values[0] else '📉 Decreasing'}\n"
+
+
+@iter_text.register
+def _(result: Aggregate):
+    unit = " mm" if result.metric == 'Rainfall' else ""
+    yield header(f"{result.type.upper()} {result.metric.upper()} BY STATE")
+
+    # Rainfall is counted in State/Years with a reading, production in rows
+    rainfall = result.metric == 'Rainfall'
+    per = (" per state-year" if rainfall else " per record") if result.type == 'average' else ""
+    yield f"📊 Overall: {format_number(result.overall)}{unit}{per}\n\n"
+
+    yield RULE + "\n"
+    for state, value, count in zip(result.labels, result.values, result.counts):
+        yield f"  {state:25} → {format_number(value) + unit:<20} ({count} {'years' if rainfall else 'records'})\n"
+
+
+def format_coefficient(value):
+    return "  n/a" if np.isnan(value) else f"{value:+.2f}"
+
+
+def iter_correlation_table(table):
+    for label, r, rho, n in zip(table.labels, table.pearson, table.spearman, table.points):
+        yield f"  {label:25} r = {format_coefficient(r)}   ρ = {format_coefficient(rho)}   (n={n})\n"
+
+
+@iter_text.register
+def _(result: Correlation):
+    yield header("RAINFALL vs PRODUCTION CORRELATION")
+
+    yield "📊 ACROSS ALL STATES (state-years):\n"
+    yield from iter_correlation_table(result.overall)
+
+    yield "\n📍 BY STATE (yearly production vs rainfall):\n"
+    yield RULE + "\n"
+    yield from iter_correlation_table(result.states)
+
+    yield "\n🌾 BY CROP (production vs rainfall across state-years):\n"
+    yield RULE + "\n"
+    yield from iter_correlation_table(result.crops)
+
+    yield "\n  r = Pearson, ρ = Spearman rank correlation; n/a below 3 points\n"
+
+
+@iter_text.register
+def _(result: CropListing):
+    yield header("TOP CROPS BY STATE")
+    for ranking in result.states:
+        yield from iter_crop_ranking(ranking)
+
+
+@iter_text.register
+def _(result: Summary):
+    yield header("DATA SUMMARY")
+    yield f"  Total Records:    {result.records}\n"
+    yield f"  Total Production: {format_number(result.production)}\n"
+    yield f"  Avg Rainfall:     {format_number(result.average_rainfall)} mm\n"
+    yield f"  States:           {result.states}\n"
+    yield f"  Crops:            {result.crops}\n"
+
+
+@iter_text.register
+def _(result: Records):
+    yield header("MATCHING RECORDS")
+    shown = len(result.values[0]) if result.values else 0
+    yield f"  {result.total:,} records" + (f" (first {shown:,} shown)" if shown < result.total else "") + "\n\n"
+
+    yield "  " + " | ".join(f"{column:>14}" for column in result.columns) + "\n"
+    yield RULE + "\n"
+    for row in zip(*result.values):
+        yield "  " + " | ".join(f"{value:>14}" for value in plain(list(row))) + "\n"
+
+
+@iter_text.register
+def _(result: Explain):
+    yield header(f"QUERY PLAN ({result.intent})")
+    yield f"  Planning: {result.planning * 1000:.3f} ms ({'cached plan' if result.cached else 'compiled'})\n\n"
+
+    yield RULE + "\n"
+    for i, (operator, seconds) in enumerate(zip(result.operators, result.seconds), 1):
+        yield f"  {i}. {operator:60} {seconds * 1000:9.3f} ms\n"
+    yield f"  {'Total':63} {result.seconds.sum() * 1000:9.3f} ms\n"
+
+    if result.rewrites:
+        yield "\n🔧 OPTIMIZER:\n"
+        for rewrite in result.rewrites:
+            yield f"  • {rewrite}\n"
+
+
+# ============= JSON =============
+
+@singledispatch
+def to_dict(result):
+    """JSON-ready dict for ``result``"""
+    raise TypeError(f"No JSON renderer for {type(result).__name__}")
+
+
+def crop_rows(ranking):
+    return [{'crop': crop, 'value': value, 'rank': rank}
+            for rank, crop, value in zip(ranking.ranks, ranking.labels, ranking.values)]
+
+
+@to_dict.register
+def _(result: Message):
+    return {'type': result.type, 'error': result.error}
+
+
+@to_dict.register
+def _(result: SourceInfo):
+    return plain({
+        'type': result.type,
+        'portal': result.portal,
+        'website': result.website,
+        'dataset': result.dataset,
+        'years': [result.first_year, result.last_year],
+        'states': result.states,
+        'crops': result.crops,
+        'records': result.records,
+    })
+
+
+@to_dict.register
+def _(result: Ranking):
+    return plain({
+        'type': result.type,
+        'metric': result.metric,
+        'dimension': result.dimension,
+        'rows': [{result.dimension: label, 'value': value, 'rank': rank}
+                 for rank, label, value in zip(result.ranks, result.labels, result.values)],
+    })
+
+
+@to_dict.register
+def _(result: RainfallAndCrops):
+    return plain({
+        'type': result.type,
+        'metric': result.metric,
+        'states': result.states,
+        'rainfall': [{'Year': year, 'values': [rain1, rain2]}
+                     for year, rain1, rain2 in zip(result.years, result.rainfall[0], result.rainfall[1])],
+        'average_rainfall': result.average_rainfall,
+        'top_crops': [crop_rows(ranking) for ranking in result.top_crops],
+    })
+
+
+@to_dict.register
+def _(result: Comparison):
+    return plain({
+        'type': result.type,
+        'metric': result.metric,
+        'aggregate': result.aggregate,
+        'states': result.states,
+        'values': result.values,
+        'difference': result.difference,
+        'percent_difference': result.percent_difference,
+        'winner': result.winner,
+    })
+
+
+@to_dict.register
+def _(result: Trend):
+    return plain({
+        'type': result.type,
+        'metric': result.metric,
+        'rows': [{'Year': year, 'value': value} for year, value in zip(result.years, result.values)],
+        'growth': result.growth,
+    })
+
+
+@to_dict.register
+def _(result: Aggregate):
+    return plain({
+        'type': result.type,
+        'metric': result.metric,
+        'overall': result.overall,
+        'rows': [{'State': state, 'value': value, 'records': count}
+                 for state, value, count in zip(result.labels, result.values, result.counts)],
+    })
+
+
+def correlation_rows(table):
+    return [{table.dimension: label, 'pearson': r, 'spearman': rho, 'points': n}
+            for label, r, rho, n in zip(table.labels, table.pearson, table.spearman, table.points)]
+
+
+@to_dict.register
+def _(result: Correlation):
+    return plain({
+        'type': result.type,
+        'overall': correlation_rows(result.overall)[0],
+        'states': correlation_rows(result.states),
+        'crops': correlation_rows(result.crops),
+    })
+
+
+@to_dict.register
+def _(result: CropListing):
+    return plain({
+        'type': result.type,
+        'states': [{'State': ranking.state, 'crops': crop_rows(ranking)} for ranking in result.states],
+    })
+
+
+@to_dict.register
+def _(result: Summary):
+    return plain({
+        'type': result.type,
+        'records': result.records,
+        'production': result.production,
+        'average_rainfall': result.average_rainfall,
+        'states': result.states,
+        'crops': result.crops,
+    })
+
+
+@to_dict.register
+def _(result: Records):
+    return plain({
+        'type': result.type,
+        'total': result.total,
+        'columns': result.columns,
+        'rows': [dict(zip(result.columns, row)) for row in zip(*result.values)],
+    })
+
+
+@to_dict.register
+def _(result: Explain):
+    return plain({
+        'type': result.type,
+        'intent': result.intent,
+        'cached': result.cached,
+        'planning_ms': result.planning * 1000,
+        'operators': [{'operator': operator, 'ms': seconds * 1000}
+                      for operator, seconds in zip(result.operators, result.seconds)],
+        'rewrites': result.rewrites,
+    })
+
+
+# ============= CSV =============
+
+def csv_line(*fields):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(['' if f is None else f for f in plain(list(fields))])
+    return buffer.getvalue()
+
+
+@singledispatch
+def iter_csv(result, with_header=True):
+    """Yield ``result`` as CSV lines (with a header row unless ``with_header`` is False)"""
+    raise TypeError(f"No CSV renderer for {type(result).__name__}")
+
+
+def render_csv(result):
+    return ''.join(iter_csv(result))
+
+
+@iter_csv.register
+def _(result: Message, with_header=True):
+    if with_header:
+        yield csv_line('type', 'error')
+    yield csv_line(result.type, result.error)
+
+
+@iter_csv.register
+def _(result: SourceInfo, with_header=True):
+    if with_header:
+        yield csv_line('field', 'value')
+    for field in ('portal', 'website', 'dataset', 'first_year', 'last_year', 'states', 'crops', 'records'):
+        yield csv_line(field, getattr(result, field))
+
+
+@iter_csv.register
+def _(result: Ranking, with_header=True):
+    if with_header:
+        yield csv_line('rank', result.dimension, result.metric)
+    for rank, label, value in zip(result.ranks, result.labels, result.values):
+        yield csv_line(rank, label, value)
+
+
+@iter_csv.register
+def _(result: RainfallAndCrops, with_header=True):
+    # Long format: one row per (section, state, label) so both parts fit one table
+    if with_header:
+        yield csv_line('section', 'State', 'label', 'value')
+    for state, rainfall, average in zip(result.states, result.rainfall, result.average_rainfall):
+        for year, value in zip(result.years, rainfall):
+            yield csv_line('rainfall', state, year, value)
+        yield csv_line('average_rainfall', state, None, average)
+    for ranking in result.top_crops:
+        for crop, value in zip(ranking.labels, ranking.values):
+            yield csv_line('top_crops', ranking.state, crop, value)
+
+
+@iter_csv.register
+def _(result: Comparison, with_header=True):
+    if with_header:
+        yield csv_line('State', result.metric)
+    for state, value in zip(result.states, result.values):
+        yield csv_line(state, value)
+
+
+@iter_csv.register
+def _(result: Trend, with_header=True):
+    if with_header:
+        yield csv_line('Year', result.metric)
+    for year, value in zip(result.years, result.values):
+        yield csv_line(year, value)
+
+
+@iter_csv.register
+def _(result: Aggregate, with_header=True):
+    if with_header:
+        yield csv_line('State', result.metric, 'records')
+    for state, value, count in zip(result.labels, result.values, result.counts):
+        yield csv_line(state, value, count)
+    yield csv_line('Overall', result.overall, result.counts.sum())
+
+
+@iter_csv.register
+def _(result: Correlation, with_header=True):
+    if with_header:
+        yield csv_line('dimension', 'label', 'pearson', 'spearman', 'points')
+    for table in (result.overall, result.states, result.crops):
+        for label, r, rho, n in zip(table.labels, table.pearson, table.spearman, table.points):
+            yield csv_line(table.dimension, label, r, rho, n)
+
+
+@iter_csv.register
+def _(result: CropListing, with_header=True):
+    if with_header:
+        yield csv_line('State', 'rank', 'crop', 'Production')
+    for ranking in result.states:
+        for rank, crop, value in zip(ranking.ranks, ranking.labels, ranking.values):
+            yield csv_line(ranking.state, rank, crop, value)
+
+
+@iter_csv.register
+def _(result: Summary, with_header=True):
+    if with_header:
+        yield csv_line('records', 'production', 'average_rainfall', 'states', 'crops')
+    yield csv_line(result.records, result.production, result.average_rainfall, result.states, result.crops)
+
+
+@iter_csv.register
+def _(result: Records, with_header=True):
+    if with_header:
+        yield csv_line(*result.columns)
+    for row in zip(*result.values):
+        yield csv_line(*row)
+
+
+@iter_csv.register
+def _(result: Explain, with_header=True):
+    if with_header:
+        yield csv_line('step', 'operator', 'ms')
+    for i, (operator, seconds) in enumerate(zip(result.operators, result.seconds), 1):
+        yield csv_line(i, operator, seconds * 1000)
@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+from typing import ClassVar
+
+import numpy as np
+
+# Result objects returned by the compute_* functions in query.py. They hold
+# only the computed numbers (mostly NumPy arrays); render.py turns them into
+# text, JSON or CSV.
+
+
+@dataclass(slots=True)
+class SourceInfo:
+    type: ClassVar[str] = 'source'
+    portal: str
+    website: str
+    dataset: str
+    first_year: int
+    last_year: int
+    states: int
+    crops: int
+    records: int
+
+
+@dataclass(slots=True)
+class Ranking:
+    """Groups (states by default) ordered by a summed metric; ``type`` is 'highest' or 'lowest'"""
+    type: str
+    metric: str
+    labels: np.ndarray
+    values: np.ndarray
+    ranks: np.ndarray               # 1-based, tied values share a rank
+    dimension: str = 'State'
+    k: int = 5                      # rows asked for; ties at the cut can add more
+
+
+@dataclass(slots=True)
+class CropRanking:
+    """Top crops by production for one state"""
+    state: str
+    labels: np.ndarray
+    values: np.ndarray
+    ranks: np.ndarray
+
+
+@dataclass(slots=True)
+class Comparison:
+    """One metric for two states (sums, or means for rainfall)"""
+    type: ClassVar[str] = 'compare'
+    metric: str
+    aggregate: str
+    states: tuple
+    values: np.ndarray
+    difference: float
+    percent_difference: float
+    winner: str
+
+
+@dataclass(slots=True)
+class RainfallAndCrops:
+    """Year-by-year rainfall plus top crops for two states"""
+    type: ClassVar[str] = 'compare'
+    metric: ClassVar[str] = 'Both'
+    states: tuple
+    years: np.ndarray
+    rainfall: np.ndarray            # shape (2, len(years)), NaN where a state has no rows
+    average_rainfall: np.ndarray
+    top_crops: list
+
+
+@dataclass(slots=True)
+class Trend:
+    type: ClassVar[str] = 'trend'
+    metric: str
+    years: np.ndarray
+    values: np.ndarray
+    growth: float
+
+
+@dataclass(slots=True)
+class Aggregate:
+    """A metric summed or averaged per state, plus over the whole selection; ``type`` is 'total' or 'average'"""
+    type: str
+    metric: str
+    labels: np.ndarray
+    values: np.ndarray
+    counts: np.ndarray              # rows behind each value (State/Years with a reading, for rainfall)
+    overall: float
+
+
+@dataclass(slots=True)
+class CorrelationTable:
+    """Production-vs-rainfall correlation for each label of one dimension (NaN below 3 points)"""
+    dimension: str
+    labels: np.ndarray
+    pearson: np.ndarray
+    spearman: np.ndarray
+    points: np.ndarray
+
+
+@dataclass(slots=True)
+class Correlation:
+    type: ClassVar[str] = 'correlation'
+    overall: CorrelationTable       # a single 'All states' row over every state-year
+    states: CorrelationTable        # yearly production against yearly rainfall
+    crops: CorrelationTable         # production against rainfall over state-years
+
+
+@dataclass(slots=True)
+class CropListing:
+    type: ClassVar[str] = 'list'
+    states: list                    # of CropRanking
+
+
+@dataclass(slots=True)
+class Summary:
+    type: ClassVar[str] = 'general'
+    records: int
+    production: float
+    average_rainfall: float
+    states: int
+    crops: int
+
+
+@dataclass(slots=True)
+class Message:
+    """A handler-level answer that carries no data (e.g. too few states to compare)"""
+    type: str
+    error: str
+
+
+@dataclass(slots=True)
+class Records:
+    """Raw rows matching a filter: ``values`` holds one array per column, ``total`` counts every match"""
+    type: ClassVar[str] = 'records'
+    total: int
+    columns: list
+    values: list
+
+
+@dataclass(slots=True)
+class Explain:
+    """The plan that answered a question, with the seconds spent in each of its operators"""
+    type: ClassVar[str] = 'explain'
+    intent: str
+    cached: bool                    # plan reused from the planner's cache
+    planning: float                 # seconds to find (or compile) the plan
+    operators: list                 # one description per operator, in execution order
+    seconds: np.ndarray
+    rewrites: list                  # what the optimizer changed in the logical plan
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from cube import DIMENSIONS
+
+
+class RowIndex:
+    """Inverted index from each State, Year and crop value to its row positions
+
+    Per dimension the row numbers are stored grouped by value (one stable
+    argsort of the codes plus offsets), so the rows holding any value are a
+    contiguous, already sorted slice. A filter over several dimensions
+    intersects those slices, starting from the smallest, and never touches
+    rows that can't match: selection costs time in proportion to the rows
+    of the selected values, not to the size of the table.
+
+    The table may be a list of frames read one after the other (see
+    as_chunks()); row positions then count across all of them.
+    """
+
+    def __init__(self, frames):
+        frames = as_chunks(frames)
+        self.rows = sum(len(df) for df in frames)
+        self.positions = {}
+        self.order = {}
+        self.offsets = {}
+
+        for dim in DIMENSIONS:
+            labels = np.asarray(pd.Categorical(np.concatenate([pd.unique(df[dim]) for df in frames])).categories)
+            codes = np.concatenate([np.asarray(pd.Categorical(df[dim], categories=labels).codes, dtype=np.intp)
+                                    for df in frames])
+            self.positions[dim] = {label: i for i, label in enumerate(labels.tolist())}
+            self.order[dim] = np.argsort(codes, kind='stable')
+            self.offsets[dim] = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+
+    def rows_for(self, dim, values):
+        """Sorted row positions whose ``dim`` is any of ``values``"""
+        positions = self.positions[dim]
+        offsets = self.offsets[dim]
+        codes = sorted({positions[v] for v in values if v in positions})
+        if codes and codes[-1] - codes[0] + 1 == len(codes):
+            # A run of adjacent values (e.g. a year range) is one slice of the grouped rows
+            return np.sort(self.order[dim][offsets[codes[0]]:offsets[codes[-1] + 1]])
+        runs = [self.order[dim][offsets[code]:offsets[code + 1]] for code in codes]
+        if not runs:
+            return np.empty(0, dtype=np.intp)
+        if len(runs) == 1:
+            return runs[0]
+        return np.sort(np.concatenate(runs))
+
+    def select(self, states=None, years=None, crops=None):
+        """Row positions matching every given filter (None or empty means no filter on that dimension)"""
+        selected = [self.rows_for(dim, values) for dim, values in zip(DIMENSIONS, (states, years, crops))
+                    if values is not None and len(values) > 0]
+        if not selected:
+            return np.arange(self.rows)
+
+        selected.sort(key=len)
+        rows = selected[0]
+        for other in selected[1:]:
+            if len(rows) == 0:
+                break
+            # Both sides are sorted and unique: keep the rows of `rows` found in `other`
+            found = np.searchsorted(other, rows)
+            found[found == len(other)] = 0
+            rows = rows[other[found] == rows]
+        return rows
+
+
+def as_chunks(frames):
+    """A table given as one DataFrame or a list of them, as a list"""
+    return [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+
+
+def take(series, rows):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return np.asarray(series.cat.categories)[series.cat.codes.to_numpy()[rows]]
+    return series.to_numpy()[rows]
+
+
+def gather(frames, column, rows):
+    """Values of ``column`` at the sorted positions ``rows`` only, without materializing the rest of the column"""
+    frames = as_chunks(frames)
+    bounds = np.cumsum([0] + [len(df) for df in frames])
+    cuts = np.searchsorted(rows, bounds)
+    parts = [take(df[column], rows[cuts[i]:cuts[i + 1]] - bounds[i]) for i, df in enumerate(frames)
+             if cuts[i + 1] > cuts[i] or i == 0]
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
@@ -0,0 +1,92 @@
+# Production server: several gunicorn worker processes, each with a pool of
+# request threads, all forked from one process that has already loaded the
+# dataset.
+#
+#     python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+#
+# Every option can also be set through the environment (SAMARTH_BIND,
+# SAMARTH_SERVER_WORKERS, SAMARTH_SERVER_THREADS, SAMARTH_GRACEFUL_TIMEOUT).
+# `python query.py` remains the single-process development server.
+import argparse
+import logging
+import os
+
+# Loading the dataset here, before gunicorn forks, means workers start ready
+# and share the memory-mapped columns instead of each parsing the data
+import query
+
+
+def default_workers():
+    return max(2, min(os.cpu_count() or 1, 8))
+
+
+def options(args):
+    """gunicorn settings, including the hooks that manage query.py's background work"""
+
+    def when_ready(server):
+        # Log records of the app's own modules (e.g. failed ingests) go to
+        # gunicorn's error log; workers forked from here inherit the handlers
+        error_log = server.log.error_log
+        logging.getLogger().handlers = list(error_log.handlers)
+        logging.getLogger().setLevel(error_log.level)
+
+        # The master files batches dropped into INGEST_DIR; workers apply them
+        watcher = query.IngestWatcher(query.INGEST_DIR, None)
+        watcher.start()
+        server.log.info(f"Watching {query.INGEST_DIR}/ for new batches")
+
+    def post_fork(server, worker):
+        query.start_batch_follower()
+
+    def worker_exit(server, worker):
+        query.shutdown()
+
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'accesslog': '-',
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+
+def serve(settings):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise ImportError("The production server requires gunicorn (pip install gunicorn)")
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return query.app
+
+    Server().run()
+
+
+def main(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Serve Project Samarth with gunicorn")
+    parser.add_argument('--bind', default=env('SAMARTH_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=int(env('SAMARTH_SERVER_WORKERS', default_workers())),
+                        help="worker processes")
+    parser.add_argument('--threads', type=int, default=int(env('SAMARTH_SERVER_THREADS', 8)),
+                        help="request threads per worker")
+    parser.add_argument('--timeout', type=int, default=30, help="seconds before a stuck worker is restarted")
+    parser.add_argument('--graceful-timeout', type=int, default=int(env('SAMARTH_GRACEFUL_TIMEOUT', 30)),
+                        help="seconds in-flight requests get to finish on shutdown")
+    serve(options(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+# Sharded execution: the cube split by State (or by Year range) across worker processes
+#
+#     python shard.py merged_crop_rainfall.csv --by State --shards 8
+#
+# A ShardedCube keeps its counts and sums in shared memory. Each shard is a
+# contiguous range of states (or years), owned by one worker process for
+# every request. Workers build their shard's partial aggregates straight from
+# the memory-mapped snapshot columns (see aggregate()). They answer each
+# reduction over their own range. The parent merges the partials:
+#   - groups along the shard dimension are concatenated;
+#   - everything else is summed (sums and counts, so means stay exact);
+#   - rankings merge each shard's top k.
+# Only selections and partial results cross process boundaries, never the
+# data, so throughput grows with cores once the cube is large enough to be
+# worth splitting.
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from cube import (CROP_MEASURES, DIMENSIONS, AggregateCube, copy_keys, counted, distinct_readings, lowest_reading,
+                  lowest_readings, observations, rainfall_facts)
+from loader import CATEGORY_COLUMNS, MEASURE_COLUMNS, YEAR_COLUMN, snapshot_path
+from ranking import rank, top_k
+
+# Dimensions a cube can be sharded along
+SHARD_DIMENSIONS = ('State', 'Year')
+
+# Reductions over fewer selected cells than this run in the calling process:
+# below it, handing the work to the shards costs more than doing it
+MIN_SHARDED_CELLS = 1 << 20
+
+
+# ============= SHARED MEMORY =============
+
+def share(cube):
+    """Copy a cube's arrays into new shared memory blocks; returns ``(handle, blocks)``
+
+    The handle is small and picklable: block names and shapes plus the
+    labels. The blocks must stay referenced while the memory is in use.
+    """
+    arrays = {'counts': cube.counts, 'rainfall': cube.rainfall, 'readings': cube.readings}
+    arrays.update({metric: cube.sums[metric] for metric in CROP_MEASURES})
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    handle = {'arrays': specs, 'labels': cube.labels, 'state_order': cube.state_order, 'rows': cube.rows}
+    return handle, blocks
+
+
+def attach(handle):
+    """The cube whose arrays live in the shared memory blocks of ``handle``; returns ``(cube, blocks)``"""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in handle['arrays'].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    sums = {metric: arrays[metric] for metric in CROP_MEASURES}
+    cube = AggregateCube.from_arrays(handle['labels'], arrays['counts'], sums, arrays['rainfall'], arrays['readings'],
+                                     handle['state_order'], handle['rows'])
+    return cube, blocks
+
+
+def partition(weights, shards):
+    """Split positions 0..len(weights)-1 into at most ``shards`` contiguous ``(lo, hi)`` ranges of similar weight"""
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    shards = max(1, min(shards, n))
+    if n == 0:
+        return []
+    cumulative = np.cumsum(weights)
+    if cumulative[-1] <= 0:
+        cumulative = np.arange(1, n + 1, dtype=np.float64)
+    targets = cumulative[-1] * np.arange(1, shards) / shards
+    cuts = np.unique(np.clip(np.searchsorted(cumulative, targets, side='right'), 1, n - 1))
+    bounds = [0] + cuts.tolist() + [n]
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+
+# ============= WORKERS =============
+
+_worker = {}
+
+
+def start_worker(handle, columns=None):
+    """Attach the shared cube once per worker process (and open the snapshot columns when building)"""
+    _worker['cube'], _worker['blocks'] = attach(handle)
+    if columns is not None:
+        _worker['columns'] = {name: np.load(os.path.join(columns, f'{name}.npy'), mmap_mode='r')
+                              for name in CATEGORY_COLUMNS + (YEAR_COLUMN,) + MEASURE_COLUMNS}
+
+
+def aggregate_shard(axis, lo, hi, chunk=1 << 22):
+    """Sum the rows whose ``axis`` code falls in [lo, hi) into this shard's slice of the shared cube
+
+    Rows are read in chunks from the memory-mapped columns, so a worker only
+    ever holds one chunk of its rows. A first pass collects the rainfall
+    readings of the shard's State/Years and the lowest reading of each
+    repeated row; the second sums production without the repeats, as
+    AggregateCube does. Returns the first row of every state seen, for the
+    cube's state order.
+    """
+    cube, columns = _worker['cube'], _worker['columns']
+    years = cube.labels['Year']
+
+    # Year -> code as a dense lookup table (years span a few decades), which
+    # is much faster than a binary search per row
+    year_codes = np.zeros(int(years[-1]) - int(years[0]) + 1, dtype=np.intp)
+    year_codes[years.astype(np.intp) - int(years[0])] = np.arange(len(years))
+    shape = list(cube.shape)
+    shape[axis] = hi - lo
+    size = int(np.prod(shape))
+    counts = np.zeros(size, dtype=np.int64)
+    sums = {metric: np.zeros(size, dtype=np.float64) for metric in CROP_MEASURES}
+    first_row = np.full(cube.shape[0], np.iinfo(np.int64).max, dtype=np.int64)
+
+    # The shard's rows are found on the raw column (State codes, or years
+    # within the range) before anything else about a row is read
+    if axis == 0:
+        column, low, high = columns['State'], lo, hi - 1
+    else:
+        column, low, high = columns[YEAR_COLUMN], years[lo], years[hi - 1]
+
+    def chunks():
+        """``(rows, cells, keys, state_years, rainfall)`` of each chunk's rows in the shard, codes relative to it"""
+        rows = len(column)
+        for start in range(0, rows, chunk):
+            stop = min(start + chunk, rows)
+            values = column[start:stop]
+            mine = np.flatnonzero((values >= low) & (values <= high))
+            if not len(mine):
+                continue
+            rows_of = start + mine
+            codes = [np.asarray(columns['State'][rows_of], dtype=np.intp),
+                     year_codes[columns[YEAR_COLUMN][rows_of].astype(np.intp) - int(years[0])],
+                     np.asarray(columns['crop'][rows_of], dtype=np.intp)]
+            np.minimum.at(first_row, codes[0], rows_of)
+            codes[axis] = codes[axis] - lo
+            cells = np.ravel_multi_index(codes, shape)
+            production = np.asarray(columns['Production'][rows_of], dtype=np.float64)
+            yield (rows_of, cells, copy_keys(cells, production), np.ravel_multi_index(codes[:2], shape[:2]),
+                   np.asarray(columns['Rainfall'][rows_of], dtype=np.float64))
+
+    pairs, repeated = [], []
+    for _, _, keys, state_years, rainfall in chunks():
+        pairs.append(distinct_readings(state_years, rainfall))
+        repeated.append(lowest_readings(keys, rainfall))
+    if pairs:
+        cells, values = distinct_readings(*(np.concatenate(part) for part in zip(*pairs)))
+        unique, lowest = lowest_readings(*(np.concatenate(part) for part in zip(*repeated)))
+    else:
+        cells, values = np.empty(0, dtype=np.intp), np.empty(0)
+    rainfall_sums, readings = rainfall_facts(cells, values, shape[0] * shape[1])
+
+    for rows_of, cells, keys, _, rainfall in chunks():
+        keep = rainfall == lowest_reading(unique, lowest, keys)
+        cell = cells[keep]
+        counts += np.bincount(cell, minlength=size)
+        for metric in CROP_MEASURES:
+            weights = np.asarray(columns[metric][rows_of[keep]], dtype=np.float64)
+            sums[metric] += np.bincount(cell, weights=weights, minlength=size)
+
+    target = (slice(None),) * axis + (slice(lo, hi),)
+    cube.counts[target] = counts.reshape(shape)
+    for metric in CROP_MEASURES:
+        cube.sums[metric][target] = sums[metric].reshape(shape)
+    cube.rainfall[target] = rainfall_sums.reshape(shape[:2])
+    cube.readings[target] = readings.reshape(shape[:2])
+    return first_row
+
+
+def reduce_shard(measures, by, selection):
+    return _worker['cube'].reduce(measures, by, **selection)
+
+
+def top_shard(measure, by, k, ascending, selection):
+    """This shard's top ``k`` groups (ties included), in label order so the merge keeps ties stable"""
+    (labels,), sums, counts = _worker['cube'].reduce(counted(measure), (by,), **selection)
+    present = np.flatnonzero(observations(measure, sums, counts) > 0)
+    chosen = np.sort(present[top_k(sums[measure][present], k, ascending)])
+    return labels[chosen], sums[measure][chosen]
+
+
+# ============= SHARDED CUBE =============
+
+class ShardedCube:
+    """An AggregateCube in shared memory, with its reductions split across worker processes by shard
+
+    It can be used anywhere a cube is; everything but reduce() and top()
+    runs on the shared arrays in the calling process. The worker pool is
+    started on first use in each process, so a cube created before
+    gunicorn forks gets one pool per server worker.
+    """
+
+    def __init__(self, cube, by='State', shards=None, workers=None, min_cells=MIN_SHARDED_CELLS, _shared=None):
+        if by not in SHARD_DIMENSIONS:
+            raise ValueError(f"Can't shard by {by!r}; use one of {', '.join(SHARD_DIMENSIONS)}")
+        self.by = by
+        self.axis = DIMENSIONS.index(by)
+        self.workers = workers or os.cpu_count() or 1
+        self.min_cells = min_cells
+
+        # The blocks this process created (and unlinks on close), and the
+        # cube over this process's own mapping of them. Processes forked
+        # from this one inherit the blocks, but must leave them linked
+        self.handle, self._blocks = _shared if _shared is not None else share(cube)
+        self._owner = os.getpid()
+        self.local, self._mapped = attach(self.handle)
+        self.shards = partition(self.local.margin(None, tuple(a for a in range(3) if a != self.axis)),
+                                shards or self.workers)
+
+        self._pool = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def aggregate(cls, path, by='State', shards=None, workers=None, min_cells=MIN_SHARDED_CELLS):
+        """Build the cube of the dataset at ``path`` in parallel, one shard per task
+
+        Reads the dataset's snapshot (building it first if needed), whose
+        columns every worker memory-maps. Shards are balanced by their
+        number of rows.
+        """
+        from loader import load_dataset
+
+        snapshot = path if os.path.isdir(path) else snapshot_path(path)
+        if snapshot != path:
+            load_dataset(path)
+        snapshot = os.path.realpath(snapshot)
+        columns = {name: np.load(os.path.join(snapshot, f'{name}.npy'), mmap_mode='r')
+                   for name in CATEGORY_COLUMNS + (YEAR_COLUMN,)}
+        with open(os.path.join(snapshot, 'meta.json')) as f:
+            meta = json.load(f)
+
+        axis = DIMENSIONS.index(by)
+        year_values = np.asarray(columns[YEAR_COLUMN])
+        first_year = int(year_values.min())
+        rows_per_year = np.bincount(year_values.astype(np.intp) - first_year)
+        labels = {
+            'State': np.array(meta['columns']['State']['categories'], dtype=object),
+            'Year': (np.flatnonzero(rows_per_year) + first_year).astype(year_values.dtype),
+            'crop': np.array(meta['columns']['crop']['categories'], dtype=object),
+        }
+        shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        weights = (np.bincount(columns['State'], minlength=shape[0]) if by == 'State'
+                   else rows_per_year[rows_per_year > 0])
+
+        empty = AggregateCube.from_arrays(labels, np.zeros(shape, dtype=np.int64),
+                                          {metric: np.zeros(shape) for metric in CROP_MEASURES},
+                                          np.zeros(shape[:2]), np.zeros(shape[:2], dtype=np.int64),
+                                          np.empty(0, dtype=np.intp), len(year_values))
+        handle, blocks = share(empty)
+        workers = workers or os.cpu_count() or 1
+        ranges = partition(weights, shards or workers)
+
+        first_row = np.full(shape[0], np.iinfo(np.int64).max, dtype=np.int64)
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges)) or 1, initializer=start_worker,
+                                     initargs=(handle, snapshot)) as pool:
+                for seen in pool.map(aggregate_shard, *zip(*[(axis, lo, hi) for lo, hi in ranges])):
+                    first_row = np.minimum(first_row, seen)
+        except BaseException:
+            for block in blocks:
+                block.unlink()
+            raise
+
+        # States in order of first appearance, as AggregateCube computes it
+        present = np.flatnonzero(first_row < np.iinfo(np.int64).max)
+        handle['state_order'] = present[np.argsort(first_row[present], kind='stable')]
+        sharded = cls(None, by, shards, workers, min_cells, _shared=(handle, blocks))
+        sharded.shards = ranges
+        return sharded
+
+    def __getattr__(self, name):
+        if name == 'local':
+            raise AttributeError(name)
+        return getattr(self.local, name)
+
+    def extend(self, df):
+        """Sharded cube with the rows of ``df`` added, in new shared memory (this one is left untouched)"""
+        return ShardedCube(self.local.extend(df), self.by, len(self.shards), self.workers, self.min_cells)
+
+    # ----- execution -----
+
+    def executor(self):
+        """This process's worker pool, started on first use (None once closed)"""
+        with self._lock:
+            if self._closed:
+                return None
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=min(self.workers, len(self.shards)),
+                                                 initializer=start_worker, initargs=(self.handle,))
+                self._pid = os.getpid()
+            return self._pool
+
+    def plan(self, states=None, years=None, crops=None):
+        """Per-shard selections for a reduction, or None to run it here instead
+
+        A shard only receives the labels of its own range on the shard
+        dimension; shards the selection doesn't reach are skipped.
+        """
+        selection = {'states': states, 'years': years, 'crops': crops}
+        cells = 1
+        for dim, values in zip(DIMENSIONS, (states, years, crops)):
+            cells *= len(self.local.labels[dim]) if not values else len(values)
+        if cells < self.min_cells or len(self.shards) < 2:
+            return None
+
+        param = ('states', 'years', 'crops')[self.axis]
+        labels = self.local.labels[self.by]
+        codes = self.local.codes(self.by, selection[param])
+        tasks = []
+        for lo, hi in self.shards:
+            mine = np.arange(lo, hi) if codes is None else codes[(codes >= lo) & (codes < hi)]
+            if len(mine):
+                tasks.append(dict(selection, **{param: labels[mine].tolist()}))
+        return tasks or None
+
+    def run(self, fn, *args, tasks):
+        """``fn(*args, selection)`` on the shards for every selection in ``tasks``; None if the pool is unavailable"""
+        pool = self.executor()
+        if pool is None:
+            return None
+        try:
+            return list(pool.map(fn, *zip(*[args + (task,) for task in tasks])))
+        except RuntimeError:
+            # Closed while this request was running (the data was swapped): answer locally
+            return None
+
+    def reduce(self, measures, by=(), states=None, years=None, crops=None):
+        """AggregateCube.reduce(), computed per shard and merged
+
+        Groups along the shard dimension come back in label order from
+        consecutive shards, so they are concatenated; any other reduction is
+        the sum of the shards' sums and counts.
+        """
+        tasks = self.plan(states, years, crops)
+        partials = self.run(reduce_shard, tuple(measures), tuple(by), tasks=tasks) if tasks else None
+        if partials is None:
+            return self.local.reduce(measures, by, states, years, crops)
+
+        if self.by in by:
+            axis = list(by).index(self.by)
+            labels = tuple(np.concatenate([p[0][i] for p in partials]) if i == axis else partials[0][0][i]
+                           for i in range(len(by)))
+            sums = {metric: np.concatenate([p[1][metric] for p in partials], axis=axis) for metric in measures}
+            return labels, sums, np.concatenate([p[2] for p in partials], axis=axis)
+
+        labels = partials[0][0]
+        sums = {metric: sum(p[1][metric] for p in partials) for metric in measures}
+        return labels, sums, sum(p[2] for p in partials)
+
+    def top(self, measure, by, k, ascending=False, states=None, years=None, crops=None):
+        """AggregateCube.top(); along the shard dimension each shard ranks its own groups and the top k are merged
+
+        Every group in the overall top k (ties included) is in its shard's
+        top k, so ranking the union of the shards' selections is exact.
+        """
+        if by != self.by:
+            (labels,), sums, counts = self.reduce(counted(measure), (by,), states, years, crops)
+            present = observations(measure, sums, counts) > 0
+            return rank(labels[present], sums[measure][present], k, ascending)
+
+        tasks = self.plan(states, years, crops)
+        partials = self.run(top_shard, measure, by, k, ascending, tasks=tasks) if tasks else None
+        if partials is None:
+            return self.local.top(measure, by, k, ascending, states, years, crops)
+        labels = np.concatenate([p[0] for p in partials])
+        values = np.concatenate([p[1] for p in partials])
+        return rank(labels, values, k, ascending)
+
+    def close(self):
+        """Stop this process's workers and let go of the shared memory
+
+        Only the process that created the blocks unlinks them (freeing the
+        memory once every process has let go); a forked server worker
+        closing its copy just unmaps them, so the others keep working.
+        """
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+        owner = self._owner == os.getpid()
+        for block in self._blocks or ():
+            try:
+                if owner:
+                    block.unlink()
+                else:
+                    block.close()
+            except FileNotFoundError:
+                pass
+        self._blocks = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from loader import load_dataset
+
+    parser = argparse.ArgumentParser(description="Build a dataset's cube in shards and compare it to one process")
+    parser.add_argument('dataset', nargs='?', default='merged_crop_rainfall.csv')
+    parser.add_argument('--by', choices=SHARD_DIMENSIONS, default='State')
+    parser.add_argument('--shards', type=int, default=None, help="shards (default: one per worker)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    single = AggregateCube(load_dataset(args.dataset))
+    built = time.perf_counter()
+    sharded = ShardedCube.aggregate(args.dataset, args.by, args.shards, args.workers, min_cells=0)
+    finished = time.perf_counter()
+
+    same = (np.array_equal(single.counts, sharded.counts)
+            and all(np.allclose(single.sums[m], sharded.sums[m]) for m in CROP_MEASURES)
+            and np.allclose(single.rainfall, sharded.rainfall) and np.array_equal(single.readings, sharded.readings)
+            and np.array_equal(single.state_order, sharded.state_order))
+    print(f"One process:  {built - started:.3f} s")
+    print(f"{len(sharded.shards)} shards by {args.by}: {finished - built:.3f} s ({'identical' if same else 'DIFFERENT'})")
+    sharded.close()
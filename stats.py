@@ -0,0 +1,48 @@
+import numpy as np
+
+# Correlation kernels over grouped data. Each group is one row of a 2-D array
+# (groups x observations) plus a boolean mask of the observations that exist,
+# so every group is handled in the same NumPy pass instead of a Python loop.
+
+# Fewer paired observations than this give no correlation (NaN)
+MIN_POINTS = 3
+
+
+def pearson(x, y, mask):
+    """Pearson r of ``x`` against ``y`` for every row, over the masked-in entries"""
+    n = mask.sum(axis=1)
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = np.where(mask, x - (x.sum(axis=1) / n)[:, None], 0.0)
+        dy = np.where(mask, y - (y.sum(axis=1) / n)[:, None], 0.0)
+        r = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+
+    r[n < MIN_POINTS] = np.nan
+    return np.clip(r, -1.0, 1.0), n
+
+
+def average_ranks(values, mask):
+    """1-based ranks within each row, ties sharing their average rank (masked-out entries get NaN)"""
+    rows, cols = values.shape
+    values = np.where(mask, values, np.inf)
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+
+    # Number runs of equal values across the whole array so one bincount can
+    # average the ordinal ranks of every tie group in every row at once
+    starts = np.ones((rows, cols), dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run = np.cumsum(starts.ravel()) - 1
+    ordinal = np.tile(np.arange(1, cols + 1, dtype=np.float64), rows)
+    tied = (np.bincount(run, weights=ordinal) / np.bincount(run))[run].reshape(rows, cols)
+
+    ranks = np.empty((rows, cols))
+    np.put_along_axis(ranks, order, tied, axis=1)
+    return np.where(mask, ranks, np.nan)
+
+
+def spearman(x, y, mask):
+    """Spearman rank correlation of ``x`` against ``y`` for every row"""
+    return pearson(average_ranks(x, mask), average_ranks(y, mask), mask)
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_FILE = os.path.join(ROOT, 'merged_crop_rainfall.csv')
+
+# Before engine.py reads it: keep a real deployment's ingested batches out of the tests
+os.environ['SAMARTH_INGEST_DIR'] = tempfile.mkdtemp(prefix='samarth-ingest-')
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Write rows (State, Year, crop, Production, Rainfall) to a CSV under tmp_path; returns its path"""
+    def write(rows, name='data.csv'):
+        path = tmp_path / name
+        pd.DataFrame(rows, columns=['State', 'Year', 'crop', 'Production', 'Rainfall']).to_csv(path, index=False)
+        return str(path)
+    return write
+
+
+@pytest.fixture(scope='session')
+def server():
+    """The query module, loaded with the bundled dataset and an empty ingest directory"""
+    import query
+    return query
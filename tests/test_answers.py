@@ -0,0 +1,97 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ask
+from cube import AggregateCube
+from engine import Engine, parse_query, planner
+from ingest import batch_from_records, persist_batch
+from loader import typed
+from render import iter_text, to_dict
+
+from conftest import DATA_FILE, ROOT
+
+
+def engine_of(rows):
+    df = pd.DataFrame(rows, columns=['State', 'Year', 'crop', 'Production', 'Rainfall'])
+    return Engine(AggregateCube(typed(df)))
+
+
+def answer(engine, question):
+    return planner.run(parse_query(question, engine), engine.cube)
+
+
+def test_trend_over_no_records_is_an_error():
+    engine = engine_of([('Punjab', 2010, 'Rice', 10.0, 500.0), ('Kerala', 2011, 'Wheat', 5.0, 900.0)])
+    with pytest.raises(ValueError, match="No records match"):
+        answer(engine, "wheat trend in Punjab")
+
+
+def test_trend_growth_from_zero_is_not_a_number():
+    engine = engine_of([('Punjab', 2010, 'Rice', 0.0, 500.0), ('Punjab', 2011, 'Rice', 8.0, 600.0)])
+    result = answer(engine, "rice production trend in Punjab")
+    assert np.isnan(result.growth)
+    text = ''.join(iter_text(result))
+    assert "Overall Growth: n/a" in text and "Increasing" in text
+    assert to_dict(result)['growth'] is None
+
+
+def test_cli_reports_errors_and_answers_the_rest(capsys):
+    status = ask.main(["--dataset", DATA_FILE, "wheat trend in Goa", "Which state has the highest rice production?"])
+    out = capsys.readouterr().out
+    assert status == 1
+    assert "No records match this question" in out
+    assert "HIGHEST PRODUCTION ANALYSIS" in out
+
+
+def test_cli_succeeds_when_an_answer_is_only_a_notice(capsys):
+    status = ask.main(["--dataset", DATA_FILE, "Compare rainfall in Punjab"])
+    assert "Please mention at least 2 states" in capsys.readouterr().out
+    assert status == 0
+
+
+def test_comparison_against_zero_has_no_percentage():
+    engine = engine_of([('Punjab', 2010, 'Rice', 0.0, 500.0), ('Kerala', 2010, 'Rice', 8.0, 900.0)])
+    result = answer(engine, "Compare rice production in Punjab and Kerala")
+    assert result.difference == 8.0
+    assert np.isnan(result.percent_difference)
+    assert "Percentage: n/a" in ''.join(iter_text(result))
+    assert to_dict(result)['percent_difference'] is None
+
+
+def test_source_names_the_dataset_that_was_opened(write_csv):
+    path = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)], name='other.csv')
+    engine = Engine.open(path)
+    result = engine.result(parse_query("what is the data source", engine))
+    assert result.dataset == 'other.csv'
+    assert result.records == 1
+
+
+@pytest.mark.parametrize('question', ["top 0 states by rice production", "lowest 0 states by rainfall"])
+def test_ranking_nothing_is_an_error(question):
+    engine = engine_of([('Punjab', 2010, 'Rice', 10.0, 500.0), ('Kerala', 2011, 'Rice', 5.0, 900.0)])
+    with pytest.raises(ValueError, match="at least 1"):
+        parse_query(question, engine)
+
+
+def test_cli_answers_with_the_batches_the_server_ingested(write_csv, tmp_path, capsys):
+    path = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])
+    ingest_dir = str(tmp_path / 'ingest')
+    persist_batch(batch_from_records([{'State': 'Punjab', 'Year': 2011, 'crop': 'Rice', 'Production': 32.0,
+                                       'Rainfall': 600.0}]), ingest_dir)
+    question = "Total rice production in Punjab"
+
+    assert Engine.open(path, ingest_dir).cube.total('Production') == (42.0, 2)
+    assert Engine.open(path, None).cube.total('Production') == (10.0, 1)
+    assert ask.main(["--dataset", path, "--ingest-dir", ingest_dir, question]) == 0
+    assert "42.00" in capsys.readouterr().out
+
+
+def test_cli_start_without_batches_does_not_import_pandas(tmp_path):
+    Engine.open(DATA_FILE)
+    script = f"import sys; import ask; ask.Engine.open({DATA_FILE!r}, {str(tmp_path)!r}); print('pandas' in sys.modules)"
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == 'False'
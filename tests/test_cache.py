@@ -0,0 +1,110 @@
+import threading
+import time
+import types
+
+import pytest
+
+import cache
+from cache import AnswerCache, InFlight, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable stand-in for time.monotonic() in cache.py"""
+    fake = types.SimpleNamespace(now=0.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(cache, 'time', fake)
+    return fake
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    answers = AnswerCache(maxsize=2)
+    answers.put('a', 1)
+    answers.put('b', 2)
+    assert answers.get('a') == 1
+    answers.put('c', 3)
+
+    assert answers.get('b') is None
+    assert answers.get('a') == 1 and answers.get('c') == 3
+    assert answers.evictions == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    answers = AnswerCache(ttl=10)
+    answers.put('a', 1)
+    clock.now = 10.0
+    assert answers.get('a') == 1
+    clock.now = 10.5
+    assert answers.get('a') is None
+    assert answers.expirations == 1
+    assert answers.stats()['size'] == 0
+
+
+def test_answers_computed_before_a_clear_are_dropped():
+    answers = AnswerCache()
+    generation = answers.generation
+    answers.put('a', 1, generation)
+    answers.clear()
+
+    assert answers.get('a') is None
+    answers.put('b', 2, generation)
+    assert answers.get('b') is None
+    answers.put('b', 3, answers.generation)
+    assert answers.get('b') == 3
+
+
+def test_key_ignores_the_order_of_entities():
+    assert cache_key({'states': ['Kerala', 'Goa'], 'k': 3}) == cache_key({'k': 3, 'states': ['Goa', 'Kerala']})
+
+
+def ask_together(flight, compute, callers=5):
+    """Call flight.do() from ``callers`` threads while the first call is still computing
+
+    Returns what each caller got: ('value', v) or ('error', exception).
+    """
+    release = threading.Event()
+    outcomes = [None] * callers
+
+    def blocked():
+        release.wait(5)
+        return compute()
+
+    def call(i):
+        try:
+            outcomes[i] = ('value', flight.do('key', blocked))
+        except Exception as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.coalesced < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_identical_concurrent_questions_are_computed_once():
+    flight = InFlight()
+    runs = []
+    outcomes = ask_together(flight, lambda: runs.append(1) or 'answer')
+
+    assert runs == [1]
+    assert flight.coalesced == 4
+    assert outcomes == [('value', 'answer')] * 5
+
+
+def test_a_failed_computation_reaches_every_waiter():
+    flight = InFlight()
+    error = RuntimeError('boom')
+
+    def fail():
+        raise error
+
+    outcomes = ask_together(flight, fail)
+    assert outcomes == [('error', error)] * 5
+    # Nothing is left behind: the next call computes afresh
+    assert flight.do('key', lambda: 'again') == 'again'
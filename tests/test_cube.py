@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import RAINFALL_YEARS, AggregateCube
+from loader import read_csv, typed
+from shard import ShardedCube
+
+# One crop per rainfall reading, nothing repeated: every row is a fact
+VARIED = [('X', 2014, 'Rice', 100.0, 500.0),
+          ('X', 2014, 'Wheat', 200.0, 600.0),
+          ('X', 2014, 'Pulses', 350.0, 500.0)]
+
+# Two subdivision readings, the crop rows repeated once per reading
+MERGED = [('Y', 2014, crop, production, rainfall)
+          for rainfall in (800.0, 900.0)
+          for crop, production in (('Rice', 10.0), ('Wheat', 20.0))]
+
+
+def cube_of(rows):
+    return AggregateCube(typed(pd.DataFrame(rows, columns=['State', 'Year', 'crop', 'Production', 'Rainfall'])))
+
+
+def test_rows_with_their_own_rainfall_are_kept():
+    total, records = cube_of(VARIED).total('Production')
+    assert (total, records) == (650.0, 3)
+
+
+def test_rows_repeated_per_reading_count_once():
+    cube = cube_of(MERGED)
+    assert cube.total('Production') == (30.0, 2)
+    # One State/Year whose rainfall is the mean of its two readings
+    assert cube.total('Rainfall') == (850.0, 1)
+
+
+def test_rainfall_counts_each_state_year_once():
+    _, sums, _ = cube_of(VARIED + MERGED).reduce(('Rainfall', RAINFALL_YEARS), ('State',))
+    assert sums['Rainfall'].tolist() == [550.0, 850.0]
+    assert sums[RAINFALL_YEARS].tolist() == [1, 1]
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['State', 'Year', 'crop', 'Production', 'Rainfall'])
+
+
+def test_extend_drops_copies_within_the_batch_only():
+    # The batch's own copies of a row count once, but a row already loaded is added again
+    cube = cube_of(MERGED).extend(frame([('Y', 2014, 'Rice', 10.0, 950.0), ('Y', 2014, 'Rice', 10.0, 990.0),
+                                         ('Z', 2014, 'Rice', 5.0, 700.0), ('Z', 2014, 'Rice', 5.0, 710.0)]))
+    assert cube.total('Production', states=['Y']) == (40.0, 3)
+    assert cube.total('Production', states=['Z']) == (5.0, 1)
+    # Y/2014's rainfall was already recorded; Z/2014 is new, with both its readings
+    assert cube.total('Rainfall', states=['Y']) == (850.0, 1)
+    assert cube.total('Rainfall', states=['Z']) == (705.0, 1)
+
+
+@pytest.mark.parametrize('by', ['State', 'Year'])
+def test_sharded_build_keeps_the_same_rows(write_csv, by):
+    rows = VARIED + MERGED + [(state, 2015, crop, production + 1, rainfall + 1)
+                              for state, _, crop, production, rainfall in VARIED + MERGED]
+    path = write_csv(rows)
+    single = AggregateCube(read_csv(path))
+    sharded = ShardedCube.aggregate(path, by, shards=2, workers=1, min_cells=0)
+    try:
+        assert np.array_equal(single.counts, sharded.counts)
+        assert np.allclose(single.sums['Production'], sharded.sums['Production'])
+        assert np.allclose(single.rainfall, sharded.rainfall)
+        assert np.array_equal(single.readings, sharded.readings)
+    finally:
+        sharded.close()
@@ -0,0 +1,36 @@
+import logging
+import os
+
+import pytest
+
+from ingest import FAILED, IngestWatcher, batch_from_csv, batch_from_records
+
+ROW = {'State': 'Punjab', 'Year': 2014, 'crop': 'Rice', 'Production': 10.0, 'Rainfall': 500.0}
+
+
+@pytest.mark.parametrize('change, error', [
+    ({'Year': 2014.5}, "whole number"),
+    ({'Production': -1.0}, "Production can't be negative"),
+    ({'Rainfall': -0.5}, "Rainfall can't be negative"),
+    ({'Year': None}, "empty values"),
+])
+def test_invalid_rows_are_rejected(change, error):
+    with pytest.raises(ValueError, match=error):
+        batch_from_records([ROW, dict(ROW, **change)])
+
+
+def test_valid_rows_are_normalized():
+    batch = batch_from_csv("State,Year,crop,Production,Rainfall\n Punjab ,2014.0,Rice ,0,0\n")
+    assert batch.to_dict('records') == [dict(ROW, State='Punjab', crop='Rice', Production=0.0, Rainfall=0.0)]
+    assert batch['Year'].dtype.kind == 'i'
+
+
+def test_watcher_logs_and_files_a_failed_batch(tmp_path, caplog):
+    (tmp_path / 'bad.csv').write_text("State,Year,crop,Production,Rainfall\nPunjab,2014.5,Rice,1,2\n")
+    applied = []
+    with caplog.at_level(logging.WARNING, logger='ingest'):
+        assert IngestWatcher(str(tmp_path), lambda batch, name: applied.append(name)).poll() == ['bad.csv']
+
+    assert applied == []
+    assert os.listdir(tmp_path / FAILED) == ['bad.csv']
+    assert "Ingest of bad.csv failed: Year must be a whole number" in caplog.text
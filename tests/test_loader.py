@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+
+from cube import AggregateCube
+from loader import (CUBE_DIR, load_dataset, open_cube, previous_path, publish, read_snapshot, save_cube, snapshot_path,
+                    write_snapshot)
+
+
+def versions(directory, prefix):
+    return sorted(name for name in os.listdir(directory) if name.startswith(prefix))
+
+
+def test_republishing_keeps_only_the_previous_version(write_csv, tmp_path):
+    source = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])
+    snapshot = snapshot_path(source)
+    before = load_dataset(source)
+    resolved = os.path.realpath(snapshot)
+
+    write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0), ('Kerala', 2011, 'Wheat', 5.0, 900.0)])
+    after = load_dataset(source)
+    assert os.path.islink(snapshot)
+    assert len(after) == 2 and open_cube(source).rows == 2
+    # A reader that resolved the link before the swap can still open that version
+    assert len(read_snapshot(resolved)) == 1 and open_cube(resolved).rows == 1
+    assert len(versions(tmp_path, '.snapshot-')) == 2
+
+    write_csv([('Goa', 2012, 'Rice', 1.0, 1200.0)] * 3)
+    assert len(load_dataset(source)) == 3
+    assert len(versions(tmp_path, '.snapshot-')) == 2
+    assert not os.path.exists(resolved)
+    # Columns mapped from a removed version stay readable
+    assert list(before['State']) == ['Punjab']
+
+
+def test_plain_directory_is_replaced_by_a_published_version(tmp_path):
+    path = tmp_path / 'store'
+    path.mkdir()
+    (path / 'old.txt').write_text('old')
+    new = tmp_path / '.store-new'
+    new.mkdir()
+    (new / 'new.txt').write_text('new')
+
+    publish(str(new), str(path))
+    assert os.path.islink(path)
+    assert os.listdir(path) == ['new.txt']
+    assert os.listdir(previous_path(str(path))) == ['old.txt']
+    assert sorted(os.listdir(tmp_path)) == ['.store-new', '.store-new.old', '.store.previous', 'store']
+
+
+def test_stale_cube_is_replaced_in_place(write_csv):
+    source = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])
+    df = load_dataset(source)
+    snapshot = os.path.realpath(snapshot_path(source))
+    cube = os.path.join(snapshot, CUBE_DIR)
+    meta = os.path.join(cube, 'meta.json')
+    with open(meta) as f:
+        stale = dict(json.load(f), version=0)
+    with open(meta, 'w') as f:
+        json.dump(stale, f)
+    assert open_cube(source) is None
+
+    save_cube(source, AggregateCube(df))
+    assert os.path.islink(cube)
+    assert len(versions(snapshot, '.cube-')) == 2
+    np.testing.assert_array_equal(open_cube(source).sums['Production'], AggregateCube(df).sums['Production'])
+
+
+def test_snapshot_directory_reads_through_its_link(write_csv, tmp_path):
+    source = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])
+    target = str(tmp_path / 'copy.snapshot')
+    write_snapshot(load_dataset(source, use_snapshot=False), target)
+    assert list(read_snapshot(target)['crop']) == ['Rice']
+    assert open_cube(target).rows == 1
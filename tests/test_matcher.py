@@ -0,0 +1,51 @@
+import pytest
+
+from engine import Engine, parse_query
+from fuzzy import NGramIndex
+
+from conftest import DATA_FILE
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return Engine.open(DATA_FILE).matcher
+
+
+@pytest.mark.parametrize('question, states, crops', [
+    ("wheat price trend in Punjab", ['Punjab'], ['Wheat']),
+    ("Compare rainfall in Madhya Pradesh and nearby Pradesh states", ['Madhya Pradesh'], []),
+])
+def test_ordinary_words_are_not_fuzzy_matches(matcher, question, states, crops):
+    found = matcher.match(question)
+    assert found['states'] == states
+    assert found['crops'] == crops
+
+
+@pytest.mark.parametrize('question, states, crops', [
+    ("Rainfall in Maharastra", ['Maharashtra'], []),
+    ("Kerla rice", ['Kerala'], ['Rice']),
+    ("rice in uttar pradsh", ['Uttar Pradesh'], ['Rice']),
+    ("wheat in mahdya pradesh", ['Madhya Pradesh'], ['Wheat']),
+    ("sugarcan production", [], ['Sugarcane']),
+])
+def test_misspelled_names_still_match(matcher, question, states, crops):
+    found = matcher.match(question)
+    assert found['states'] == states
+    assert found['crops'] == crops
+
+
+def test_lookup_tied_between_two_names_matches_neither():
+    index = NGramIndex([('Rampura', 'a'), ('Rampuri', 'i'), ('Rampur Kalan', 'i')])
+    assert index.lookup('Rampuro') == (None, pytest.approx(0.667, abs=1e-3))
+    assert index.lookup('Rampurri')[0] == 'i'
+
+
+@pytest.mark.parametrize('question', [
+    "what is the relation between rainfall and production in Kerala",
+    "relationship between rainfall and rice production",
+    "How does rainfall affect production in Punjab?",
+    "Does production depend on rainfall?",
+])
+def test_relation_questions_parse_as_correlation(question):
+    engine = Engine.open(DATA_FILE)
+    assert parse_query(question, engine)['type'] == 'correlation'
@@ -0,0 +1,23 @@
+import json
+import logging
+import os
+
+from materialize import STORE_VERSION, open_store, store_path
+
+
+def test_store_for_another_version_of_the_dataset_is_ignored(write_csv, caplog):
+    path = write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])
+    store = store_path(path)
+    os.mkdir(store)
+    with open(os.path.join(store, 'meta.json'), 'w') as f:
+        json.dump({'version': STORE_VERSION, 'source': os.path.basename(path), 'size': 1, 'mtime': 0}, f)
+
+    with caplog.at_level(logging.WARNING, logger='materialize'):
+        assert open_store(path) is None
+    assert f"Ignoring {store}: built for a different version of {path}" in caplog.text
+
+
+def test_missing_store_is_not_reported(write_csv, caplog):
+    with caplog.at_level(logging.WARNING):
+        assert open_store(write_csv([('Punjab', 2010, 'Rice', 10.0, 500.0)])) is None
+    assert caplog.text == ''
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from pool import DONE, FAILED, TIMED_OUT, SubQueryPool
+
+
+def answer(delay, value):
+    if isinstance(value, Exception):
+        raise value
+    time.sleep(delay)
+    return value
+
+
+@pytest.fixture
+def pool():
+    pool = SubQueryPool(workers=3)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_outcomes_keep_submission_order_when_a_call_times_out(pool):
+    error = ValueError('no data')
+    started = time.monotonic()
+    outcomes = pool.run(answer, [(0, 'first'), (1, 'slow'), (0, error)], timeout=0.2)
+
+    assert time.monotonic() - started < 0.9
+    assert outcomes == [(DONE, 'first'), (TIMED_OUT, None), (FAILED, error)]
+
+
+def test_without_a_timeout_every_call_is_awaited(pool):
+    assert pool.run(answer, [(0.05, 'a'), (0, 'b')]) == [(DONE, 'a'), (DONE, 'b')]
+
+
+def test_slow_part_of_a_question_gets_a_notice(server, monkeypatch):
+    release = threading.Event()
+
+    def process(question, snap=None):
+        if question == 'slow':
+            release.wait(5)
+        return f"answer to {question}"
+
+    monkeypatch.setattr(server, 'process_single_query', process)
+    try:
+        answers = server.answer_subqueries(['first', 'slow', 'last'], timeout=0.2)
+    finally:
+        release.set()
+
+    assert answers[0] == "answer to first"
+    assert answers[1] == "⏱️ Not answered within 0.2s - try asking this part on its own."
+    assert answers[2] == "answer to last"
@@ -0,0 +1,100 @@
+"""Answers that must not depend on how they were computed
+
+Every question (and every materialized template) is answered the plain
+way and the fast way, and the answers compared as JSON. Sums taken in a
+different order may differ in the last bits, so numbers are compared
+with a tolerance.
+"""
+import pandas as pd
+import pytest
+
+import materialize
+from benchmark import corpus_questions
+from cube import AggregateCube
+from engine import Engine, parse_query, planner, split_compound_query
+from loader import load_dataset, typed
+from plan import Planner
+from render import to_dict
+from shard import ShardedCube
+
+from conftest import DATA_FILE
+
+QUESTIONS = corpus_questions() + [
+    'Top 3 states by rice production in 2012',
+    'Which crop has the highest rainfall',
+    'Rainfall trend for rice',
+    'Average rainfall',
+    'Least rainfall state in 2010 for wheat',
+    'Compare wheat production in Punjab and Haryana from 2010 to 2013',
+    'Total production of rice and wheat in Kerala in 2011',
+]
+
+
+@pytest.fixture(scope='module')
+def local():
+    return Engine(AggregateCube(load_dataset(DATA_FILE, use_snapshot=False)))
+
+
+def params_of(engine):
+    """Parsed params of every sub-question of QUESTIONS, plus every materialized template"""
+    asked = [parse_query(sub, engine) for question in QUESTIONS for sub in split_compound_query(question)]
+    return asked + [params for templates in materialize.TEMPLATES.values() for params in templates(engine.cube)]
+
+
+def answer(params, view, using=planner):
+    try:
+        return to_dict(using.run(params, view))
+    except ValueError as e:
+        return f"error: {e}"
+
+
+def same(a, b):
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return isinstance(b, (list, tuple)) and len(a) == len(b) and all(map(same, a, b))
+    if isinstance(a, float) and isinstance(b, (int, float)):
+        return b == pytest.approx(a, rel=1e-9, abs=1e-9)
+    return a == b
+
+
+def test_optimized_plans_answer_like_unoptimized_ones(local):
+    unoptimized = Planner(kernels=planner.kernels, optimized=False)
+    for params in params_of(local):
+        assert same(answer(params, local.cube), answer(params, local.cube, unoptimized)), params
+
+
+@pytest.mark.parametrize('by, shards', [('State', 2), ('State', 5), ('Year', 3)])
+def test_sharded_answers_equal_local_ones(local, by, shards):
+    sharded = ShardedCube(local.cube, by, shards, workers=2, min_cells=0)
+    try:
+        for params in params_of(local):
+            assert same(answer(params, sharded), answer(params, local.cube)), params
+    finally:
+        sharded.close()
+
+
+def test_answer_store_matches_live_answers(local, tmp_path):
+    out, _, stored = materialize.build(DATA_FILE, out=str(tmp_path / 'data.answers'), workers=2)
+    store = materialize.AnswerStore(out)
+    assert len(store) == stored
+
+    found = 0
+    for params in params_of(local):
+        result = store.get(params)
+        if result is not None:
+            found += 1
+            assert same(to_dict(result), answer(params, local.cube)), params
+    assert found >= stored
+
+
+def test_extended_cube_answers_like_a_rebuild(local):
+    rows = pd.read_csv(DATA_FILE)
+    # The batch shares some State/Years with the base and adds new ones
+    split = len(rows) * 2 // 3
+    base, batch = rows.iloc[:split], rows.iloc[split:]
+
+    extended = Engine(AggregateCube(typed(base)).extend(batch))
+    rebuilt = Engine(AggregateCube(typed(rows)))
+    for params in params_of(rebuilt):
+        assert same(answer(params, extended.cube), answer(params, rebuilt.cube)), params
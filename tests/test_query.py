@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('limit', [True, False, -1, 2.5, "3"])
+def test_records_reject_a_limit_that_is_not_a_count(client, limit):
+    response = client.post('/api/records', json={'states': ['Punjab'], 'limit': limit})
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
+
+
+def test_records_limit_caps_the_rows_returned(client):
+    response = client.post('/api/records', json={'states': ['Punjab'], 'limit': 2})
+    assert response.status_code == 200
+    assert len(response.get_json()['rows']) == 2
+
+
+def test_extend_appends_a_chunk_and_keeps_the_loaded_rows(server):
+    base = server.snapshot
+    batch = server.batch_from_records([{'State': 'Punjab', 'Year': 2030, 'crop': 'Rice',
+                                        'Production': 12.5, 'Rainfall': 640.0}])
+    extended = base.extend(batch)
+
+    assert extended.chunks[:-1] == base.chunks
+    assert extended.cube.rows == base.cube.rows + 1
+    records = server.compute_records({'states': ['Punjab'], 'years': [2030]}, extended)
+    assert records.total == 1
+    assert [list(values) for values in records.values] == [['Punjab'], [2030], ['Rice'], [12.5], [640.0]]
+
+
+def test_source_names_the_loaded_dataset(server):
+    result = server.compute_result(server.parse_query("Mention the data source"))
+    assert result.dataset == os.path.basename(server.snapshot.dataset)
+
+
+@pytest.mark.parametrize('body', [[1, 2], "hi", 3])
+def test_query_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post('/api/query', json=body)
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('body', [[1], "Punjab"])
+def test_records_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post('/api/records', json=body)
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
+
+
+def test_readiness_follows_loading_and_shutdown(server, client):
+    assert client.get('/readyz').status_code == 200
+
+    # As before the first load finishes
+    server.ready.clear()
+    assert client.get('/readyz').status_code == 503
+    server.load_data()
+    assert client.get('/readyz').get_json()['status'] == 'ready'
+
+    server.shutdown()
+    assert client.get('/readyz').status_code == 503
+    assert client.get('/healthz').status_code == 200
+    server.load_data()
+    assert client.get('/readyz').status_code == 200
+
+
+def test_reload_answers_like_live_ingestion(server):
+    # Repeats a loaded row at another reading, plus that row's own copy
+    batch = server.batch_from_records([
+        {'State': 'Andhra Pradesh', 'Year': 2009, 'crop': 'Rice', 'Production': 10538.0, 'Rainfall': 800.0},
+        {'State': 'Andhra Pradesh', 'Year': 2009, 'crop': 'Rice', 'Production': 10538.0, 'Rainfall': 810.0},
+    ])
+    question = "Total rice production in Andhra Pradesh in 2009"
+    before = server.process_single_query(question)
+    path = server.persist_batch(batch, server.INGEST_DIR)
+    try:
+        server.ingest_batch(batch, os.path.basename(path))
+        live = server.process_single_query(question)
+        server.load_data()
+        assert server.process_single_query(question) == live
+        assert live != before
+    finally:
+        os.remove(path)
+        server.load_data()
+
+
+@pytest.mark.parametrize('row', [{'Year': 2014.5}, {'Production': -3.0}])
+def test_admin_ingest_rejects_invalid_rows(server, client, monkeypatch, row):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', 'secret')
+    rows = [dict({'State': 'Punjab', 'Year': 2014, 'crop': 'Rice', 'Production': 1.0, 'Rainfall': 500.0}, **row)]
+    response = client.post('/admin/ingest', json={'rows': rows}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid batch')
+
+
+def test_api_params_name_the_dataset_file_not_its_path(server, client, monkeypatch):
+    monkeypatch.setattr(server.snapshot, 'dataset', '/srv/private/data/crops.csv')
+    response = client.post('/api/query', json={'question': 'Where does the data come from?'})
+    (answer,) = response.get_json()['results'][0]['queries']
+    assert answer['params']['dataset'] == 'crops.csv'
+    assert answer['result']['dataset'] == 'crops.csv'
@@ -0,0 +1,28 @@
+import numpy as np
+
+from ranking import competition_ranks, rank, top_k
+
+VALUES = np.array([5.0, 9.0, 7.0, 9.0, np.nan, 1.0])
+
+
+def test_best_first_with_ties_at_the_cut_included():
+    assert top_k(VALUES, 1).tolist() == [1, 3]
+    assert top_k(VALUES, 1, ties=False).tolist() == [1]
+    assert top_k(VALUES, 3).tolist() == [1, 3, 2]
+
+
+def test_ascending_ranks_smallest_first_and_missing_values_last():
+    assert top_k(VALUES, 2, ascending=True).tolist() == [5, 0]
+    assert top_k(VALUES, 6, ascending=True).tolist() == [5, 0, 2, 1, 3, 4]
+
+
+def test_k_above_the_number_of_groups_returns_all_of_them():
+    assert top_k(VALUES, 100).tolist() == [1, 3, 2, 0, 5, 4]
+    assert top_k(np.array([]), 3).tolist() == []
+
+
+def test_ties_share_a_rank():
+    labels, values, ranks = rank(['a', 'b', 'c', 'd', 'e', 'f'], VALUES, 3)
+    assert labels.tolist() == ['b', 'd', 'c']
+    assert ranks.tolist() == [1, 1, 3]
+    assert competition_ranks([3.0, 2.0, 2.0, 1.0]).tolist() == [1, 2, 2, 4]
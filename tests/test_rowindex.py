@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from loader import typed
+from rowindex import RowIndex, gather
+
+ROWS = [
+    ('Punjab', 2010, 'Rice', 10.0, 500.0),
+    ('Kerala', 2010, 'Wheat', 5.0, 900.0),
+    ('Punjab', 2011, 'Wheat', 7.5, 450.0),
+    ('Goa', 2012, 'Rice', 1.25, 1200.0),
+    ('Kerala', 2012, 'Rice', 3.0, 950.0),
+]
+COLUMNS = ['State', 'Year', 'crop', 'Production', 'Rainfall']
+
+
+def frame(rows):
+    return typed(pd.DataFrame(rows, columns=COLUMNS))
+
+
+@pytest.mark.parametrize('states, years, crops', [
+    (None, None, None),
+    (['Punjab'], None, None),
+    (['Kerala', 'Goa'], [2012], ['Rice']),
+    (None, [2010, 2011], ['Wheat']),
+    (['Bihar'], None, None),
+])
+def test_chunks_read_as_one_table(states, years, crops):
+    whole = frame(ROWS)
+    chunks = [frame(ROWS[:2]), frame(ROWS[2:3]), frame(ROWS[3:])]
+
+    rows = RowIndex(whole).select(states, years, crops)
+    np.testing.assert_array_equal(RowIndex(chunks).select(states, years, crops), rows)
+    for column in COLUMNS:
+        np.testing.assert_array_equal(gather(chunks, column, rows), gather(whole, column, rows))
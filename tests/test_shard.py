@@ -0,0 +1,34 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from cube import AggregateCube
+from loader import load_dataset
+from shard import ShardedCube, attach
+
+from conftest import DATA_FILE
+
+
+@pytest.fixture(scope='module')
+def cube():
+    return AggregateCube(load_dataset(DATA_FILE, use_snapshot=False))
+
+
+def test_forked_process_closing_leaves_shared_memory_to_its_creator(cube):
+    sharded = ShardedCube(cube, 'State', shards=2, workers=1, min_cells=0)
+    try:
+        # Like a gunicorn worker exiting: forked from the creator, then closed
+        child = multiprocessing.get_context('fork').Process(target=sharded.close)
+        child.start()
+        child.join()
+        assert child.exitcode == 0
+
+        attached, blocks = attach(sharded.handle)
+        assert np.array_equal(attached.counts, cube.counts)
+        assert sharded.run(len, tasks=[[1, 2]]) == [2]
+    finally:
+        sharded.close()
+
+    with pytest.raises(FileNotFoundError):
+        attach(sharded.handle)
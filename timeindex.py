@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class TimeIndex:
+    """The dataset's distinct years in sorted order, for resolving year ranges
+
+    Ranges ("2010 to 2013", "since 2011") and relative periods ("last 3
+    years", counted back from the newest year in the data) resolve to a
+    contiguous run of this index by binary search. Since the cube's Year axis
+    is sorted the same way, the run is also a contiguous slice of every cube
+    array, so range filters are applied as views rather than gathers.
+    """
+
+    def __init__(self, years):
+        self.years = np.unique(np.asarray(years, dtype=np.int64))
+
+    @property
+    def first(self):
+        return int(self.years[0])
+
+    @property
+    def last(self):
+        return int(self.years[-1])
+
+    def window(self, first=None, last=None):
+        """``(lo, hi)`` positions of the years from ``first`` to ``last`` inclusive (None is open-ended)"""
+        lo = 0 if first is None else int(np.searchsorted(self.years, first, side='left'))
+        hi = len(self.years) if last is None else int(np.searchsorted(self.years, last, side='right'))
+        return lo, max(lo, hi)
+
+    def span(self, first=None, last=None):
+        lo, hi = self.window(first, last)
+        return self.years[lo:hi].tolist()
+
+    def resolve(self, period):
+        """Years covered by a period from QueryMatcher.match(), oldest first
+
+        Raises ValueError when the data has no year in the period, rather
+        than letting an empty filter select everything.
+        """
+        if period.get('latest') is not None:
+            first, last = self.last - period['latest'] + 1, None
+        else:
+            first, last = period.get('first'), period.get('last')
+
+        years = self.span(first, last)
+        if not years:
+            if first is not None and last is not None:
+                asked = f"{first}-{last}"
+            else:
+                asked = f"{first} onwards" if first is not None else f"years up to {last}"
+            raise ValueError(f"No data for {asked}; the data covers {self.first}-{self.last}")
+        return years